@@ -0,0 +1 @@
+# Offline benchmarks that exercise the backend against a fake Gemini client
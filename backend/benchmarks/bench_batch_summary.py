@@ -0,0 +1,46 @@
+"""Compare one batch request against one /summarize request per document.
+
+Runs the FastAPI app in-process against the fake client. Run from the
+backend directory:
+
+    GEMINI_API_KEY=unused python -m benchmarks.bench_batch_summary --documents 20
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+import main as app_module
+from benchmarks.fake_genai import FakeGenAIClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    app_module.gemini_service.client = FakeGenAIClient(latency=args.latency)
+    app_module.gemini_service.response_cache = None
+    documents = [("files", (f"report-{i}.txt", f"Report {i}: call volume".encode(), "text/plain"))
+                 for i in range(args.documents)]
+
+    with TestClient(app_module.app) as client:
+        start = time.perf_counter()
+        for document in documents:
+            client.post("/api/v1/summarize", data={"inputType": "File"}, files={"file": document[1]})
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/api/v1/summarize/batch", files=documents)
+        items = response.text.count("event: item")
+        batched = time.perf_counter() - start
+
+    print(f"{args.documents} documents, model latency {args.latency:.2f}s, "
+          f"batch concurrency {app_module.SUMMARY_BATCH_CONCURRENCY}")
+    print(f"  one request each: {sequential:6.2f}s")
+    print(f"  single batch:     {batched:6.2f}s ({items} results streamed)")
+
+
+if __name__ == "__main__":
+    main()
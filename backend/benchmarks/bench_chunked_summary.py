@@ -0,0 +1,66 @@
+"""Compare single-call and map-reduce summarization of a very large document.
+
+The fake model's latency grows with prompt size, so one huge prompt is slow
+while chunks summarized concurrently overlap. Run from the backend directory:
+
+    python -m benchmarks.bench_chunked_summary --pages 500
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_genai import FakeGenAIClient
+from services import gemini_service as gemini_module
+from services import request_context
+from services.chunking import PAGE_BREAK, estimate_tokens
+from services.gemini_service import GeminiService
+
+PARAGRAPH = (
+    "The quarterly review covered revenue, churn and support volume across "
+    "all regions, with particular attention to enterprise renewals. "
+)
+
+def synthetic_document(pages: int, paragraphs_per_page: int = 12) -> str:
+    page_text = "\n\n".join(f"{PARAGRAPH * 3}(paragraph {i})" for i in range(paragraphs_per_page))
+    return PAGE_BREAK.join(f"Page {page}\n{page_text}\n" for page in range(1, pages + 1))
+
+
+async def summarize(text: str, threshold_tokens: int, args) -> dict:
+    gemini_module.SUMMARY_CHUNK_THRESHOLD_TOKENS = threshold_tokens
+    client = FakeGenAIClient(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k_tokens)
+    service = GeminiService(client=client)
+    # Measure the model path, not cache hits
+    service.response_cache = None
+
+    meta = request_context.start_request()
+    start = time.perf_counter()
+    await service.summarize_text(text)
+    return {
+        "seconds": time.perf_counter() - start,
+        "calls": client.calls["generate_content"],
+        "chunks": meta.get("chunks", 1),
+        "levels": meta.get("reduce_levels", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--latency-per-1k-tokens", type=float, default=0.01)
+    args = parser.parse_args()
+
+    text = synthetic_document(args.pages)
+    print(f"Document: {args.pages} pages, {len(text):,} chars, ~{estimate_tokens(text):,} tokens")
+
+    single = asyncio.run(summarize(text, threshold_tokens=10 ** 12, args=args))
+    chunked = asyncio.run(summarize(text, threshold_tokens=gemini_module.SUMMARY_CHUNK_TOKENS, args=args))
+
+    for label, result in (("single call", single), ("map-reduce", chunked)):
+        print(f"{label:>12}: {result['seconds']:.2f}s, {result['calls']} model calls, "
+              f"{result['chunks']} chunks, {result['levels']} reduce levels")
+    print(f"Speedup: {single['seconds'] / chunked['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Check that cleanup stays off the hot path and that nothing is leaked.
+
+1. Conversation requests are timed with instant and slow remote deletes.
+   Deletion runs in the background, so the slow deletes must not show up
+   in response latency.
+2. Requests whose model call fails must still have their upload deleted.
+3. One sweeper pass over planted leftovers must remove exactly the stale,
+   unprotected ones.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_cleanup --requests 8 --delete-latency 1.0
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("GEMINI_API_KEY", "unused-by-fake-backend")
+os.environ.setdefault("JOB_STORE", "memory")
+
+import httpx
+
+import main as app_module
+from benchmarks.fake_genai import FakeFile, FakeGenAIClient, api_error
+from benchmarks.sample_documents import make_wav
+from services.cleanup import TEMP_FILE_PREFIX, OrphanSweeper, cleanup_queue
+
+
+def leftover_temp_files() -> set:
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.startswith(TEMP_FILE_PREFIX)}
+
+
+async def timed_requests(client: FakeGenAIClient, requests: int, wav: bytes) -> tuple:
+    """Median latency and status codes for sequential conversation requests"""
+    app_module.gemini_service.client = client
+    latencies = []
+    statuses = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://cleanup", timeout=None) as http:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await http.post(
+                "/api/v1/analyze-conversation",
+                data={"mode": "single"},
+                files={"audio": ("call.wav", wav, "audio/wav")},
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+    await cleanup_queue.drain()
+    return statistics.median(latencies), statuses
+
+
+async def sweep_planted_leftovers() -> dict:
+    now = time.time()
+    old = now - 2 * 3600
+    temp_dir = tempfile.mkdtemp()
+    planted = {
+        "stale": f"{TEMP_FILE_PREFIX}stale.wav",
+        "protected": f"{TEMP_FILE_PREFIX}queued_job.wav",
+        "fresh": f"{TEMP_FILE_PREFIX}in_flight.pdf",
+        "foreign": "someone_else.tmp",
+    }
+    for key, name in planted.items():
+        path = os.path.join(temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * 1000)
+        if key != "fresh":
+            os.utime(path, (old, old))
+
+    client = FakeGenAIClient(latency=0)
+    stored = client.aio.files.stored
+    day_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    for name, display_name, created in (
+        ("files/orphan", f"{TEMP_FILE_PREFIX}orphan.wav", day_ago),
+        ("files/registry", f"{TEMP_FILE_PREFIX}reused.wav", day_ago),
+        ("files/recent", f"{TEMP_FILE_PREFIX}recent.wav", datetime.now(timezone.utc)),
+        ("files/other-app", "uploaded by another app", day_ago),
+    ):
+        stored[name] = FakeFile(name, "", size=5000, display_name=display_name)
+        stored[name].create_time = created
+
+    async def list_uploads():
+        async for uploaded_file in await client.aio.files.list():
+            yield uploaded_file
+
+    async def in_use():
+        return {os.path.join(temp_dir, planted["protected"])}, {"files/registry"}
+
+    sweeper = OrphanSweeper(list_uploads, client.aio.files.delete, in_use,
+                            temp_max_age_seconds=3600, upload_max_age_seconds=24 * 3600, temp_dir=temp_dir)
+    result = await sweeper.sweep()
+    result["temp_left"] = sorted(os.listdir(temp_dir))
+    result["uploads_left"] = sorted(stored)
+    for name in result["temp_left"]:
+        os.unlink(os.path.join(temp_dir, name))
+    os.rmdir(temp_dir)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--delete-latency", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    app_module.gemini_service.upload_registry = None
+    wav = make_wav(10)
+    before = leftover_temp_files()
+
+    instant = FakeGenAIClient(latency=args.latency)
+    slow = FakeGenAIClient(latency=args.latency, delete_latency=args.delete_latency)
+    instant_median, _ = asyncio.run(timed_requests(instant, args.requests, wav))
+    slow_median, _ = asyncio.run(timed_requests(slow, args.requests, wav))
+    print(f"Median latency: {instant_median * 1000:.0f} ms with instant deletes, "
+          f"{slow_median * 1000:.0f} ms with {args.delete_latency:.1f}s deletes")
+
+    # Uploads succeed, then every model call is rejected
+    failing = FakeGenAIClient(latency=args.latency)
+
+    async def reject(*args, **kwargs):
+        raise api_error(400)
+
+    failing.aio.models.generate_content = reject
+    _, statuses = asyncio.run(timed_requests(failing, 3, wav))
+    print(f"Failing model calls: statuses {statuses} after {failing.calls['upload']} upload(s), "
+          f"{len(failing.aio.files.stored)} left behind")
+
+    leaked = leftover_temp_files() - before
+    remote_left = sum(len(client.aio.files.stored) for client in (instant, slow, failing))
+    print(f"After draining: {remote_left} upload(s) and {len(leaked)} temp file(s) left")
+
+    swept = asyncio.run(sweep_planted_leftovers())
+    print(f"Sweeper removed {swept['temp_files']} temp file(s) ({swept['temp_bytes']} bytes) and "
+          f"{swept['uploads']} upload(s) ({swept['upload_bytes']} bytes); "
+          f"kept {swept['temp_left']} and {swept['uploads_left']}")
+    print(f"Queue stats: {cleanup_queue.stats()}")
+
+    if slow_median - instant_median > args.delete_latency / 4:
+        raise SystemExit("FAIL: remote deletes added to response latency")
+    if set(statuses) != {500} or failing.calls["upload"] != 3 or remote_left or leaked:
+        raise SystemExit("FAIL: uploads or temp files were leaked")
+    if (swept["temp_files"], swept["uploads"]) != (1, 1) or "files/orphan" in swept["uploads_left"]:
+        raise SystemExit("FAIL: sweeper removed the wrong files")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Check that concurrent GeminiService calls overlap instead of queueing.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_concurrency --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_genai import FakeGenAIClient
+from services.gemini_service import GeminiService
+
+
+async def run(requests: int, latency: float) -> float:
+    service = GeminiService(client=FakeGenAIClient(latency=latency))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(service.summarize_text(f"document {i}") for i in range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.requests, args.latency))
+    print(f"{args.requests} concurrent summaries in {elapsed:.2f}s "
+          f"(single call latency {args.latency:.2f}s, serial would take "
+          f"{args.requests * args.latency:.2f}s)")
+
+    # Allow generous slack for scheduling overhead; a serialised service
+    # would take ``requests`` times longer.
+    if elapsed > args.latency * 2:
+        raise SystemExit("FAIL: requests did not overlap")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Compare follow-up questions in a session with the stateless endpoints.
+
+Stateless requests resend the whole document or image with every prompt.
+A session sends it once: documents and recordings above the caching
+minimum go into a model-side context cache, so follow-ups only send the
+new question. The fake model charges latency per fresh prompt token, with
+cached tokens at a fraction of the cost. Also checks that sessions are
+evicted least recently used first and expire after their TTL, deleting
+their caches, that a cache outlives a short TTL while questions keep
+coming, that a session whose cache is gone rebuilds it or falls back
+to resending its context, and that only missing sessions answer 404. Run
+from the backend directory:
+
+    python -m benchmarks.bench_context_sessions --questions 5 --document-tokens 40000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "unused-by-fake-backend")
+os.environ.setdefault("JOB_STORE", "memory")
+
+import httpx
+
+import main as app_module
+from benchmarks.bench_chunked_summary import synthetic_document
+from benchmarks.fake_genai import FakeGenAIClient
+from benchmarks.sample_documents import make_jpeg, make_wav
+from services.chunking import estimate_tokens
+from services.cleanup import cleanup_queue
+
+QUESTIONS = [
+    "What were the main findings?",
+    "Which regions are mentioned?",
+    "What happened to churn?",
+    "List any action items.",
+    "Who is the intended audience?",
+    "What should be investigated next?",
+]
+
+
+def document_of(tokens: int) -> str:
+    text = synthetic_document(1)
+    while estimate_tokens(text) < tokens:
+        text += synthetic_document(1)
+    return text
+
+
+async def timed(request) -> tuple:
+    start = time.perf_counter()
+    response = await request
+    if response.status_code >= 400:
+        raise SystemExit(f"FAIL: {response.request.url.path} answered {response.status_code}: {response.text}")
+    return time.perf_counter() - start, response.json()
+
+
+def fresh_tokens(client: FakeGenAIClient) -> int:
+    return client.tokens["prompt"] - client.tokens["cached"]
+
+
+async def compare(http, client: FakeGenAIClient, kind: str, stateless, start_session, questions: int) -> dict:
+    """Median latency and fresh input tokens per question, stateless and in a session"""
+    result = {}
+    stateless_latencies = []
+    before = fresh_tokens(client)
+    for question in QUESTIONS[:questions]:
+        latency, _ = await timed(stateless(question))
+        stateless_latencies.append(latency)
+    result["stateless"] = (statistics.median(stateless_latencies), (fresh_tokens(client) - before) / questions)
+
+    first_latency, created = await timed(start_session(QUESTIONS[0]))
+    session_id = created["sessionId"]
+    follow_up_latencies = []
+    before = fresh_tokens(client)
+    for question in QUESTIONS[1:questions]:
+        latency, _ = await timed(http.post(f"/api/v1/sessions/{session_id}/questions", json={"question": question}))
+        follow_up_latencies.append(latency)
+    result["follow_up"] = (statistics.median(follow_up_latencies), (fresh_tokens(client) - before) / (questions - 1))
+    result["first"] = first_latency
+
+    _, session = await timed(http.get(f"/api/v1/sessions/{session_id}"))
+    result["session"] = session
+    print(f"{kind:>12}: stateless {result['stateless'][0] * 1000:6.0f} ms, {result['stateless'][1]:7.0f} fresh tokens | "
+          f"session start {first_latency * 1000:6.0f} ms, follow-ups {result['follow_up'][0] * 1000:6.0f} ms, "
+          f"{result['follow_up'][1]:7.0f} fresh tokens (cached: {session['cached']})")
+    return result
+
+
+async def eviction_checks(http, client: FakeGenAIClient) -> list:
+    """Problems found with LRU eviction and TTL expiry"""
+    store = app_module.gemini_service.context_sessions
+    problems = []
+    saved_limits = (store.max_sessions, store.ttl_seconds)
+    await store.clear()
+    store.max_sessions = 2
+    try:
+        ids = []
+        for index in range(3):
+            if index == 2:
+                # Touch the first session so the second is the least recently used
+                await timed(http.post(f"/api/v1/sessions/{ids[0]}/questions", json={"question": "Still there?"}))
+            _, created = await timed(http.post("/api/v1/sessions", data={"inputType": "Text", "text": document_of(5000) + str(index)}))
+            ids.append(created["sessionId"])
+        statuses = [(await http.get(f"/api/v1/sessions/{session_id}")).status_code for session_id in ids]
+        if statuses != [200, 404, 200]:
+            problems.append(f"LRU eviction left sessions with statuses {statuses}")
+
+        store.ttl_seconds = 1
+        _, created = await timed(http.post("/api/v1/sessions", data={"inputType": "Text", "text": document_of(5000)}))
+        await asyncio.sleep(1.2)
+        response = await http.post(f"/api/v1/sessions/{created['sessionId']}/questions", json={"question": "Hello?"})
+        if response.status_code != 404:
+            problems.append(f"expired session answered {response.status_code}")
+    finally:
+        store.max_sessions, store.ttl_seconds = saved_limits
+
+    await store.clear()
+    # The stateless conversation requests leave their upload in the registry
+    await app_module.gemini_service.upload_registry.clear()
+    await cleanup_queue.drain()
+    if client.aio.caches.stored or client.aio.files.stored:
+        problems.append(f"{len(client.aio.caches.stored)} cache(s) and {len(client.aio.files.stored)} upload(s) left after clearing")
+    return problems
+
+
+async def cache_expiry_checks(http, client: FakeGenAIClient) -> list:
+    """Problems found with keeping caches alive and replacing lost ones"""
+    store = app_module.gemini_service.context_sessions
+    problems = []
+    saved_ttl = store.ttl_seconds
+    # Longer than a question takes, shorter than the run of questions below
+    store.ttl_seconds = 3
+    try:
+        _, created = await timed(http.post("/api/v1/sessions", data={"inputType": "Text", "text": document_of(5000)}))
+        session_id = created["sessionId"]
+        creates = client.calls["cache_create"]
+        # Questions spaced out past the TTL of the cache they started with
+        for question in QUESTIONS[:4]:
+            await asyncio.sleep(1)
+            await timed(http.post(f"/api/v1/sessions/{session_id}/questions", json={"question": question}))
+        if client.calls["cache_create"] != creates:
+            problems.append("cache expired while its session was in use")
+
+        # Lost caches, e.g. deleted by hand or expired during an outage
+        client.aio.caches.stored.pop(store.get(session_id).cache_name)
+        _, answer = await timed(http.post(f"/api/v1/sessions/{session_id}/questions", json={"question": "Rebuilt?"}))
+        rebuilt = answer["session"]["cached"] and client.calls["cache_create"] == creates + 1
+
+        client.aio.caches.stored.pop(store.get(session_id).cache_name)
+        saved_minimum = client.min_cache_tokens
+        client.min_cache_tokens = 10 ** 9
+        try:
+            before = fresh_tokens(client)
+            _, answer = await timed(http.post(f"/api/v1/sessions/{session_id}/questions", json={"question": "Resent?"}))
+            resent = fresh_tokens(client) - before
+        finally:
+            client.min_cache_tokens = saved_minimum
+        print(f"Lost cache: rebuilt {rebuilt}; without a cache the context was resent ({resent} fresh tokens)")
+        if not rebuilt:
+            problems.append("lost cache was not rebuilt")
+        if answer["session"]["cached"] or resent < 5000:
+            problems.append("session whose cache could not be rebuilt did not resend its context")
+    finally:
+        store.ttl_seconds = saved_ttl
+    return problems
+
+
+async def error_checks(http) -> list:
+    """Problems with telling missing sessions apart from failed questions"""
+    service = app_module.gemini_service
+    problems = []
+    _, created = await timed(http.post("/api/v1/sessions", data={"inputType": "Text", "text": "Churn was flat."}))
+
+    async def broken_generate(*args, **kwargs):
+        # e.g. a response missing a field the code expects
+        raise KeyError("candidates")
+
+    service._generate = broken_generate
+    try:
+        response = await http.post(f"/api/v1/sessions/{created['sessionId']}/questions", json={"question": "Why?"})
+    finally:
+        del service._generate
+    if response.status_code != 500:
+        problems.append(f"failed question on a live session answered {response.status_code}")
+
+    response = await http.post("/api/v1/sessions/no-such-session/questions", json={"question": "Hello?"})
+    if response.status_code != 404:
+        problems.append(f"unknown session answered {response.status_code}")
+    return problems
+
+
+async def run(args) -> tuple:
+    # Audio costs prompt latency like the equivalent number of text tokens
+    client = FakeGenAIClient.from_profile(args.profile, seed=0, latency_per_file_mb=0.02)
+    app_module.gemini_service.client = client
+    # Measure model calls, not response cache hits
+    app_module.gemini_service.response_cache = None
+    document = document_of(args.document_tokens)
+    image = make_jpeg(1600, 1200)
+    recording = make_wav(args.recording_seconds)
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://sessions", timeout=None) as http:
+        results = {
+            "document": await compare(
+                http, client, "document",
+                # The summary endpoint is the stateless way to send a document to the model
+                lambda question: http.post("/api/v1/summarize", data={"inputType": "Text", "text": f"{question}\n\n{document}"}),
+                lambda question: http.post("/api/v1/sessions", data={"inputType": "Text", "text": document, "prompt": question}),
+                args.questions,
+            ),
+            "image": await compare(
+                http, client, "image",
+                lambda question: http.post("/api/v1/analyze-image", data={"prompt": question},
+                                           files={"image": ("photo.jpg", image, "image/jpeg")}),
+                lambda question: http.post("/api/v1/sessions", data={"prompt": question},
+                                           files={"image": ("photo.jpg", image, "image/jpeg")}),
+                args.questions,
+            ),
+            "conversation": await compare(
+                http, client, "conversation",
+                lambda question: http.post("/api/v1/analyze-conversation", data={"mode": "single"},
+                                           files={"audio": ("call.wav", recording, "audio/wav")}),
+                lambda question: http.post("/api/v1/sessions", data={"prompt": question},
+                                           files={"audio": ("call.wav", recording, "audio/wav")}),
+                args.questions,
+            ),
+        }
+        problems = await cache_expiry_checks(http, client)
+        problems += await error_checks(http)
+        problems += await eviction_checks(http, client)
+    return results, problems, client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--document-tokens", type=int, default=40000)
+    parser.add_argument("--recording-seconds", type=float, default=180)
+    parser.add_argument("--profile", default="realistic")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results, problems, client = asyncio.run(run(args))
+    print(f"Fake backend calls: {client.calls}")
+    print(f"Session stats: {app_module.gemini_service.context_sessions.stats()}")
+
+    document = results["document"]
+    if not document["session"]["cached"] or not results["conversation"]["session"]["cached"]:
+        problems.append("document or recording session was not cached")
+    if document["follow_up"][0] >= document["stateless"][0]:
+        problems.append("document follow-ups were not faster than stateless requests")
+    if document["follow_up"][1] > document["stateless"][1] / 10:
+        problems.append("document follow-ups did not cut fresh input tokens by 90%")
+    if results["image"]["follow_up"][0] >= results["image"]["stateless"][0]:
+        problems.append("image follow-ups were not faster than stateless requests")
+    if results["conversation"]["follow_up"][0] > results["conversation"]["stateless"][0]:
+        problems.append("conversation follow-ups were slower than stateless requests")
+    if problems:
+        raise SystemExit(f"FAIL: {'; '.join(problems)}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Compare image analysis with and without server-side preprocessing.
+
+Generates a phone-camera sized JPEG, then runs it through
+``analyze_image_from_file`` against the fake client with a simulated uplink,
+reporting bytes sent to the model and end-to-end latency. Also checks that
+distinct low-detail images (blank pages, text on white) never share a
+cache identity, and that a photo that does not shrink when re-encoded is
+still sent without its metadata and the right way up. Run from the backend
+directory:
+
+    python -m benchmarks.bench_image_preprocessing --width 4032 --height 3024
+"""
+import argparse
+import asyncio
+import io
+import random
+import time
+
+from starlette.datastructures import UploadFile
+
+import services.gemini_service as gemini_module
+from services import image_processing
+from benchmarks.fake_genai import FakeGenAIClient
+from benchmarks.sample_documents import make_jpeg
+from services.gemini_service import GeminiService
+from services.uploads import save_bytes
+
+
+async def run(photo: bytes, preprocess: bool, bandwidth: float):
+    gemini_module.IMAGE_PREPROCESS_ENABLED = preprocess
+    client = FakeGenAIClient(latency=0.3, upload_bytes_per_sec=bandwidth)
+    service = GeminiService(client=client)
+    upload = UploadFile(io.BytesIO(photo), filename="photo.jpg", size=len(photo))
+    start = time.perf_counter()
+    await service.analyze_image_from_file(upload, "Describe this image")
+    return time.perf_counter() - start, client.bytes_sent
+
+
+def low_detail_images() -> dict:
+    """Unrelated images that a perceptual hash cannot tell apart"""
+    from PIL import Image, ImageDraw
+
+    images = {
+        "white": Image.new("RGB", (800, 600), "white"),
+        "black": Image.new("RGB", (800, 600), "black"),
+    }
+    for name, lines in (
+        ("invoice A", ["INVOICE 1042", "Acme Corp", "2 x Widget   $40.00", "Total        $80.00"]),
+        ("invoice B", ["INVOICE 2291", "Globex Ltd", "7 x Gadget   $12.50", "Total        $87.50"]),
+    ):
+        image = Image.new("RGB", (800, 600), "white")
+        draw = ImageDraw.Draw(image)
+        for index, line in enumerate(lines):
+            draw.text((60, 60 + index * 30), line, fill="black")
+        images[name] = image
+
+    encoded = {}
+    for name, image in images.items():
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        encoded[name] = output.getvalue()
+    return encoded
+
+
+async def cache_identities(images: dict) -> dict:
+    gemini_module.IMAGE_PREPROCESS_ENABLED = True
+    service = GeminiService(client=FakeGenAIClient(latency=0))
+    identities = {}
+    for name, data in images.items():
+        saved = await save_bytes(data, f"{name}.png", "image/png")
+        processed, identities[name] = await service._prepare_image(saved)
+        processed.cleanup()
+    return identities
+
+
+def photo_with_metadata() -> bytes:
+    """A small, heavily compressed noisy JPEG with GPS EXIF, stored upside down
+
+    The top-left corner is dark once the 180 degree orientation is applied.
+    """
+    from PIL import Image
+
+    noise = random.Random(0)
+    image = Image.frombytes("RGB", (64, 48), bytes(noise.randrange(128, 256) for _ in range(64 * 48 * 3)))
+    image.paste((0, 0, 0), (48, 36, 64, 48))
+    exif = Image.Exif()
+    exif[0x0112] = 3
+    exif[0x8825] = {1: "N", 2: (37.0, 46.0, 30.0), 3: "W", 4: (122.0, 25.0, 10.0)}
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=30, exif=exif)
+    return output.getvalue()
+
+
+async def sent_image(data: bytes) -> tuple:
+    """(bytes sent, EXIF tag count, top-left pixel) after preprocessing to PNG
+
+    Lossless output makes the photo bigger rather than smaller.
+    """
+    from PIL import Image
+
+    gemini_module.IMAGE_PREPROCESS_ENABLED = True
+    saved_format = gemini_module.IMAGE_OUTPUT_FORMAT
+    gemini_module.IMAGE_OUTPUT_FORMAT = image_processing.IMAGE_OUTPUT_FORMAT = "PNG"
+    try:
+        service = GeminiService(client=FakeGenAIClient(latency=0))
+        saved = await save_bytes(data, "upside-down.jpg", "image/jpeg")
+        processed, _ = await service._prepare_image(saved)
+        sent = processed.read_bytes()
+        processed.cleanup()
+    finally:
+        gemini_module.IMAGE_OUTPUT_FORMAT = image_processing.IMAGE_OUTPUT_FORMAT = saved_format
+    with Image.open(io.BytesIO(sent)) as image:
+        return len(sent), len(image.getexif()), image.convert("L").getpixel((2, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--mbps", type=float, default=20.0, help="Simulated uplink in megabits/s")
+    args = parser.parse_args()
+
+    photo = make_jpeg(args.width, args.height)
+    bandwidth = args.mbps * 1_000_000 / 8
+    print(f"Input: {args.width}x{args.height} JPEG, {len(photo) / 1024:.0f} KB, uplink {args.mbps} Mbit/s")
+    for label, preprocess in (("original", False), ("preprocessed", True)):
+        elapsed, sent = asyncio.run(run(photo, preprocess, bandwidth))
+        print(f"{label:>13}: {sent / 1024:8.0f} KB sent, {elapsed:6.2f}s end to end")
+
+    images = low_detail_images()
+    identities = asyncio.run(cache_identities(images))
+    if len(set(identities.values())) != len(identities):
+        raise SystemExit(f"FAIL: distinct images share a cache identity: {identities}")
+    print(f"{len(images)} distinct low-detail images kept apart")
+
+    photo = photo_with_metadata()
+    size, exif_tags, corner = asyncio.run(sent_image(photo))
+    print(f"Photo with GPS EXIF: {len(photo)} bytes in, {size} bytes sent, {exif_tags} EXIF tags, corner {corner}")
+    if exif_tags or corner > 64:
+        raise SystemExit("FAIL: image was sent with its metadata or without its orientation applied")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Check that background jobs run exactly once across processes sharing a store.
+
+Queues stand in for separate server processes sharing one SQLite file:
+
+1. Building the store does not touch the disk; the file is created by
+   the queue on start, and a database without the lease columns is migrated.
+2. A queue starting while another one is running a job leaves that job alone.
+3. When the running queue dies, its jobs are taken over once the lease
+   lapses and finish in the surviving queue.
+4. Queues recovering the same expired jobs concurrently split them, and
+   every job runs exactly once.
+5. Webhook URLs pointing at loopback, private or link-local addresses are
+   refused, both when checked and when a finished job is delivered.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_job_queue --jobs 40
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+INTERNAL_WEBHOOKS = (
+    "http://127.0.0.1:8080/hook",
+    "http://localhost/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.1.2.3/hook",
+    "https://192.168.0.10/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://0.0.0.0/hook",
+    "ftp://93.184.216.34/hook",
+)
+PUBLIC_WEBHOOK = "https://93.184.216.34/hook"
+
+import httpx
+
+from services import job_queue as job_queue_module
+from services.job_queue import JobQueue, check_webhook_url
+from services.job_store import SQLiteJobStore
+
+LEASE_SECONDS = 0.6
+
+
+def make_queue(path: str, runs: Counter, seconds: float, workers: int = 2, max_queued: int = 100) -> JobQueue:
+    queue = JobQueue(SQLiteJobStore(path), workers=workers, max_queued=max_queued, lease_seconds=LEASE_SECONDS)
+
+    async def handler(payload, progress):
+        runs[payload["n"]] += 1
+        await progress("working")
+        await asyncio.sleep(seconds)
+        return {"n": payload["n"]}
+
+    queue.register("test", handler)
+    return queue
+
+
+async def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await condition():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def check_migration(directory: str) -> list:
+    problems = []
+    path = os.path.join(directory, "nested", "jobs.sqlite3")
+    store = SQLiteJobStore(path)
+    if os.path.exists(os.path.dirname(path)):
+        problems.append("building the store touched the disk")
+    await store.open()
+
+    legacy = os.path.join(directory, "legacy.sqlite3")
+    with sqlite3.connect(legacy) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, "
+            "progress TEXT, payload TEXT, result TEXT, error TEXT, webhook_url TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL)"
+        )
+        conn.execute("INSERT INTO jobs VALUES ('old', 'test', 'queued', NULL, '{}', '{\"n\": -1}', "
+                     "NULL, NULL, NULL, 0, 0, NULL)")
+    store = SQLiteJobStore(legacy)
+    await store.open()
+    recovered = await store.recover_expired("migrated", time.time() + LEASE_SECONDS, 10)
+    if [job["id"] for job in recovered] != ["old"]:
+        problems.append(f"job queued before the migration was not recovered ({recovered})")
+    return problems
+
+
+async def check_takeover(directory: str) -> list:
+    problems = []
+    path = os.path.join(directory, "takeover.sqlite3")
+    runs = Counter()
+    first = make_queue(path, runs, seconds=60)
+    await first.start()
+    job = await first.submit("test", {"n": 0})
+
+    async def started():
+        return runs[0] == 1
+
+    await wait_for(started, 5)
+
+    second = make_queue(path, runs, seconds=0.1)
+    await second.start()
+    # Several lease periods: the first queue keeps renewing, so nothing moves
+    await asyncio.sleep(LEASE_SECONDS * 3)
+    if runs[0] != 1 or second.stats()["recovered"]:
+        problems.append(f"job with a live lease was taken over ({runs[0]} runs)")
+
+    # Simulate a crash: the first queue stops without finishing its job
+    await first.stop()
+
+    async def finished():
+        current = await second.get(job["id"])
+        return current["status"] == "succeeded"
+
+    if not await wait_for(finished, LEASE_SECONDS * 5):
+        problems.append("job held by a dead queue was not taken over")
+    elif runs[0] != 2:
+        problems.append(f"job held by a dead queue ran {runs[0]} times in total, expected 2")
+    await second.stop()
+    return problems
+
+
+async def check_concurrent_recovery(directory: str, jobs: int) -> list:
+    path = os.path.join(directory, "shared.sqlite3")
+    runs = Counter()
+    seed = SQLiteJobStore(path)
+    await seed.open()
+    now = time.time()
+    for n in range(jobs):
+        # Left behind by a process whose lease has already lapsed
+        await seed.create({
+            "id": f"job-{n}", "kind": "test", "status": "running" if n % 2 else "queued", "stage": None,
+            "progress": {}, "payload": {"n": n}, "result": None, "error": None, "webhook_url": None,
+            "created_at": now + n, "updated_at": now, "expires_at": None,
+            "owner": "dead", "lease_expires_at": now - 1,
+        })
+
+    # Small queues, so the jobs have to be shared out over several rounds
+    queues = [make_queue(path, runs, seconds=0.05, workers=2, max_queued=4) for _ in range(3)]
+    await asyncio.gather(*(queue.start() for queue in queues))
+
+    async def drained():
+        return not await seed.list_unfinished()
+
+    await wait_for(drained, 30)
+    await asyncio.gather(*(queue.stop() for queue in queues))
+
+    recovered = [queue.stats()["recovered"] for queue in queues]
+    print(f"Recovered per queue: {recovered}, runs: {sum(runs.values())} for {jobs} jobs")
+    problems = []
+    if sum(recovered) != jobs:
+        problems.append(f"queues recovered {sum(recovered)} jobs, expected {jobs}")
+    repeated = [n for n, count in runs.items() if count != 1]
+    if len(runs) != jobs or repeated:
+        problems.append(f"{jobs - len(runs)} jobs never ran and {len(repeated)} ran more than once")
+    return problems
+
+
+async def check_webhooks() -> list:
+    problems = []
+    for url in INTERNAL_WEBHOOKS:
+        try:
+            await check_webhook_url(url)
+            problems.append(f"webhook {url} was accepted")
+        except ValueError:
+            pass
+    try:
+        await check_webhook_url(PUBLIC_WEBHOOK)
+    except ValueError as e:
+        problems.append(f"public webhook was refused: {e}")
+
+    job_queue_module.JOB_WEBHOOK_ALLOWED_HOSTS = {"localhost"}
+    try:
+        await check_webhook_url("http://localhost/hook")
+    except ValueError:
+        problems.append("allowed host was refused")
+    finally:
+        job_queue_module.JOB_WEBHOOK_ALLOWED_HOSTS = set()
+
+    # Delivery re-checks the URL, e.g. for a host that now resolves inward
+    posted = []
+    queue = JobQueue(SQLiteJobStore(":memory:"))
+    queue._http_client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: posted.append(str(request.url)) or httpx.Response(200)
+    ))
+    for url in (INTERNAL_WEBHOOKS[0], PUBLIC_WEBHOOK):
+        await queue._notify({"id": "job", "webhook_url": url, "payload": {}})
+    await queue.stop()
+    if posted != [PUBLIC_WEBHOOK]:
+        problems.append(f"webhooks delivered to {posted}")
+    return problems
+
+
+async def run(args) -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        problems = await check_migration(directory)
+        problems += await check_takeover(directory)
+        problems += await check_concurrent_recovery(directory, args.jobs)
+    problems += await check_webhooks()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    problems = asyncio.run(run(args))
+    if problems:
+        raise SystemExit(f"FAIL: {'; '.join(problems)}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare whole-file and segmented transcription of a long recording.
+
+The fake model's latency grows with the size of the uploaded audio, so one
+long recording is slow while segments transcribed concurrently overlap.
+Also checks that every cut landed in one of the recording's pauses. Run
+from the backend directory:
+
+    python -m benchmarks.bench_segmented_transcription --minutes 40 --segment-seconds 300
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("JOB_STORE", "memory")
+
+from benchmarks.fake_genai import FakeGenAIClient
+from benchmarks.sample_documents import make_wav
+from services import audio_segmentation
+from services import gemini_service as gemini_module
+from services import request_context
+from services.gemini_service import GeminiService
+from services.uploads import new_temp_path, saved_from_path
+
+SAMPLE_RATE = 8000
+# make_wav alternates two-second turns, each ending in this much silence
+PAUSE_SECONDS = 0.4
+
+
+async def analyze(path: str, segmented: bool, args) -> dict:
+    gemini_module.AUDIO_SEGMENT_ENABLED = segmented
+    gemini_module.AUDIO_SEGMENT_CONCURRENCY = args.concurrency
+    audio_segmentation.AUDIO_SEGMENT_SECONDS = args.segment_seconds
+    client = FakeGenAIClient(latency=args.latency, latency_per_file_mb=args.latency_per_mb)
+    service = GeminiService(client=client)
+    service.upload_registry = None
+
+    meta = request_context.start_request()
+    start = time.perf_counter()
+    result = await service.analyze_saved_conversation(saved_from_path(path, "call.wav", "audio/wav"))
+    return {
+        "seconds": time.perf_counter() - start,
+        "calls": client.calls["generate_content"],
+        "uploads": client.calls["upload"],
+        "segments": meta.get("audio_segments", 1),
+    }
+
+
+def cuts_in_pauses(path: str, segment_seconds: float) -> list:
+    """Cut points that fall outside the recording's pauses"""
+    segments = audio_segmentation.split_wav(path, segment_seconds)
+    for segment in segments:
+        segment.saved.cleanup()
+    misplaced = []
+    for segment in segments[1:]:
+        position_in_turn = segment.start % 2
+        if position_in_turn < 2 - PAUSE_SECONDS - audio_segmentation.SILENCE_WINDOW_SECONDS:
+            misplaced.append(round(segment.start, 2))
+    return misplaced
+
+
+def stitching_errors() -> list:
+    """Stitch two overlapping segment transcripts with known content"""
+    segments = [
+        audio_segmentation.AudioSegment(0, None, start=0, end=300, offset=0),
+        audio_segmentation.AudioSegment(1, None, start=300, end=600, offset=298),
+    ]
+    transcripts = [
+        "[00:00] Hello, thanks for calling.\n[04:57] Let me check that order.\n[04:59] One moment.",
+        "[00:00] One moment.\n[00:01] one moment\n[00:03] Found it, it ships today.",
+    ]
+    expected = [
+        "[00:00] Hello, thanks for calling.",
+        "[04:57] Let me check that order.",
+        "[04:59] One moment.",
+        "[05:01] Found it, it ships today.",
+    ]
+    stitched = audio_segmentation.stitch_transcripts(segments, transcripts).splitlines()
+    return [] if stitched == expected else stitched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, default=40)
+    parser.add_argument("--segment-seconds", type=float, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--latency-per-mb", type=float, default=0.1,
+                        help="Fake model latency per MB of audio in a request")
+    args = parser.parse_args()
+
+    path = new_temp_path("bench_call.wav")
+    try:
+        with open(path, "wb") as f:
+            f.write(make_wav(args.minutes * 60, SAMPLE_RATE, PAUSE_SECONDS))
+        size_mb = os.path.getsize(path) / 1_000_000
+        print(f"Recording: {args.minutes:g} minutes, {size_mb:.1f} MB")
+
+        whole = asyncio.run(analyze(path, segmented=False, args=args))
+        segmented = asyncio.run(analyze(path, segmented=True, args=args))
+        for label, result in (("whole file", whole), ("segmented", segmented)):
+            print(f"{label:>10}: {result['seconds']:.2f}s, {result['segments']} segment(s), "
+                  f"{result['uploads']} upload(s), {result['calls']} model calls")
+        print(f"Speedup: {whole['seconds'] / segmented['seconds']:.1f}x")
+
+        misplaced = cuts_in_pauses(path, args.segment_seconds)
+    finally:
+        os.unlink(path)
+
+    if misplaced:
+        raise SystemExit(f"FAIL: cuts outside pauses at {misplaced} seconds")
+    unexpected = stitching_errors()
+    if unexpected:
+        raise SystemExit(f"FAIL: overlap was not de-duplicated: {unexpected}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Check that concurrent identical requests share one fetch and one model call.
+
+Sends N simultaneous /api/v1/summarize requests for the same URL (spelled
+slightly differently) through the app, with the URL served by an in-process
+mock transport and Gemini replaced by the fake client. Exits non-zero if
+more than one fetch or generation happened. Run from the backend directory:
+
+    python -m benchmarks.bench_single_flight --requests 50
+"""
+import argparse
+import asyncio
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "unused-by-fake-backend")
+os.environ.setdefault("JOB_STORE", "memory")
+
+import httpx
+
+import main as app_module
+from benchmarks.fake_genai import FakeGenAIClient
+
+URL_VARIANTS = (
+    "https://docs.example.com/report.html",
+    "HTTPS://docs.example.com:443/report.html",
+    "https://Docs.Example.com/report.html#summary",
+)
+
+
+async def run(requests: int, fetch_latency: float, model_latency: float) -> dict:
+    fetches = 0
+
+    async def serve(request: httpx.Request) -> httpx.Response:
+        nonlocal fetches
+        fetches += 1
+        await asyncio.sleep(fetch_latency)
+        return httpx.Response(200, html="<html><body><p>Quarterly call volume report.</p></body></html>")
+
+    app_module.file_service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(serve))
+    fake = FakeGenAIClient(latency=model_latency)
+    app_module.gemini_service.client = fake
+    app_module.gemini_service.response_cache = None
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://single-flight") as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/summarize", data={"inputType": "URL", "url": URL_VARIANTS[i % len(URL_VARIANTS)]})
+            for i in range(requests)
+        ))
+
+    summaries = {response.json().get("summary") for response in responses}
+    return {
+        "ok": sum(response.status_code == 200 for response in responses),
+        "distinct_summaries": len(summaries),
+        "fetches": fetches,
+        "model_calls": fake.calls["generate_content"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--fetch-latency", type=float, default=0.2)
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests, args.fetch_latency, args.model_latency))
+    print(f"{args.requests} concurrent identical requests: {result['ok']} succeeded, "
+          f"{result['fetches']} URL fetch(es), {result['model_calls']} model call(s), "
+          f"{result['distinct_summaries']} distinct summary")
+    print(f"Coalesced: url_fetch={app_module.file_service.url_flight.stats()}, "
+          f"generation={app_module.gemini_service.generation_flight.stats()}")
+
+    if result["ok"] != args.requests or result["fetches"] != 1 or result["model_calls"] != 1:
+        raise SystemExit("FAIL: identical requests were not coalesced into one fetch and one model call")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
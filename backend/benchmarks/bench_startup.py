@@ -0,0 +1,77 @@
+"""Measure cold-start cost: importing the app and time to first response.
+
+Each run uses a fresh interpreter, as a newly scheduled instance would.
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "unused-by-startup-benchmark")
+    env.setdefault("JOB_STORE", "memory")
+    return env
+
+
+def import_seconds() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        capture_output=True, text=True, check=True, env=child_env()
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response_seconds(timeout: float = 30) -> float:
+    """Start uvicorn and poll GET / until it answers"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise SystemExit("Server did not respond in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    first_responses = [first_response_seconds() for _ in range(args.runs)]
+    print(f"import main:          median {statistics.median(imports) * 1000:7.1f} ms "
+          f"(min {min(imports) * 1000:.1f}, max {max(imports) * 1000:.1f})")
+    print(f"first response (GET /): median {statistics.median(first_responses) * 1000:5.1f} ms "
+          f"(min {min(first_responses) * 1000:.1f}, max {max(first_responses) * 1000:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Check that a streaming response does not stall other requests.
+
+The fake stream blocks between chunks, as google-genai 0.3.0 does when it
+reads a streamed response. While a long /api/v1/summarize/stream request
+is running, a short /api/v1/summarize request and a health check are sent;
+both must finish well before the stream does. Run from the backend
+directory:
+
+    python -m benchmarks.bench_streaming --stream-seconds 2
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "unused-by-fake-backend")
+os.environ.setdefault("JOB_STORE", "memory")
+
+import httpx
+
+import main as app_module
+from benchmarks.bench_chunked_summary import synthetic_document
+from benchmarks.fake_genai import FakeGenAIClient
+from services.chunking import estimate_tokens
+
+LATENCY = 0.1
+
+
+async def timed(request) -> tuple:
+    response = await request
+    return time.perf_counter(), response
+
+
+async def run(stream_seconds: float) -> list:
+    # Latency grows with the prompt, so only the long document streams slowly
+    long_text = synthetic_document(10)
+    per_1k_tokens = (stream_seconds - LATENCY) * 1000 / estimate_tokens(long_text)
+    app_module.gemini_service.client = FakeGenAIClient(latency=LATENCY, latency_per_1k_tokens=per_1k_tokens)
+    app_module.gemini_service.response_cache = None
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://streaming", timeout=None) as http:
+        start = time.perf_counter()
+        stream = asyncio.create_task(timed(
+            http.post("/api/v1/summarize/stream", data={"inputType": "Text", "text": long_text})
+        ))
+        await asyncio.sleep(stream_seconds / 4)
+        short = await timed(http.post("/api/v1/summarize", data={"inputType": "Text", "text": "Churn was flat."}))
+        health = await timed(http.get("/"))
+        stream_done, stream_response = await stream
+
+    print(f"stream: {stream_done - start:.2f}s, short summary done at {short[0] - start:.2f}s, "
+          f"health check at {health[0] - start:.2f}s")
+    problems = []
+    if "event: done" not in stream_response.text or "event: error" in stream_response.text:
+        problems.append(f"stream did not complete: {stream_response.text[-200:]!r}")
+    for label, (done, response) in (("short summary", short), ("health check", health)):
+        if response.status_code != 200:
+            problems.append(f"{label} answered {response.status_code}")
+        if done >= stream_done - stream_seconds / 4:
+            problems.append(f"{label} waited for the stream to finish")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stream-seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    problems = asyncio.run(run(args.stream_seconds))
+    if problems:
+        raise SystemExit(f"FAIL: {'; '.join(problems)}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure peak memory while handling a large audio upload.
+
+Compares the original path (``await file.read()`` then copy into a temp
+file) with the streaming ``save_upload`` path used by the services, by
+tracking the peak of Python allocations for each. The streamed peak must
+stay under ``--max-streamed-mb``, far below the upload size, so a return to
+whole-body reads fails the run. Run from the backend directory:
+
+    python -m benchmarks.bench_upload_memory --mb 200 --max-streamed-mb 16
+"""
+import argparse
+import asyncio
+import os
+import resource
+import tempfile
+import tracemalloc
+
+from starlette.datastructures import UploadFile
+
+from benchmarks.fake_genai import FakeGenAIClient
+from services.gemini_service import GeminiService
+from services.uploads import UPLOAD_CHUNK_BYTES
+
+
+async def read_whole_file(upload: UploadFile):
+    """The pre-streaming behaviour, kept here as the baseline"""
+    with tempfile.NamedTemporaryFile(delete=True) as tmp_file:
+        content = await upload.read()
+        tmp_file.write(content)
+
+
+async def analyze(upload: UploadFile):
+    service = GeminiService(client=FakeGenAIClient(latency=0.0))
+    await service.analyze_conversation_from_audio(upload)
+
+
+async def peak_allocation(handler, path: str) -> int:
+    with open(path, "rb") as source:
+        upload = UploadFile(source, filename="call.wav", size=os.path.getsize(path))
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        await handler(upload)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=200)
+    parser.add_argument("--max-streamed-mb", type=float, default=16)
+    args = parser.parse_args()
+    if args.max_streamed_mb * 4 > args.mb:
+        parser.error("--mb must be well above --max-streamed-mb for the bound to mean anything")
+
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+        block = os.urandom(UPLOAD_CHUNK_BYTES)
+        for _ in range(args.mb):
+            f.write(block)
+        path = f.name
+
+    peaks = {}
+    try:
+        for label, handler in (("read whole file", read_whole_file), ("streamed upload", analyze)):
+            peaks[label] = asyncio.run(peak_allocation(handler, path)) / 1024 / 1024
+            print(f"{label:>16}: peak Python allocations {peaks[label]:.1f} MB for a {args.mb} MB upload")
+        print(f"Process max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    finally:
+        os.unlink(path)
+
+    if peaks["streamed upload"] > args.max_streamed_mb:
+        raise SystemExit(f"FAIL: streamed upload peaked at {peaks['streamed upload']:.1f} MB, "
+                         f"over the {args.max_streamed_mb:g} MB bound")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
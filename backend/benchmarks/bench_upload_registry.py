@@ -0,0 +1,101 @@
+"""Check that callers sharing an upload don't fail with a cancelled one.
+
+Two requests lease the same content from the upload registry while the
+first caller's upload is still running, and the first caller is then
+cancelled, as on a client disconnect:
+
+1. When the upload goes on to succeed, the second caller gets the file and
+   nothing is uploaded twice.
+2. When the upload fails after its caller went away (e.g. its temp file was
+   removed), the second caller uploads its own copy instead of failing.
+3. A failure while the first caller is still waiting reaches both callers.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_upload_registry
+"""
+import asyncio
+from types import SimpleNamespace
+
+from services.upload_registry import UploadRegistry
+
+UPLOAD_SECONDS = 0.2
+
+
+def uploader(name: str, calls: list, fail: bool = False):
+    async def upload():
+        calls.append(name)
+        await asyncio.sleep(UPLOAD_SECONDS)
+        if fail:
+            raise OSError(f"{name}: temp file is gone")
+        return SimpleNamespace(name=f"files/{name}")
+    return upload
+
+
+async def lease(registry: UploadRegistry, upload):
+    async with registry.lease("same-content", 1024, upload) as (uploaded_file, reused):
+        return uploaded_file.name, reused
+
+
+async def cancel_first(first_fails: bool) -> tuple:
+    """(second caller's outcome, uploads started) when the first caller is cancelled"""
+    async def delete_file(name):
+        pass
+
+    registry = UploadRegistry(delete_file)
+    calls = []
+    first = asyncio.create_task(lease(registry, uploader("first", calls, fail=first_fails)))
+    await asyncio.sleep(UPLOAD_SECONDS / 4)
+    second = asyncio.create_task(lease(registry, uploader("second", calls)))
+    await asyncio.sleep(UPLOAD_SECONDS / 4)
+    first.cancel()
+    try:
+        outcome = await second
+    except BaseException as e:
+        outcome = repr(e)
+    await asyncio.gather(first, return_exceptions=True)
+    return outcome, calls
+
+
+async def shared_failure() -> list:
+    async def delete_file(name):
+        pass
+
+    registry = UploadRegistry(delete_file)
+    calls = []
+    results = await asyncio.gather(
+        lease(registry, uploader("first", calls, fail=True)),
+        lease(registry, uploader("second", calls)),
+        return_exceptions=True
+    )
+    return [type(result).__name__ for result in results], calls
+
+
+async def run() -> list:
+    problems = []
+    outcome, calls = await cancel_first(first_fails=False)
+    print(f"upload succeeds after its caller is cancelled: second got {outcome}, uploads {calls}")
+    if outcome != ("files/first", True) or calls != ["first"]:
+        problems.append("second caller did not get the shared upload")
+
+    outcome, calls = await cancel_first(first_fails=True)
+    print(f"upload fails after its caller is cancelled: second got {outcome}, uploads {calls}")
+    if outcome != ("files/second", False) or calls != ["first", "second"]:
+        problems.append("second caller did not upload its own copy")
+
+    outcome, calls = await shared_failure()
+    print(f"upload fails with its caller waiting: {outcome}, uploads {calls}")
+    if outcome != ["OSError", "OSError"] or calls != ["first"]:
+        problems.append("a failed upload was retried instead of reported")
+    return problems
+
+
+def main():
+    problems = asyncio.run(run())
+    if problems:
+        raise SystemExit(f"FAIL: {'; '.join(problems)}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Check URL fetching against a local HTTP server.
+
+1. HTML is reduced to readable text, also when the optional </head> is
+   left out, without scripts, styles or head metadata.
+2. Bodies over URL_FETCH_MAX_BYTES are rejected with 413, whether or not
+   the server sends a Content-Length.
+3. A second fetch of a page with an ETag is revalidated with a conditional
+   request and answered from the fetch cache on 304.
+4. A 304 to a request that had nothing cached is retried for the full body.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_url_fetch
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastapi import HTTPException
+
+from services import file_service as file_service_module
+from services import request_context
+from services.file_service import FileService
+
+PAGES = {
+    "/no-head-close": "<html><head><title>Quarterly report</title><meta charset=utf-8>"
+                      "<style>p { color: red }</style><body><p>Revenue grew in every region.</p>"
+                      "<script>track()</script></body></html>",
+    "/etag": "<html><head><title>Cached</title></head><body><p>Support volume fell.</p></body></html>",
+    "/stray-304": "<html><body><p>Churn was flat.</p></body></html>",
+}
+ETAG = '"v1"'
+BIG_BYTES = 64 * 1024
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.path, dict(self.headers)))
+        if self.path in ("/big", "/big-chunked"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            if self.path == "/big":
+                self.send_header("Content-Length", str(BIG_BYTES))
+                self.end_headers()
+                self.wfile.write(b"x" * BIG_BYTES)
+            else:
+                # No Content-Length: the cap has to be enforced while reading
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for _ in range(BIG_BYTES // 4096):
+                    self.wfile.write(b"1000\r\n" + b"x" * 4096 + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            return
+
+        if self.path == "/etag" and self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if self.path == "/stray-304" and self.headers.get("Cache-Control") != "no-cache":
+            # A misbehaving cache in front of the server
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = PAGES[self.path].encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/etag":
+            self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def status_of(service: FileService, url: str):
+    try:
+        await service.extract_text_from_url(url)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+async def run(base: str) -> list:
+    problems = []
+    service = FileService()
+    try:
+        text = await service.extract_text_from_url(f"{base}/no-head-close")
+        if text != "Quarterly report\nRevenue grew in every region.":
+            problems.append(f"HTML without </head> extracted as {text!r}")
+
+        file_service_module.URL_FETCH_MAX_BYTES = BIG_BYTES // 2
+        for path in ("/big", "/big-chunked"):
+            status = await status_of(service, f"{base}{path}")
+            if status != 413:
+                problems.append(f"{path} over the byte cap answered {status}")
+
+        first = await service.extract_text_from_url(f"{base}/etag")
+        meta = request_context.start_request()
+        second = await service.extract_text_from_url(f"{base}/etag")
+        revalidated = [headers for path, headers in Handler.requests if path == "/etag"][-1]
+        if second != first or meta.get("fetch") != "not-modified" or revalidated.get("If-None-Match") != ETAG:
+            problems.append(f"ETag revalidation did not use the fetch cache ({meta.get('fetch')})")
+
+        text = await service.extract_text_from_url(f"{base}/stray-304")
+        if text != "Churn was flat.":
+            problems.append(f"unprompted 304 was not retried ({text!r})")
+    finally:
+        await service.aclose()
+    return problems
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        problems = asyncio.run(run(f"http://127.0.0.1:{server.server_port}"))
+    finally:
+        server.shutdown()
+
+    print(f"Served {len(Handler.requests)} requests")
+    if problems:
+        raise SystemExit(f"FAIL: {'; '.join(problems)}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Minimal stand-in for the parts of ``genai.Client`` used by GeminiService.
+
+Every call sleeps for a configurable latency instead of hitting the network,
+which makes it possible to measure the backend's own overhead and
+concurrency behaviour without spending API quota. Calls can also fail at a
+configurable rate with the same ``APIError`` types the real SDK raises.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import requests
+from google.genai import errors
+
+
+def _estimate_tokens(contents) -> int:
+    """Rough token count: four characters per token for text parts"""
+    return sum(len(part) // 4 for part in contents if isinstance(part, str))
+
+
+def api_error(code: int) -> errors.APIError:
+    """Build an SDK error as if the API had answered with ``code``"""
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": "Injected by the fake backend"}}).encode()
+    error_class = errors.ClientError if code < 500 else errors.ServerError
+    return error_class(code, response)
+
+
+def _inline_bytes(contents) -> int:
+    """Size of inline data parts (e.g. images sent with Part.from_bytes)"""
+    total = 0
+    for part in contents:
+        inline = getattr(part, "inline_data", None)
+        if inline is not None and inline.data:
+            total += len(inline.data)
+    return total
+
+
+def _file_bytes(contents) -> int:
+    """Size of the uploaded files referenced by a request"""
+    return sum(part.size for part in contents if isinstance(part, FakeFile))
+
+
+def _context_tokens(contents) -> int:
+    """Rough token count of cached contents: text, plus images and uploaded files"""
+    images = sum(1 for part in contents if getattr(part, "inline_data", None) is not None)
+    # About 32 tokens per second of 16 kHz, 16-bit audio
+    return _estimate_tokens(contents) + images * 258 + _file_bytes(contents) // 1000
+
+
+def _cached_content(config):
+    return config.get("cached_content") if isinstance(config, dict) else None
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0, cached_tokens: int = 0):
+        self.text = text
+        candidates_tokens = len(text) // 4
+        # As with the real API, the prompt count includes cached tokens
+        prompt_tokens += cached_tokens
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=candidates_tokens,
+            cached_content_token_count=cached_tokens or None,
+            total_token_count=prompt_tokens + candidates_tokens,
+        )
+
+
+def _fake_text(model, contents, config):
+    """Build a response body, honouring JSON schema requests"""
+    text = f"[{model}] response to {len(contents)} part(s)"
+    schema = (config or {}).get("response_schema") if isinstance(config, dict) else None
+    if schema:
+        return json.dumps({key: text for key in schema.get("properties", {})})
+    return text
+
+
+class FakeFile:
+    def __init__(self, name: str, path: str, ready_at: float = 0.0, size: int = 0,
+                 display_name: str = None):
+        self.name = name
+        self.path = path
+        self.ready_at = ready_at
+        self.size = size
+        self.size_bytes = size
+        self.display_name = display_name
+        self.create_time = datetime.now(timezone.utc)
+
+    @property
+    def state(self):
+        ready = time.monotonic() >= self.ready_at
+        return SimpleNamespace(name="ACTIVE" if ready else "PROCESSING")
+
+
+class _FakeAsyncModels:
+    def __init__(self, client):
+        self._client = client
+
+    async def generate_content(self, model, contents, config=None):
+        self._client.calls["generate_content"] += 1
+        cache = self._client.aio.caches.resolve(_cached_content(config))
+        cached_tokens = cache.tokens if cache else 0
+        await asyncio.sleep(self._client.call_latency(contents, cached_tokens))
+        self._client.maybe_fail()
+        response = FakeResponse(_fake_text(model, contents, config), _context_tokens(contents), cached_tokens)
+        self._client.record_tokens(response.usage_metadata)
+        return response
+
+    async def generate_content_stream(self, model, contents, config=None):
+        # Like google-genai 0.3.0, which reads the stream with blocking
+        # requests calls on the event loop
+        for chunk in self._client.models.generate_content_stream(model, contents, config):
+            yield chunk
+
+
+class _FakeAsyncFiles:
+    def __init__(self, client):
+        self._client = client
+        self._counter = itertools.count(1)
+        self._files = {}
+
+    async def upload(self, path, config=None):
+        self._client.calls["upload"] += 1
+        size = os.path.getsize(path)
+        self._client.bytes_sent += size
+        await asyncio.sleep(self._client.jittered(self._client.latency) + self._client.transfer_time(size))
+        self._client.maybe_fail()
+        uploaded = FakeFile(
+            f"files/fake-{next(self._counter)}",
+            str(path),
+            ready_at=time.monotonic() + self._client.processing_time,
+            size=size,
+            display_name=(config or {}).get("display_name"),
+        )
+        self._files[uploaded.name] = uploaded
+        return uploaded
+
+    async def get(self, name, config=None):
+        self._client.calls["get"] += 1
+        return self._files[name]
+
+    async def delete(self, name, config=None):
+        self._client.calls["delete"] += 1
+        await asyncio.sleep(self._client.delete_latency)
+        self._files.pop(name, None)
+
+    async def list(self, config=None):
+        self._client.calls["list"] += 1
+        return _FakeAsyncPager(list(self._files.values()))
+
+    @property
+    def stored(self) -> dict:
+        """Uploaded files not yet deleted, by name"""
+        return self._files
+
+
+class FakeCachedContent:
+    def __init__(self, name: str, model: str, contents: list, ttl_seconds: float):
+        self.name = name
+        self.model = model
+        self.contents = contents
+        self.tokens = _context_tokens(contents)
+        self.expires_at = time.monotonic() + ttl_seconds
+        self.usage_metadata = SimpleNamespace(total_token_count=self.tokens)
+
+
+def _ttl_seconds(config) -> float:
+    return float(str((config or {}).get("ttl", "3600s")).rstrip("s"))
+
+
+class _FakeAsyncCaches:
+    def __init__(self, client):
+        self._client = client
+        self._counter = itertools.count(1)
+        self._caches = {}
+
+    async def create(self, model, config=None):
+        self._client.calls["cache_create"] += 1
+        contents = list((config or {}).get("contents") or [])
+        # Tokenizing the context costs about as much as a normal call
+        await asyncio.sleep(self._client.call_latency(contents))
+        self._client.maybe_fail()
+        cache = FakeCachedContent(f"cachedContents/fake-{next(self._counter)}", model, contents, _ttl_seconds(config))
+        if cache.tokens < self._client.min_cache_tokens:
+            raise api_error(400)
+        self._caches[cache.name] = cache
+        return cache
+
+    async def update(self, name, config=None):
+        self._client.calls["cache_update"] += 1
+        await asyncio.sleep(self._client.jittered(self._client.latency) / 4)
+        cache = self.resolve(name)
+        cache.expires_at = time.monotonic() + _ttl_seconds(config)
+        return cache
+
+    async def delete(self, name, config=None):
+        self._client.calls["cache_delete"] += 1
+        await asyncio.sleep(self._client.delete_latency)
+        self._caches.pop(name, None)
+
+    def resolve(self, name):
+        """The live cache called ``name``, failing like the API if it is gone"""
+        if name is None:
+            return None
+        cache = self._caches.get(name)
+        if cache is None or cache.expires_at < time.monotonic():
+            raise api_error(404)
+        return cache
+
+    @property
+    def stored(self) -> dict:
+        """Caches not yet deleted, by name"""
+        return self._caches
+
+
+class _FakeAsyncPager:
+    def __init__(self, items):
+        self._items = items
+
+    async def __aiter__(self):
+        for item in self._items:
+            yield item
+
+
+class _FakeModels:
+    """Blocking variant, mirroring ``client.models`` on the real SDK"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        self._client.calls["generate_content"] += 1
+        time.sleep(self._client.call_latency(contents))
+        self._client.maybe_fail()
+        return FakeResponse(_fake_text(model, contents, config), _estimate_tokens(contents))
+
+    def generate_content_stream(self, model, contents, config=None):
+        self._client.calls["generate_content_stream"] += 1
+        words = _fake_text(model, contents, config).split(" ")
+        latency = self._client.call_latency(contents)
+        self._client.maybe_fail()
+        # Spread the configured latency over the streamed chunks, blocking
+        # between them as a network read would
+        for index, word in enumerate(words):
+            time.sleep(latency / len(words))
+            chunk = FakeResponse(word if index == 0 else f" {word}")
+            if index < len(words) - 1:
+                chunk.usage_metadata = None
+            else:
+                final = FakeResponse(" ".join(words), _context_tokens(contents))
+                chunk.usage_metadata = final.usage_metadata
+                self._client.record_tokens(final.usage_metadata)
+            yield chunk
+
+
+class FakeGenAIClient:
+    def __init__(self, latency: float = 0.5, processing_time: float = 0.0,
+                 latency_per_1k_tokens: float = 0.0, upload_bytes_per_sec: float = 0.0,
+                 latency_jitter: float = 0.0, failure_rate: float = 0.0,
+                 failure_codes=(429, 503), seed=None, latency_per_file_mb: float = 0.0,
+                 delete_latency: float = 0.0, cached_token_latency_factor: float = 0.1,
+                 min_cache_tokens: int = 4096):
+        self.latency = latency
+        # Sigma of a log-normal multiplier on each call's latency (0 = fixed)
+        self.latency_jitter = latency_jitter
+        # Fraction of calls that raise one of ``failure_codes`` after their latency
+        self.failure_rate = failure_rate
+        self.failure_codes = tuple(failure_codes)
+        self._random = random.Random(seed)
+        # Simulated uplink bandwidth for uploads and inline parts (0 = unlimited)
+        self.upload_bytes_per_sec = upload_bytes_per_sec
+        self.bytes_sent = 0
+        # Extra latency proportional to prompt size, to model long-context cost
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        # Extra latency per MB of uploaded files in the request (e.g. audio length)
+        self.latency_per_file_mb = latency_per_file_mb
+        # How long uploaded files stay in PROCESSING before turning ACTIVE
+        self.processing_time = processing_time
+        self.delete_latency = delete_latency
+        # Cached tokens cost this fraction of the per-token latency of fresh ones
+        self.cached_token_latency_factor = cached_token_latency_factor
+        self.min_cache_tokens = min_cache_tokens
+        self.tokens = {"prompt": 0, "cached": 0}
+        self.calls = {
+            "generate_content": 0,
+            "generate_content_stream": 0,
+            "upload": 0,
+            "get": 0,
+            "delete": 0,
+            "list": 0,
+            "cache_create": 0,
+            "cache_update": 0,
+            "cache_delete": 0,
+            "failures": 0,
+        }
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(
+            models=_FakeAsyncModels(self),
+            files=_FakeAsyncFiles(self),
+            caches=_FakeAsyncCaches(self),
+        )
+
+    @classmethod
+    def from_profile(cls, name: str, **overrides) -> "FakeGenAIClient":
+        """Build a client from one of the named PROFILES"""
+        return cls(**{**PROFILES[name], **overrides})
+
+    def jittered(self, seconds: float) -> float:
+        if not self.latency_jitter:
+            return seconds
+        return seconds * self._random.lognormvariate(0, self.latency_jitter)
+
+    def maybe_fail(self):
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.calls["failures"] += 1
+            raise api_error(self._random.choice(self.failure_codes))
+
+    def transfer_time(self, size: int) -> float:
+        return size / self.upload_bytes_per_sec if self.upload_bytes_per_sec else 0.0
+
+    def record_tokens(self, usage):
+        """Add a response's input tokens to the running totals"""
+        self.tokens["prompt"] += usage.prompt_token_count
+        self.tokens["cached"] += usage.cached_content_token_count or 0
+
+    def call_latency(self, contents, cached_tokens: int = 0) -> float:
+        inline = _inline_bytes(contents)
+        self.bytes_sent += inline
+        fresh_tokens = _estimate_tokens(contents) + cached_tokens * self.cached_token_latency_factor
+        base = (self.latency
+                + self.latency_per_1k_tokens * fresh_tokens / 1000
+                + self.latency_per_file_mb * _file_bytes(contents) / 1_000_000)
+        return self.jittered(base) + self.transfer_time(inline)
+
+
+# Named latency and failure profiles for benchmarks and load tests
+PROFILES = {
+    # Backend overhead only
+    "instant": {"latency": 0.0},
+    # Roughly what gemini-2.0-flash looks like from a well-connected server
+    "realistic": {
+        "latency": 0.6,
+        "latency_per_1k_tokens": 0.02,
+        "latency_jitter": 0.35,
+        "processing_time": 1.5,
+        "upload_bytes_per_sec": 25_000_000,
+    },
+    # Realistic, plus occasional transient server errors
+    "flaky": {
+        "latency": 0.6,
+        "latency_per_1k_tokens": 0.02,
+        "latency_jitter": 0.35,
+        "processing_time": 1.5,
+        "upload_bytes_per_sec": 25_000_000,
+        "failure_rate": 0.05,
+        "failure_codes": (500, 503),
+    },
+    # Quota pressure: many calls come back 429
+    "throttled": {
+        "latency": 0.6,
+        "latency_jitter": 0.35,
+        "processing_time": 1.5,
+        "failure_rate": 0.3,
+        "failure_codes": (429,),
+    },
+}
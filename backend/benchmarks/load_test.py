@@ -0,0 +1,167 @@
+"""Drive the API with concurrent requests against a fake Gemini backend.
+
+The app runs in-process behind httpx's ASGI transport, with the Gemini
+client replaced by ``FakeGenAIClient`` using one of its named profiles, so
+no API quota is spent. Representative PDFs, images and audio are generated
+up front. Reports p50/p95/p99 latency, throughput and error counts per
+endpoint plus peak memory, and can write them as JSON so runs can be
+compared over time. Run from the backend directory:
+
+    python -m benchmarks.load_test --requests 120 --concurrency 16 --profile realistic
+    python -m benchmarks.load_test --endpoints summarize --profile flaky --json results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import time
+
+# Configure the app before it is imported
+os.environ.setdefault("GEMINI_API_KEY", "unused-by-fake-backend")
+os.environ.setdefault("JOB_STORE", "memory")
+
+import httpx
+
+import main as app_module
+from benchmarks.fake_genai import PROFILES, FakeGenAIClient
+from benchmarks.sample_documents import make_jpeg, make_pdf, make_wav
+
+
+def build_workloads(pdf_pages: int, image_size: int, audio_seconds: float) -> dict:
+    """Endpoint name -> (path, form fields, files)"""
+    pdf = make_pdf(pdf_pages)
+    jpeg = make_jpeg(image_size, image_size * 3 // 4)
+    wav = make_wav(audio_seconds)
+    return {
+        "summarize": (
+            "/api/v1/summarize",
+            {"inputType": "File"},
+            {"file": ("report.pdf", pdf, "application/pdf")},
+        ),
+        "image": (
+            "/api/v1/analyze-image",
+            {"prompt": "Describe this image"},
+            {"image": ("photo.jpg", jpeg, "image/jpeg")},
+        ),
+        "conversation": (
+            "/api/v1/analyze-conversation",
+            {"mode": "pipeline"},
+            {"audio": ("call.wav", wav, "audio/wav")},
+        ),
+    }
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux; include extraction worker processes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round((own + children) / 1024, 1)
+
+
+async def run_load(workloads: dict, endpoints: list, requests: int, concurrency: int) -> dict:
+    results = {name: [] for name in endpoints}
+    queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(endpoints[index % len(endpoints)])
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+        async def worker():
+            while not queue.empty():
+                name = queue.get_nowait()
+                path, data, files = workloads[name]
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, data=data, files=files)
+                    status = response.status_code
+                except Exception:
+                    status = 0
+                results[name].append((time.perf_counter() - start, status))
+
+        # The lifespan sets up the executor and job queue, as under uvicorn
+        async with app_module.lifespan(app_module.app):
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+
+    report = {"elapsed_seconds": round(elapsed, 3), "throughput_rps": round(requests / elapsed, 2), "endpoints": {}}
+    for name, samples in results.items():
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, status in samples if status != 200)
+        report["endpoints"][name] = {
+            "requests": len(samples),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="summarize,image,conversation")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--image-size", type=int, default=2048, help="Image width in pixels (4:3)")
+    parser.add_argument("--audio-seconds", type=float, default=30)
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="Leave the response cache and upload registry on (repeat inputs will hit them)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's per-request INFO logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    workloads = build_workloads(args.pdf_pages, args.image_size, args.audio_seconds)
+    unknown = set(endpoints) - set(workloads)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    service = app_module.gemini_service
+    service.client = FakeGenAIClient.from_profile(args.profile, seed=args.seed)
+    if not args.keep_caches:
+        service.response_cache = None
+        service.upload_registry = None
+
+    baseline_rss = peak_rss_mb()
+    report = asyncio.run(run_load(workloads, endpoints, args.requests, args.concurrency))
+    report.update(
+        profile=args.profile,
+        concurrency=args.concurrency,
+        peak_rss_mb=peak_rss_mb(),
+        baseline_rss_mb=baseline_rss,
+        fake_calls=service.client.calls,
+    )
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, profile '{args.profile}': "
+          f"{report['elapsed_seconds']:.2f}s, {report['throughput_rps']:.2f} req/s")
+    print(f"{'endpoint':<14}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>8}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<14}{stats['requests']:>9}{stats['errors']:>8}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['throughput_rps']:>8.2f}")
+    print(f"Peak RSS: {report['peak_rss_mb']} MB (before load: {baseline_rss} MB)")
+    print(f"Fake backend calls: {report['fake_calls']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Replay a recording over the live conversation WebSocket, as a call would.
+
+Audio is sent in small chunks paced at a multiple of real time, either as
+binary PCM frames or as Plivo-style base64 mu-law media messages. Reports
+when partial transcripts and diarizations arrived and how long the final
+summary took after the stream stopped.
+
+By default the app is served in-process by uvicorn with Gemini replaced by
+the fake client, and the run fails unless a partial transcript arrived
+while audio was still streaming and a final summary arrived without
+errors. With --url it replays against a running server instead. Run from
+the backend directory:
+
+    python -m benchmarks.replay_live_audio --seconds 60 --speed 10
+    python -m benchmarks.replay_live_audio --wav call.wav --encoding mulaw --url ws://localhost:5001/api/v1/analyze-conversation/live
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import math
+import os
+import socket
+import time
+import wave
+
+os.environ.setdefault("GEMINI_API_KEY", "unused-by-fake-backend")
+os.environ.setdefault("JOB_STORE", "memory")
+os.environ.setdefault("ORPHAN_SWEEP_ENABLED", "false")
+
+import websockets
+
+from benchmarks.fake_genai import PROFILES
+from benchmarks.sample_documents import make_wav
+
+SAMPLE_RATE = 16000
+
+
+def mulaw_byte(sample: int) -> int:
+    """Encode one 16-bit sample as G.711 mu-law"""
+    sign = 0x80 if sample < 0 else 0
+    magnitude = min(abs(sample), 32635) + 0x84
+    exponent = max(0, magnitude.bit_length() - 8)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def load_pcm(args) -> tuple:
+    """(mono 16-bit PCM, sample rate) from --wav or a generated two-party call"""
+    if args.wav:
+        with wave.open(args.wav, "rb") as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise SystemExit("--wav must be a mono 16-bit PCM WAV file")
+            return wav.readframes(wav.getnframes()), wav.getframerate()
+    sample_rate = 8000 if args.encoding == "mulaw" else SAMPLE_RATE
+    with wave.open(io.BytesIO(make_wav(args.seconds, sample_rate, pause_seconds=0.4))) as wav:
+        return wav.readframes(wav.getnframes()), sample_rate
+
+
+def encode_chunks(pcm: bytes, sample_rate: int, args) -> list:
+    """Split audio into the messages a live client would send"""
+    chunk_bytes = int(sample_rate * args.chunk_ms / 1000) * 2
+    messages = []
+    for start in range(0, len(pcm), chunk_bytes):
+        chunk = pcm[start:start + chunk_bytes]
+        if args.encoding == "mulaw":
+            samples = memoryview(chunk).cast("h")
+            payload = base64.b64encode(bytes(mulaw_byte(sample) for sample in samples)).decode()
+            messages.append(json.dumps({"event": "media", "media": {"payload": payload}}))
+        else:
+            messages.append(chunk)
+    return messages
+
+
+async def replay(url: str, pcm: bytes, sample_rate: int, args) -> dict:
+    messages = encode_chunks(pcm, sample_rate, args)
+    interval = args.chunk_ms / 1000 / args.speed
+    events = []
+    timeline = {}
+
+    async with websockets.connect(url, max_size=None) as ws:
+        if args.encoding == "mulaw":
+            start = {"event": "start", "start": {"mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": sample_rate}}}
+        else:
+            start = {"event": "start", "encoding": "pcm_s16le", "sampleRate": sample_rate}
+        await ws.send(json.dumps(start))
+        began = time.perf_counter()
+
+        async def receive():
+            async for raw in ws:
+                event = json.loads(raw)
+                event["at"] = time.perf_counter() - began
+                events.append(event)
+                timeline.setdefault(f"first_{event['event']}", event["at"])
+                if args.verbose:
+                    print(f"{event['at']:7.2f}s {event['event']}")
+                if event["event"] in ("final", "error") and event.get("window") is None:
+                    return
+
+        receiver = asyncio.create_task(receive())
+        for index, message in enumerate(messages):
+            await ws.send(message)
+            # Pace against the clock so slow sends don't drift
+            delay = began + (index + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        timeline["stopped"] = time.perf_counter() - began
+        await ws.send(json.dumps({"event": "stop"}))
+        await asyncio.wait_for(receiver, timeout=args.timeout)
+
+    return {"events": events, "timeline": timeline}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def replay_in_process(pcm: bytes, sample_rate: int, args) -> dict:
+    import uvicorn
+
+    import main as app_module
+    from benchmarks.fake_genai import FakeGenAIClient
+
+    app_module.gemini_service.client = FakeGenAIClient.from_profile(args.profile, seed=0)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        return await replay(f"ws://127.0.0.1:{port}/api/v1/analyze-conversation/live", pcm, sample_rate, args)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", help="Mono 16-bit PCM WAV to replay (default: a generated call)")
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the generated call")
+    parser.add_argument("--encoding", choices=("pcm_s16le", "mulaw"), default="pcm_s16le")
+    parser.add_argument("--speed", type=float, default=10, help="Multiple of real time to send at")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--url", help="Replay against a running server instead of an in-process one")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--verbose", action="store_true", help="Print every event as it arrives")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    pcm, sample_rate = load_pcm(args)
+    duration = len(pcm) / 2 / sample_rate
+    if args.url:
+        result = asyncio.run(replay(args.url, pcm, sample_rate, args))
+    else:
+        result = asyncio.run(replay_in_process(pcm, sample_rate, args))
+
+    events = result["events"]
+    timeline = result["timeline"]
+    counts = {}
+    for event in events:
+        counts[event["event"]] = counts.get(event["event"], 0) + 1
+    final = next((event for event in events if event["event"] == "final"), None)
+
+    print(f"Replayed {duration:.1f}s of {args.encoding} audio at {args.speed:g}x "
+          f"({timeline['stopped']:.2f}s to send)")
+    print(f"Events: {counts}")
+    for key in ("first_transcript", "first_diarization"):
+        if key in timeline:
+            print(f"{key.replace('_', ' ')}: {timeline[key]:.2f}s after start")
+    if final:
+        print(f"final result: {final['at'] - timeline['stopped']:.2f}s after stop, "
+              f"{final['meta'].get('live_windows')} windows, {len(final['transcript'].splitlines())} transcript lines")
+
+    if args.url:
+        return
+    from services.live_conversation import LIVE_WINDOW_SECONDS
+
+    expected_partials = max(0, math.floor(duration / LIVE_WINDOW_SECONDS) - 1)
+    if final is None or not final.get("summary"):
+        raise SystemExit("FAIL: no final summary")
+    if counts.get("error"):
+        raise SystemExit("FAIL: the server reported errors")
+    if expected_partials and timeline.get("first_transcript", float("inf")) > timeline["stopped"]:
+        raise SystemExit("FAIL: no partial transcript arrived while audio was still streaming")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
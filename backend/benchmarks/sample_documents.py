@@ -0,0 +1,95 @@
+"""Generate representative input documents, images and audio"""
+import io
+import math
+import os
+import struct
+import wave
+
+LINE = "Quarterly review of revenue, churn and support volume across all regions."
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Build a text-only PDF with the given number of pages"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page in range(1, pages + 1):
+        lines = [f"Page {page}"] + [f"{LINE} ({page}.{line})" for line in range(lines_per_page)]
+        text_ops = "".join(f"({_escape(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text_ops}ET".encode()
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (page_tree, font, content)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref_offset
+    )
+    return bytes(output)
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """A noisy, blurred JPEG that compresses roughly like a real photo"""
+    from PIL import Image, ImageFilter
+
+    small = Image.frombytes("RGB", (width // 8, height // 8), os.urandom(width // 8 * height // 8 * 3))
+    image = small.resize((width, height), Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+
+def make_wav(seconds: float, sample_rate: int = 16000, pause_seconds: float = 0.0) -> bytes:
+    """A mono 16-bit WAV alternating two tones, standing in for a two-party call
+
+    Each two-second turn ends with ``pause_seconds`` of silence, giving
+    segmentation something to find.
+    """
+    turn_frames = 2 * sample_rate
+    pause_frames = min(turn_frames, int(pause_seconds * sample_rate))
+    turns = []
+    for frequency in (220, 330):
+        turn = bytearray()
+        for index in range(turn_frames - pause_frames):
+            sample = int(8000 * math.sin(2 * math.pi * frequency * index / sample_rate))
+            turn += struct.pack("<h", sample)
+        turns.append(bytes(turn) + b"\x00\x00" * pause_frames)
+
+    # Switch "speaker" every two seconds
+    total_frames = int(seconds * sample_rate)
+    frames = b"".join(turns[turn % 2] for turn in range(-(-total_frames // turn_frames)))
+
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames[:total_frames * 2])
+    return output.getvalue()
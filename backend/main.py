@@ -1,12 +1,40 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import binascii
+import json
 import os
+import secrets
+import time
 from dotenv import load_dotenv
-from google import genai
-from services.file_service import FileService
-from services.gemini_service import GeminiService
+
+# Load environment variables before the services read their settings at import
+load_dotenv()
+
+from services.file_service import FileService, PageLimits
+from services.gemini_service import GeminiService, CONVERSATION_MODES
+from services import metrics, request_context
+from services.cleanup import OrphanSweeper, cleanup_queue
+from services.rate_limiter import set_priority
+from services.job_queue import JobQueue, check_webhook_url, public_view
+from services.job_store import job_store_from_env
+from services.context_sessions import SessionNotFound
+from services.live_conversation import AudioFormat, LiveConversationSession
+from services.uploads import (
+    MAX_AUDIO_UPLOAD_BYTES,
+    MAX_BATCH_UPLOAD_BYTES,
+    MAX_DOCUMENT_UPLOAD_BYTES,
+    MAX_IMAGE_UPLOAD_BYTES,
+    SavedUpload,
+    save_upload,
+)
 import logging
 
 # Pydantic models for request bodies
@@ -18,15 +46,124 @@ class ConversationAnalysisRequest(BaseModel):
     transcript: str = None
     audioUrl: str = None
 
-# Load environment variables
-load_dotenv()
+class SessionQuestionRequest(BaseModel):
+    question: str
+
+DEFAULT_IMAGE_PROMPT = "Analyze this image and describe what you see in detail."
+
+# Add a Server-Timing header to every response, or only when the client
+# sends "X-Server-Timing: 1"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+SUMMARY_BATCH_MAX_ITEMS = int(os.getenv("SUMMARY_BATCH_MAX_ITEMS", "50"))
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", "4"))
+
+# Disable proxy buffering so server-sent events reach the client immediately
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Periodically remove temp files and Gemini uploads left behind by crashes or
+# failed deletions
+ORPHAN_SWEEP_ENABLED = os.getenv("ORPHAN_SWEEP_ENABLED", "true").lower() == "true"
+
+# Admin endpoints require "Authorization: Bearer <ADMIN_TOKEN>"; without a
+# token configured they are not available at all
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Import the SDK and parsers in the background once the server is up, so the
+# first real request doesn't pay for them
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+def warm_up():
+    start = time.perf_counter()
+    try:
+        gemini_service.warm_up()
+        file_service.warm_up()
+    except Exception as e:
+        logger.warning(f"Warm-up failed: {str(e)}")
+        return
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The async Gemini client and blocking helpers run on the loop's default
+    # executor; give it an explicit bound so concurrency is predictable.
+    max_workers = int(os.getenv("GEMINI_MAX_WORKERS", "32"))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini")
+    asyncio.get_running_loop().set_default_executor(executor)
+    logger.info(f"Default executor configured with {max_workers} workers")
+    await job_queue.start()
+    if ORPHAN_SWEEP_ENABLED:
+        orphan_sweeper.start()
+    if STARTUP_WARMUP:
+        # Runs after startup completes, so the first health check isn't delayed
+        asyncio.get_running_loop().run_in_executor(None, warm_up)
+    yield
+    await orphan_sweeper.stop()
+    await job_queue.stop()
+    await gemini_service.context_sessions.clear()
+    if gemini_service.upload_registry:
+        await gemini_service.upload_registry.clear()
+    await cleanup_queue.drain()
+    await file_service.aclose()
+    executor.shutdown(wait=False)
+
 # Initialize FastAPI app
-app = FastAPI(title="Plivo AI Backend", version="1.0.0")
+app = FastAPI(title="Plivo AI Backend", version="1.0.0", lifespan=lifespan)
+
+# Upload size limits per endpoint prefix, checked against Content-Length
+# before the multipart body is parsed
+UPLOAD_LIMITS = {
+    "/api/v1/summarize/batch": MAX_BATCH_UPLOAD_BYTES,
+    "/api/v1/summarize": MAX_DOCUMENT_UPLOAD_BYTES,
+    "/api/v1/analyze-image": MAX_IMAGE_UPLOAD_BYTES,
+    "/api/v1/analyze-conversation": MAX_AUDIO_UPLOAD_BYTES,
+    "/api/v1/sessions": MAX_AUDIO_UPLOAD_BYTES,
+}
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Registered before CORS so rejections still carry CORS headers
+@app.middleware("http")
+async def enforce_upload_limits(request: Request, call_next):
+    limit = next(
+        (limit for prefix, limit in UPLOAD_LIMITS.items() if request.url.path.startswith(prefix)),
+        None
+    )
+    content_length = request.headers.get("content-length", "")
+    if limit and content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD_BYTES:
+        logger.info(f"Rejected {request.url.path} upload of {content_length} bytes")
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File is too large. The limit is {limit // (1024 * 1024)} MB."}
+        )
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    timings = request_context.start_timings()
+    start = time.perf_counter()
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        route_path = route.path if route else "unmatched"
+        metrics.HTTP_REQUESTS.labels(request.method, route_path, str(status)).inc()
+        metrics.HTTP_REQUEST_DURATION.labels(request.method, route_path).observe(elapsed)
+    
+    # Streaming bodies are produced after the headers are sent, so their
+    # header only covers the work done before the first byte
+    if SERVER_TIMING_ENABLED or request.headers.get("x-server-timing") == "1":
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed)
+    return response
 
 # Configure CORS
 app.add_middleware(
@@ -37,72 +174,297 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure Gemini with new client API
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    raise ValueError("GEMINI_API_KEY not found in environment variables")
-
-# Set environment variable for the new genai client
-os.environ["GOOGLE_API_KEY"] = gemini_api_key
+# The Gemini client is created on first use; without a key the app still
+# starts and AI endpoints answer 503
+if not os.getenv("GEMINI_API_KEY"):
+    logger.warning("GEMINI_API_KEY not found in environment variables; AI endpoints will be unavailable")
 
 # Initialize services
 file_service = FileService()
 gemini_service = GeminiService()
+job_queue = JobQueue.from_env(job_store_from_env())
+
+async def files_in_use() -> tuple:
+    """Temp files and Gemini uploads the orphan sweeper must leave alone"""
+    paths = {
+        job["payload"]["upload"]["path"]
+        for job in await job_queue.store.list_unfinished()
+        if "upload" in job["payload"]
+    }
+    registry = gemini_service.upload_registry
+    names = registry.file_names() if registry else set()
+    return paths, names | gemini_service.context_sessions.file_names()
+
+# Without an API key there are no uploads to sweep, only local temp files
+orphan_sweeper = OrphanSweeper.from_env(
+    gemini_service._list_files if os.getenv("GEMINI_API_KEY") else None,
+    gemini_service._delete_file,
+    files_in_use
+)
+
+metrics.GEMINI_CALLS_IN_FLIGHT.set_function(lambda: gemini_service.rate_limiter.in_flight)
+metrics.GEMINI_QUEUE_DEPTH.set_function(lambda: gemini_service.rate_limiter.queue_depth)
+metrics.JOBS_QUEUED.set_function(lambda: job_queue.queued)
+metrics.CLEANUP_QUEUE_DEPTH.set_function(lambda: cleanup_queue.pending)
 
 @app.get("/")
 async def root():
     return {"message": "Plivo Backend is running with Python & Gemini!"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/api/v1/admin/stats", dependencies=[Depends(require_admin)])
+async def admin_stats():
+    cache = gemini_service.response_cache
+    return {
+        "file_processing": gemini_service.processing_stats.snapshot(),
+        "image_paths": gemini_service.image_path_stats.snapshot(),
+        "image_preprocessing": gemini_service.image_preprocess_stats,
+        "response_cache": cache.stats() if cache else None,
+        "upload_registry": gemini_service.upload_registry.stats() if gemini_service.upload_registry else None,
+        "context_sessions": gemini_service.context_sessions.stats(),
+        "jobs": job_queue.stats(),
+        "rate_limiter": gemini_service.rate_limiter.stats(),
+        "single_flight": {
+            "url_fetch": file_service.url_flight.stats(),
+            "generation": gemini_service.generation_flight.stats(),
+        },
+        "cleanup": {
+            "queue": cleanup_queue.stats(),
+            "sweeper": orphan_sweeper.stats(),
+        },
+    }
+
+@app.delete("/api/v1/admin/cache", dependencies=[Depends(require_admin)])
+async def invalidate_cache(key: str = None):
+    cache = gemini_service.response_cache
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Response cache is disabled")
+    removed = await cache.invalidate(key)
+    logger.info(f"Invalidated {removed} response cache entries")
+    return {"removed": removed}
+
+async def extract_summary_input(inputType: str, url: str, text: str, file: UploadFile,
+                                page_limits: PageLimits = None) -> str:
+    """Resolve the text to summarize from a URL, raw text or uploaded file"""
+    extracted_text = ""
+    
+    if inputType == "URL":
+        if not url:
+            raise HTTPException(status_code=400, detail="URL is required for URL input type")
+        logger.info(f"Processing URL: {url}")
+        extracted_text = await file_service.extract_text_from_url(url, page_limits)
+        
+    elif inputType == "Text":
+        if not text:
+            raise HTTPException(status_code=400, detail="Text is required for Text input type")
+        logger.info(f"Processing text input: {text[:100]}...")
+        extracted_text = text
+        
+    elif inputType == "File":
+        if not file:
+            raise HTTPException(status_code=400, detail="File is required for File input type")
+        logger.info(f"Processing file: {file.filename}")
+        extracted_text = await file_service.extract_text_from_file(file, page_limits)
+        
+    else:
+        raise HTTPException(status_code=400, detail="Invalid input type")
+    
+    if not extracted_text or not extracted_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from the source")
+    
+    logger.info(f"Extracted text length: {len(extracted_text)}")
+    return extracted_text
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_events(events, label: str):
+    """Relay service streaming events to the client as SSE"""
+    try:
+        async for event in events:
+            name = event.pop("event")
+            yield sse_event(name, event)
+    except HTTPException as e:
+        # The response has already started, so the status travels in the event
+        logger.info(f"Stopped streaming {label}: {e.detail}")
+        yield sse_event("error", {"detail": e.detail, "status": e.status_code})
+    except Exception as e:
+        logger.error(f"Error while streaming {label}: {str(e)}")
+        yield sse_event("error", {"detail": f"Failed to stream {label}: {str(e)}"})
+
 @app.post("/api/v1/summarize")
 async def summarize_content(
     inputType: str = Form(...),
     url: str = Form(None),
     text: str = Form(None),
-    file: UploadFile = File(None)
+    file: UploadFile = File(None),
+    pageStart: int = Form(None),
+    pageEnd: int = Form(None),
+    maxPages: int = Form(None)
 ):
     try:
         logger.info(f"Received summarization request: inputType={inputType}")
+        meta = request_context.start_request()
         
-        extracted_text = ""
-        
-        if inputType == "URL":
-            if not url:
-                raise HTTPException(status_code=400, detail="URL is required for URL input type")
-            logger.info(f"Processing URL: {url}")
-            extracted_text = await file_service.extract_text_from_url(url)
-            
-        elif inputType == "Text":
-            if not text:
-                raise HTTPException(status_code=400, detail="Text is required for Text input type")
-            logger.info(f"Processing text input: {text[:100]}...")
-            extracted_text = text
-            
-        elif inputType == "File":
-            if not file:
-                raise HTTPException(status_code=400, detail="File is required for File input type")
-            logger.info(f"Processing file: {file.filename}")
-            extracted_text = await file_service.extract_text_from_file(file)
-            
-        else:
-            raise HTTPException(status_code=400, detail="Invalid input type")
-        
-        if not extracted_text or not extracted_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from the source")
-        
-        logger.info(f"Extracted text length: {len(extracted_text)}")
+        page_limits = PageLimits(pageStart, pageEnd, maxPages)
+        extracted_text = await extract_summary_input(inputType, url, text, file, page_limits)
         
         # Generate summary using Gemini
         logger.info("Calling Gemini service for summarization")
         summary = await gemini_service.summarize_text(extracted_text)
         logger.info("Summarization completed successfully")
         
-        return {"summary": summary}
+        return {"summary": summary, "meta": meta}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in summarization: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to summarize content: {str(e)}")
+
+@app.post("/api/v1/summarize/stream")
+async def summarize_content_stream(
+    inputType: str = Form(...),
+    url: str = Form(None),
+    text: str = Form(None),
+    file: UploadFile = File(None),
+    pageStart: int = Form(None),
+    pageEnd: int = Form(None),
+    maxPages: int = Form(None)
+):
+    try:
+        logger.info(f"Received streaming summarization request: inputType={inputType}")
+        page_limits = PageLimits(pageStart, pageEnd, maxPages)
+        extracted_text = await extract_summary_input(inputType, url, text, file, page_limits)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in summarization: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to summarize content: {str(e)}")
+    
+    return StreamingResponse(
+        stream_events(gemini_service.stream_summary(extracted_text), "summary"),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+async def summarize_batch_item(item: dict) -> dict:
+    """Summarize one batch item, reporting failure in the result instead of raising"""
+    meta = request_context.start_request()
+    set_priority("batch")
+    result = {"index": item["index"], "inputType": item["inputType"], "source": item["source"]}
+    try:
+        if "error" in item:
+            raise HTTPException(status_code=400, detail=item["error"])
+        if item["inputType"] == "URL":
+            extracted_text = await file_service.extract_text_from_url(item["url"])
+        elif item["inputType"] == "File":
+            extracted_text = await file_service.extract_text_from_saved(item["saved"])
+        else:
+            extracted_text = item["text"]
+        
+        if not extracted_text or not extracted_text.strip():
+            raise HTTPException(status_code=400, detail="Could not extract text from the source")
+        
+        result["summary"] = await gemini_service.summarize_text(extracted_text)
+        result["status"] = "ok"
+    except HTTPException as e:
+        result.update(status="error", detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error summarizing batch item {item['index']}: {str(e)}")
+        result.update(status="error", detail=f"Failed to summarize content: {str(e)}")
+    finally:
+        if "saved" in item:
+            item["saved"].discard()
+    
+    result["meta"] = meta
+    return result
+
+async def stream_batch(items: List[dict]):
+    """Summarize items with bounded concurrency, emitting each result as it finishes"""
+    semaphore = asyncio.Semaphore(SUMMARY_BATCH_CONCURRENCY)
+    start = time.monotonic()
+    
+    async def run(item):
+        async with semaphore:
+            return await summarize_batch_item(item)
+    
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    succeeded = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            succeeded += result["status"] == "ok"
+            yield sse_event("item", result)
+        
+        yield sse_event("done", {
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "elapsed_ms": round((time.monotonic() - start) * 1000),
+        })
+    finally:
+        # Client went away: stop outstanding work and drop unprocessed uploads
+        for task in tasks:
+            task.cancel()
+        for item in items:
+            if "saved" in item:
+                item["saved"].discard()
+
+@app.post("/api/v1/summarize/batch")
+async def summarize_batch(
+    files: List[UploadFile] = File(None),
+    urls: List[str] = Form(None),
+    texts: List[str] = Form(None)
+):
+    files, urls, texts = files or [], urls or [], texts or []
+    total = len(files) + len(urls) + len(texts)
+    logger.info(f"Received batch summarization request: {len(files)} files, {len(urls)} URLs, {len(texts)} texts")
+    
+    if total == 0:
+        raise HTTPException(status_code=400, detail="At least one file, URL or text is required")
+    if total > SUMMARY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {SUMMARY_BATCH_MAX_ITEMS} items")
+    
+    items = []
+    try:
+        # Save uploads now; the form is closed once the response starts streaming
+        for file in files:
+            item = {"index": len(items), "inputType": "File", "source": file.filename}
+            try:
+                file_service.check_file_type(file.content_type)
+                item["saved"] = await save_upload(file, MAX_DOCUMENT_UPLOAD_BYTES)
+            except HTTPException as e:
+                # Reported with the other results rather than failing the batch
+                item["error"] = e.detail
+            items.append(item)
+        for url in urls:
+            items.append({"index": len(items), "inputType": "URL", "source": url, "url": url})
+        for text in texts:
+            items.append({"index": len(items), "inputType": "Text", "source": text[:100], "text": text})
+    except BaseException:
+        for item in items:
+            if "saved" in item:
+                item["saved"].discard()
+        raise
+    
+    return StreamingResponse(
+        stream_batch(items),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
 @app.post("/api/v1/analyze-image")
 async def analyze_image(
@@ -111,17 +473,18 @@ async def analyze_image(
 ):
     try:
         logger.info(f"Received image analysis request: filename={image.filename}")
+        meta = request_context.start_request()
         
         if not image.content_type or not image.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        analysis_prompt = prompt or "Analyze this image and describe what you see in detail."
+        analysis_prompt = prompt or DEFAULT_IMAGE_PROMPT
         logger.info(f"Using prompt: {analysis_prompt}")
         
         # Analyze image using Gemini File API
         analysis = await gemini_service.analyze_image_from_file(image, analysis_prompt)
         
-        return {"analysis": analysis}
+        return {"analysis": analysis, "meta": meta}
         
     except HTTPException:
         raise
@@ -129,20 +492,48 @@ async def analyze_image(
         logger.error(f"Error in image analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to analyze image: {str(e)}")
 
+@app.post("/api/v1/analyze-image/stream")
+async def analyze_image_stream(
+    image: UploadFile = File(...),
+    prompt: str = Form(None)
+):
+    logger.info(f"Received streaming image analysis request: filename={image.filename}")
+    
+    if not image.content_type or not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    analysis_prompt = prompt or DEFAULT_IMAGE_PROMPT
+    # Save the upload now; the form is closed once the response starts streaming
+    saved = await save_upload(image, MAX_IMAGE_UPLOAD_BYTES)
+    
+    return StreamingResponse(
+        stream_events(
+            gemini_service.stream_image_analysis(saved, analysis_prompt),
+            "image analysis"
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.post("/api/v1/analyze-conversation")
 async def analyze_conversation(
-    audio: UploadFile = File(...)
+    audio: UploadFile = File(...),
+    mode: str = Form("pipeline")
 ):
     try:
         logger.info(f"Received conversation analysis request: filename={audio.filename}")
+        meta = request_context.start_request()
         
         if not audio.content_type or not audio.content_type.startswith('audio/'):
             raise HTTPException(status_code=400, detail="File must be an audio file")
         
+        if mode not in CONVERSATION_MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(CONVERSATION_MODES)}")
+        
         # Process audio file through speech-to-text, diarization, and analysis
-        analysis_result = await gemini_service.analyze_conversation_from_audio(audio)
+        analysis_result = await gemini_service.analyze_conversation_from_audio(audio, mode=mode)
         
-        return analysis_result
+        return {**analysis_result, "meta": meta}
         
     except HTTPException:
         raise
@@ -150,6 +541,224 @@ async def analyze_conversation(
         logger.error(f"Error in conversation analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to analyze conversation: {str(e)}")
 
+async def run_conversation_job(payload: dict, progress) -> dict:
+    """Job handler for queued conversation analysis"""
+    meta = request_context.start_request()
+    set_priority("background")
+    saved = SavedUpload(**payload["upload"])
+    if not os.path.exists(saved.path):
+        raise Exception("The uploaded audio is no longer available")
+    
+    try:
+        result = await gemini_service.analyze_saved_conversation(saved, payload["mode"], progress)
+    except asyncio.CancelledError:
+        # Shutting down: keep the audio so the job can resume after a restart
+        raise
+    except Exception:
+        saved.discard()
+        raise
+    saved.discard()
+    return {**result, "meta": meta}
+
+job_queue.register("conversation", run_conversation_job)
+
+@app.post("/api/v1/analyze-conversation/jobs", status_code=202)
+async def submit_conversation_job(
+    audio: UploadFile = File(...),
+    mode: str = Form("pipeline"),
+    webhookUrl: str = Form(None)
+):
+    logger.info(f"Received conversation analysis job: filename={audio.filename}")
+    
+    if not audio.content_type or not audio.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    
+    if mode not in CONVERSATION_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(CONVERSATION_MODES)}")
+    
+    if webhookUrl:
+        try:
+            await check_webhook_url(webhookUrl)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # Check before saving so a full queue doesn't cost an upload to disk
+    job_queue.ensure_capacity()
+    saved = await save_upload(audio, MAX_AUDIO_UPLOAD_BYTES)
+    payload = {
+        "upload": {
+            "path": saved.path,
+            "size": saved.size,
+            "sha256": saved.sha256,
+            "filename": saved.filename,
+            "content_type": saved.content_type,
+        },
+        "mode": mode,
+    }
+    try:
+        job = await job_queue.submit("conversation", payload, webhookUrl)
+    except BaseException:
+        saved.discard()
+        raise
+    
+    return {**public_view(job), "statusUrl": f"/api/v1/jobs/{job['id']}"}
+
+@app.websocket("/api/v1/analyze-conversation/live")
+async def analyze_conversation_live(websocket: WebSocket):
+    """Analyze a conversation while it happens
+    
+    The client sends a JSON start message giving the audio format
+    (``{"event": "start", "encoding": "pcm_s16le", "sampleRate": 16000}``,
+    or a Plivo audio stream's start event), then mono audio either as
+    binary frames or as Plivo-style ``{"event": "media", "media":
+    {"payload": <base64>}}`` messages, and finally ``{"event": "stop"}``.
+    The server pushes "transcript" and "diarization" events as windows are
+    processed and a "final" event with the summary after the stop.
+    """
+    await websocket.accept()
+    meta = request_context.start_request()
+    session = None
+    
+    async def send(event: dict):
+        await websocket.send_json(event)
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                logger.info("Live conversation client disconnected before stopping")
+                return
+            
+            if message.get("bytes") is not None:
+                event = {"event": "media", "audio": message["bytes"]}
+            else:
+                event = json.loads(message.get("text") or "{}")
+            
+            if event.get("event") == "start" and session is None:
+                audio_format = AudioFormat.from_start_message(event)
+                # Fail now rather than on the first window if there's no API key
+                gemini_service.client
+                session = LiveConversationSession(gemini_service, audio_format, send)
+                logger.info(f"Live conversation started ({audio_format.encoding}, {audio_format.sample_rate} Hz)")
+                await send({"event": "ready"})
+            elif event.get("event") == "media":
+                if session is None:
+                    raise ValueError("Send a start message before any audio")
+                audio = event.get("audio")
+                if audio is None:
+                    audio = base64.b64decode((event.get("media") or {}).get("payload", ""), validate=True)
+                await session.feed(audio)
+            elif event.get("event") == "stop":
+                if session is None:
+                    raise ValueError("The stream stopped before it started")
+                result = await session.finish()
+                await send({"event": "final", **result, "meta": meta})
+                await websocket.close()
+                return
+            # Other events (e.g. Plivo's "playedStream") carry nothing to analyze
+    
+    except WebSocketDisconnect:
+        logger.info("Live conversation client disconnected")
+    except (ValueError, binascii.Error) as e:
+        await send({"event": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+    except HTTPException as e:
+        await send({"event": "error", "detail": e.detail})
+        await websocket.close(code=1011)
+    except Exception as e:
+        logger.error(f"Error in live conversation analysis: {str(e)}")
+        await send({"event": "error", "detail": f"Failed to analyze conversation: {str(e)}"})
+        await websocket.close(code=1011)
+    finally:
+        if session is not None:
+            await session.close()
+
+@app.get("/api/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return public_view(job)
+
+@app.post("/api/v1/sessions", status_code=201)
+async def create_session(
+    image: UploadFile = File(None),
+    audio: UploadFile = File(None),
+    inputType: str = Form(None),
+    url: str = Form(None),
+    text: str = Form(None),
+    file: UploadFile = File(None),
+    prompt: str = Form(None)
+):
+    """Start a follow-up question session about an image, document or call recording
+    
+    Send exactly one of ``image``, ``audio`` or a document (``inputType``
+    with ``url``, ``text`` or ``file``, as for /api/v1/summarize). The
+    response answers ``prompt`` (or a default analysis) and returns the
+    session id for /api/v1/sessions/{id}/questions.
+    """
+    try:
+        meta = request_context.start_request()
+        if sum(source is not None for source in (image, audio, inputType)) != 1:
+            raise HTTPException(status_code=400, detail="Send exactly one of image, audio or inputType")
+        
+        if image is not None:
+            logger.info(f"Received image session request: filename={image.filename}")
+            if not image.content_type or not image.content_type.startswith('image/'):
+                raise HTTPException(status_code=400, detail="File must be an image")
+            saved = await save_upload(image, MAX_IMAGE_UPLOAD_BYTES)
+            result = await gemini_service.create_image_session(saved, prompt)
+        elif audio is not None:
+            logger.info(f"Received conversation session request: filename={audio.filename}")
+            if not audio.content_type or not audio.content_type.startswith('audio/'):
+                raise HTTPException(status_code=400, detail="File must be an audio file")
+            saved = await save_upload(audio, MAX_AUDIO_UPLOAD_BYTES)
+            result = await gemini_service.create_conversation_session(saved, prompt)
+        else:
+            logger.info(f"Received document session request: inputType={inputType}")
+            extracted_text = await extract_summary_input(inputType, url, text, file)
+            source = url or (file.filename if file else None)
+            result = await gemini_service.create_document_session(extracted_text, source, prompt)
+        
+        return {**result, "meta": meta}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating session: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to start session: {str(e)}")
+
+@app.post("/api/v1/sessions/{session_id}/questions")
+async def ask_session_question(session_id: str, request: SessionQuestionRequest):
+    try:
+        meta = request_context.start_request()
+        if not request.question.strip():
+            raise HTTPException(status_code=400, detail="question must not be empty")
+        
+        result = await gemini_service.ask_session(session_id, request.question)
+        return {**result, "meta": meta}
+        
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error answering session question: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to answer question: {str(e)}")
+
+@app.get("/api/v1/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = gemini_service.context_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session.view()
+
+@app.delete("/api/v1/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not await gemini_service.context_sessions.remove(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": session_id}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 5001))
@@ -0,0 +1,196 @@
+import array
+import logging
+import math
+import os
+import re
+import sys
+import wave
+from typing import List, Optional, Tuple
+
+from services.uploads import new_temp_path, saved_from_path
+
+logger = logging.getLogger(__name__)
+
+# Recordings longer than one segment are transcribed as overlapping segments
+AUDIO_SEGMENT_ENABLED = os.getenv("AUDIO_SEGMENT_ENABLED", "true").lower() == "true"
+AUDIO_SEGMENT_SECONDS = float(os.getenv("AUDIO_SEGMENT_SECONDS", "300"))
+AUDIO_SEGMENT_OVERLAP_SECONDS = float(os.getenv("AUDIO_SEGMENT_OVERLAP_SECONDS", "4"))
+AUDIO_SEGMENT_CONCURRENCY = int(os.getenv("AUDIO_SEGMENT_CONCURRENCY", "4"))
+# How far either side of a target cut to look for a pause in speech
+AUDIO_SILENCE_SEARCH_SECONDS = float(os.getenv("AUDIO_SILENCE_SEARCH_SECONDS", "10"))
+
+# Energy is measured over windows of this length when looking for pauses
+SILENCE_WINDOW_SECONDS = 0.05
+COPY_BLOCK_FRAMES = 64 * 1024
+
+TIMESTAMP_PATTERN = re.compile(r"^\s*\[(?:(\d+):)?(\d{1,3}):(\d{2})(?:\.\d+)?\]\s*")
+
+class AudioSegment:
+    """One slice of a recording, written to its own WAV file
+
+    ``start`` and ``end`` are the cut points in seconds. The audio on disk
+    extends past them by the overlap so words spoken across a cut are
+    heard whole in at least one segment.
+    """
+
+    def __init__(self, index: int, saved, start: float, end: float, offset: float):
+        self.index = index
+        self.saved = saved
+        self.start = start
+        self.end = end
+        # Position of the segment file's first frame within the recording
+        self.offset = offset
+
+def wav_duration(path: str) -> Optional[float]:
+    """Length in seconds of a PCM WAV file, or None for any other format"""
+    try:
+        with wave.open(path, "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+def quietest_point(pcm: bytes, rate: int, channels: int, target: float) -> Optional[float]:
+    """Seconds into 16-bit PCM audio of its quietest moment
+
+    Among equally quiet windows the one closest to ``target`` wins. Returns
+    None when the audio is shorter than one window.
+    """
+    window = max(1, int(rate * SILENCE_WINDOW_SECONDS))
+    # Sample a subset of each window; plenty to tell speech from a pause
+    stride = channels * max(1, window // 200)
+
+    samples = array.array("h", pcm[:len(pcm) - len(pcm) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    best = None
+    samples_per_window = window * channels
+    for offset in range(0, len(samples) - samples_per_window + 1, samples_per_window):
+        energy = sum(s * s for s in samples[offset:offset + samples_per_window:stride])
+        center = (offset // channels + window // 2) / rate
+        key = (energy, abs(center - target))
+        if best is None or key < best[0]:
+            best = (key, center)
+    return best[1] if best else None
+
+def find_cut(wav: wave.Wave_read, target: float, search: float) -> float:
+    """Move a cut point to the quietest moment within ``search`` seconds of it"""
+    rate = wav.getframerate()
+    if wav.getsampwidth() != 2 or search <= 0:
+        # Energy is only measured for 16-bit PCM; cut other widths on time
+        return target
+    start = max(0, int((target - search) * rate))
+    end = min(wav.getnframes(), int((target + search) * rate))
+    wav.setpos(start)
+    point = quietest_point(wav.readframes(end - start), rate, wav.getnchannels(), target - start / rate)
+    return target if point is None else start / rate + point
+
+def plan_cuts(wav: wave.Wave_read, segment_seconds: float, search: float) -> List[float]:
+    """Cut points from 0 to the end, spreading segments evenly over the recording"""
+    duration = wav.getnframes() / wav.getframerate()
+    count = max(1, math.ceil(duration / segment_seconds))
+    length = duration / count
+    # Never search so far that neighbouring cuts could cross
+    search = min(search, length / 3)
+    cuts = [0.0]
+    for index in range(1, count):
+        cuts.append(find_cut(wav, index * length, search))
+    cuts.append(duration)
+    return cuts
+
+def _write_slice(wav: wave.Wave_read, start: int, end: int, path: str):
+    with wave.open(path, "wb") as out:
+        out.setparams(wav.getparams())
+        wav.setpos(start)
+        remaining = end - start
+        while remaining > 0:
+            frames = wav.readframes(min(COPY_BLOCK_FRAMES, remaining))
+            if not frames:
+                break
+            out.writeframes(frames)
+            remaining -= min(COPY_BLOCK_FRAMES, remaining)
+
+def split_wav(path: str, segment_seconds: Optional[float] = None, overlap: Optional[float] = None,
+              search: Optional[float] = None) -> List[AudioSegment]:
+    """Split a WAV recording at pauses into overlapping segment files (blocking)
+
+    Settings default to the AUDIO_* module values. Returns an empty list
+    when the file isn't a PCM WAV or is short enough to transcribe in one
+    call. The caller owns the segment files.
+    """
+    segment_seconds = AUDIO_SEGMENT_SECONDS if segment_seconds is None else segment_seconds
+    overlap = AUDIO_SEGMENT_OVERLAP_SECONDS if overlap is None else overlap
+    search = AUDIO_SILENCE_SEARCH_SECONDS if search is None else search
+    if wav_duration(path) is None:
+        return []
+
+    segments = []
+    try:
+        with wave.open(path, "rb") as wav:
+            rate = wav.getframerate()
+            total_frames = wav.getnframes()
+            if total_frames / rate <= segment_seconds:
+                return []
+            cuts = plan_cuts(wav, segment_seconds, search)
+            for index, (start, end) in enumerate(zip(cuts, cuts[1:])):
+                first = max(0, int((start - overlap / 2) * rate))
+                last = min(total_frames, int((end + overlap / 2) * rate))
+                segment_path = new_temp_path(f"segment{index}.wav")
+                _write_slice(wav, first, last, segment_path)
+                saved = saved_from_path(segment_path, f"segment{index}.wav", "audio/wav")
+                segments.append(AudioSegment(index, saved, start, end, first / rate))
+    except BaseException:
+        for segment in segments:
+            segment.saved.cleanup()
+        raise
+
+    logger.info(f"Split {path} into {len(segments)} segments")
+    return segments
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"[{hours}:{minutes:02d}:{seconds:02d}]"
+    return f"[{minutes:02d}:{seconds:02d}]"
+
+def parse_timestamp(line: str) -> Tuple[Optional[float], str]:
+    """Split a leading [MM:SS] or [H:MM:SS] timestamp off a transcript line"""
+    match = TIMESTAMP_PATTERN.match(line)
+    if not match:
+        return None, line
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds), line[match.end():]
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def stitch_transcripts(segments: List[AudioSegment], transcripts: List[str], complete: bool = True) -> str:
+    """Join per-segment transcripts into one with timestamps from the recording start
+
+    Each segment keeps only the lines that begin between its own cut points,
+    which drops what was transcribed twice in the overlaps. Lines without a
+    timestamp belong with the line before them. A line repeated verbatim
+    across a seam is kept once. The last segment also keeps what follows
+    its end cut, unless ``complete`` is False because more segments are
+    still to come.
+    """
+    lines = []
+    for segment, transcript in zip(segments, transcripts):
+        position = segment.start
+        at_seam = bool(lines)
+        for raw in transcript.splitlines():
+            if not raw.strip():
+                continue
+            timestamp, text = parse_timestamp(raw)
+            if timestamp is not None:
+                position = segment.offset + timestamp
+            last_segment = complete and segment.index == len(segments) - 1
+            if position < segment.start or (position >= segment.end and not last_segment):
+                continue
+            if at_seam and _normalize(lines[-1][1]) == _normalize(text):
+                continue
+            at_seam = False
+            lines.append((position, text.strip()))
+    return "\n".join(f"{format_timestamp(position)} {text}" for position, text in lines)
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Content-addressed cache for model responses
+
+    Entries live in an in-memory LRU with a TTL. When ``sqlite_path`` is set,
+    they are also written to a SQLite database so several uvicorn workers on
+    the same host can share hits.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600, sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "disk_hits": 0, "sets": 0, "evictions": 0}
+
+        if self.sqlite_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+            sqlite_path=os.getenv("RESPONSE_CACHE_SQLITE_PATH") or None,
+        )
+
+    @staticmethod
+    def make_key(model: str, prompt: str, content: Union[str, bytes] = b"") -> str:
+        """Hash the model name, prompt and source content into a cache key"""
+        digest = hashlib.sha256()
+        for part in (model, prompt, content):
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            # Length-prefix each part so boundaries can't be shifted
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.sqlite_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _disk_get(self, key: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row and row[1] > time.time():
+            return row
+        return None
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def _disk_delete(self, key: Optional[str]) -> int:
+        with self._connect() as conn:
+            if key is None:
+                return conn.execute("DELETE FROM responses").rowcount
+            return conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return value
+            del self._entries[key]
+
+        if self.sqlite_path:
+            try:
+                row = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache read failed: {str(e)}")
+                row = None
+            if row:
+                self._remember(key, row[0], row[1])
+                self._counters["hits"] += 1
+                self._counters["disk_hits"] += 1
+                return row[0]
+
+        self._counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        self._counters["sets"] += 1
+
+        if self.sqlite_path:
+            try:
+                await asyncio.to_thread(self._disk_set, key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache write failed: {str(e)}")
+
+    async def invalidate(self, key: Optional[str] = None) -> int:
+        """Drop one entry, or everything when ``key`` is None"""
+        if key is None:
+            removed = len(self._entries)
+            self._entries.clear()
+        else:
+            removed = 1 if self._entries.pop(key, None) else 0
+
+        if self.sqlite_path:
+            removed = max(removed, await asyncio.to_thread(self._disk_delete, key))
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "backend": "sqlite" if self.sqlite_path else "memory",
+        }
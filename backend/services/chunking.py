@@ -0,0 +1,59 @@
+from typing import List
+
+# Extracted PDF text separates pages with a form feed
+PAGE_BREAK = "\f"
+
+# Boundaries to split on, from coarsest to finest
+SEPARATORS = (PAGE_BREAK, "\n\n", "\n", ". ", " ")
+
+# Rough characters-per-token ratio for English text
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+def _split_oversized(piece: str, max_chars: int, separators) -> List[str]:
+    """Break a piece into parts no longer than max_chars on the coarsest boundary possible"""
+    if len(piece) <= max_chars:
+        return [piece]
+    if not separators:
+        return [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+
+    separator, finer = separators[0], separators[1:]
+    if separator not in piece:
+        return _split_oversized(piece, max_chars, finer)
+
+    parts = piece.split(separator)
+    result = []
+    for index, part in enumerate(parts):
+        # Keep the separator attached so chunks can be rejoined losslessly
+        if index < len(parts) - 1:
+            part += separator
+        result.extend(_split_oversized(part, max_chars, finer))
+    return result
+
+def pack_pieces(pieces: List[str], max_chars: int, joiner: str = "") -> List[str]:
+    """Greedily pack consecutive pieces into groups of at most max_chars"""
+    groups = []
+    current = []
+    current_length = 0
+
+    for piece in pieces:
+        added = len(piece) + (len(joiner) if current else 0)
+        if current and current_length + added > max_chars:
+            groups.append(joiner.join(current))
+            current = []
+            current_length = 0
+            added = len(piece)
+        current.append(piece)
+        current_length += added
+
+    if current:
+        groups.append(joiner.join(current))
+    return groups
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split text into chunks within a token budget, preferring page and paragraph boundaries"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = _split_oversized(text, max_chars, SEPARATORS)
+    return [chunk for chunk in pack_pieces(pieces, max_chars) if chunk.strip()]
@@ -0,0 +1,281 @@
+import asyncio
+import contextvars
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from typing import Optional
+
+from services.metrics import CLEANUP_DELETIONS, SWEPT_BYTES, SWEPT_FILES
+from services.rate_limiter import set_priority
+
+logger = logging.getLogger(__name__)
+
+# Prefix for every temp file and Gemini upload the backend creates, so
+# leftovers can be told apart from anything else in the same place
+TEMP_FILE_PREFIX = "plivo_"
+
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "32"))
+CLEANUP_DRAIN_TIMEOUT = float(os.getenv("CLEANUP_DRAIN_TIMEOUT", "10"))
+
+def _unlink_all(paths: list) -> tuple:
+    """Remove local files, returning (removed, failed) counts (blocking)"""
+    removed = failed = 0
+    for path in paths:
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            failed += 1
+            logger.warning(f"Failed to delete temp file {path}: {str(e)}")
+    return removed, failed
+
+class CleanupQueue:
+    """Delete temp files and Gemini uploads in the background, in batches
+
+    Callers enqueue and return immediately, so deletions never add to
+    response latency. A single worker task per event loop drains the queue:
+    local files are unlinked together on a thread, remote uploads are
+    deleted concurrently through the caller-supplied delete function.
+    Anything still pending when the process dies is left for the sweeper.
+    """
+
+    def __init__(self, batch_size: int = 32):
+        self.batch_size = batch_size
+        self._pending = deque()
+        self._wakeup = None
+        self._worker = None
+        self._busy = False
+        self._counters = {"local_deleted": 0, "remote_deleted": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls) -> "CleanupQueue":
+        return cls(batch_size=CLEANUP_BATCH_SIZE)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def delete_local(self, path: str):
+        """Queue a local temp file for deletion"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called outside the event loop: nothing to keep off the hot path
+            _unlink_all([path])
+            return
+        self._pending.append(("local", path, None))
+        self._wake(loop)
+
+    def delete_remote(self, name: str, delete_file):
+        """Queue a Gemini upload for deletion with ``delete_file(name)``"""
+        self._pending.append(("remote", name, delete_file))
+        try:
+            self._wake(asyncio.get_running_loop())
+        except RuntimeError:
+            pass
+
+    def _wake(self, loop: asyncio.AbstractEventLoop):
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            # A fresh context keeps the worker's timings and priority out of
+            # the request that happened to start it
+            self._worker = loop.create_task(self._run(), context=contextvars.Context())
+        self._wakeup.set()
+
+    async def _run(self):
+        set_priority("background")
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._busy = True
+            try:
+                await self._process(batch)
+            finally:
+                self._busy = False
+
+    async def _process(self, batch: list):
+        paths = [target for kind, target, _ in batch if kind == "local"]
+        if paths:
+            removed, failed = await asyncio.to_thread(_unlink_all, paths)
+            self._counters["local_deleted"] += removed
+            self._counters["failed"] += failed
+            CLEANUP_DELETIONS.labels(kind="local", outcome="ok").inc(removed)
+            CLEANUP_DELETIONS.labels(kind="local", outcome="error").inc(failed)
+
+        remote = [(target, delete_file) for kind, target, delete_file in batch if kind == "remote"]
+        results = await asyncio.gather(
+            *(delete_file(name) for name, delete_file in remote), return_exceptions=True
+        )
+        for (name, _), result in zip(remote, results):
+            if isinstance(result, Exception):
+                self._counters["failed"] += 1
+                CLEANUP_DELETIONS.labels(kind="remote", outcome="error").inc()
+                logger.warning(f"Failed to delete uploaded file {name}: {str(result)}")
+            else:
+                self._counters["remote_deleted"] += 1
+                CLEANUP_DELETIONS.labels(kind="remote", outcome="ok").inc()
+
+    async def drain(self, timeout: float = CLEANUP_DRAIN_TIMEOUT):
+        """Wait for queued deletions to finish (e.g. on shutdown), then stop the worker"""
+        deadline = time.monotonic() + timeout
+        if self._pending:
+            self._wake(asyncio.get_running_loop())
+        while (self._pending or self._busy) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._pending:
+            logger.warning(f"Shutting down with {len(self._pending)} deletions still queued")
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {**self._counters, "pending": self.pending}
+
+cleanup_queue = CleanupQueue.from_env()
+
+def sweep_temp_files(max_age_seconds: float, protected: set, temp_dir: Optional[str] = None) -> tuple:
+    """Remove prefixed temp files older than ``max_age_seconds`` (blocking)
+
+    Returns (files removed, bytes reclaimed). Paths in ``protected`` are
+    kept whatever their age.
+    """
+    cutoff = time.time() - max_age_seconds
+    protected = {os.path.abspath(path) for path in protected}
+    removed = reclaimed = 0
+    for entry in os.scandir(temp_dir or tempfile.gettempdir()):
+        if not entry.name.startswith(TEMP_FILE_PREFIX) or os.path.abspath(entry.path) in protected:
+            continue
+        try:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        reclaimed += stat.st_size
+    return removed, reclaimed
+
+class OrphanSweeper:
+    """Periodically remove temp files and Gemini uploads that cleanup missed
+
+    These are left behind when a process dies mid-request or a deletion
+    fails. Only files carrying TEMP_FILE_PREFIX are considered: local temp
+    files older than ``temp_max_age_seconds`` and uploads older than
+    ``upload_max_age_seconds``. ``in_use`` is an async callable returning
+    (local paths, upload names) that must survive regardless of age, such
+    as the audio of queued jobs. Without ``list_uploads`` only local temp
+    files are swept.
+    """
+
+    def __init__(self, list_uploads, delete_upload, in_use, interval_seconds: float = 600,
+                 temp_max_age_seconds: float = 3600, upload_max_age_seconds: float = 25 * 3600,
+                 temp_dir: Optional[str] = None):
+        self._list_uploads = list_uploads
+        self._delete_upload = delete_upload
+        self._in_use = in_use
+        self.interval_seconds = interval_seconds
+        self.temp_max_age_seconds = temp_max_age_seconds
+        self.upload_max_age_seconds = upload_max_age_seconds
+        self.temp_dir = temp_dir
+        self._task = None
+        self._counters = {
+            "sweeps": 0, "temp_files": 0, "temp_bytes": 0,
+            "uploads": 0, "upload_bytes": 0, "errors": 0,
+        }
+        self.last_sweep = None
+
+    @classmethod
+    def from_env(cls, list_uploads, delete_upload, in_use) -> "OrphanSweeper":
+        # Uploads are only orphans once no upload registry could still hold them
+        registry_max_age = float(os.getenv("UPLOAD_REGISTRY_MAX_AGE_SECONDS", str(24 * 3600)))
+        return cls(
+            list_uploads,
+            delete_upload,
+            in_use,
+            interval_seconds=float(os.getenv("ORPHAN_SWEEP_INTERVAL_SECONDS", "600")),
+            temp_max_age_seconds=float(os.getenv("ORPHAN_TEMP_MAX_AGE_SECONDS", "3600")),
+            upload_max_age_seconds=float(os.getenv("ORPHAN_UPLOAD_MAX_AGE_SECONDS") or registry_max_age + 3600),
+        )
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+        logger.info(f"Orphan sweeper started (every {self.interval_seconds:.0f}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        set_priority("background")
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval_seconds)
+
+    async def sweep(self) -> dict:
+        """Run one pass and return what it reclaimed"""
+        result = {"temp_files": 0, "temp_bytes": 0, "uploads": 0, "upload_bytes": 0}
+        try:
+            paths, names = await self._in_use()
+        except Exception as e:
+            logger.warning(f"Orphan sweep skipped, could not tell which files are in use: {str(e)}")
+            self._counters["errors"] += 1
+            return result
+
+        try:
+            result["temp_files"], result["temp_bytes"] = await asyncio.to_thread(
+                sweep_temp_files, self.temp_max_age_seconds, paths, self.temp_dir
+            )
+        except OSError as e:
+            logger.warning(f"Temp file sweep failed: {str(e)}")
+            self._counters["errors"] += 1
+
+        if self._list_uploads is not None:
+            try:
+                await self._sweep_uploads(names, result)
+            except Exception as e:
+                logger.warning(f"Upload sweep failed: {str(e)}")
+                self._counters["errors"] += 1
+
+        self._counters["sweeps"] += 1
+        for key, value in result.items():
+            self._counters[key] += value
+        SWEPT_FILES.labels(kind="temp").inc(result["temp_files"])
+        SWEPT_BYTES.labels(kind="temp").inc(result["temp_bytes"])
+        SWEPT_FILES.labels(kind="upload").inc(result["uploads"])
+        SWEPT_BYTES.labels(kind="upload").inc(result["upload_bytes"])
+        self.last_sweep = {**result, "at": time.time()}
+        if result["temp_files"] or result["uploads"]:
+            logger.info(
+                f"Orphan sweep removed {result['temp_files']} temp files ({result['temp_bytes']} bytes) "
+                f"and {result['uploads']} uploads ({result['upload_bytes']} bytes)"
+            )
+        return result
+
+    async def _sweep_uploads(self, in_use: set, result: dict):
+        cutoff = time.time() - self.upload_max_age_seconds
+        async for uploaded_file in self._list_uploads():
+            if not (uploaded_file.display_name or "").startswith(TEMP_FILE_PREFIX):
+                continue
+            if uploaded_file.name in in_use or uploaded_file.create_time is None:
+                continue
+            if uploaded_file.create_time.timestamp() > cutoff:
+                continue
+            await self._delete_upload(uploaded_file.name)
+            result["uploads"] += 1
+            result["upload_bytes"] += uploaded_file.size_bytes or 0
+
+    def stats(self) -> dict:
+        return {**self._counters, "last_sweep": self.last_sweep}
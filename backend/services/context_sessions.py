@@ -0,0 +1,205 @@
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_KINDS = ("image", "document", "conversation")
+
+class SessionNotFound(Exception):
+    """No live session with the given id: it never existed, expired or was evicted"""
+
+class ContextSession:
+    """An image, document or call recording that follow-up questions are asked about
+
+    ``contents`` hold the context. When it is also in a model-side cache
+    (``cache_name``), questions send only the new prompt, and the contents
+    are kept to rebuild the cache should it expire; otherwise they are
+    resent with every question. ``file_name`` is a File API upload owned by
+    the session.
+    """
+
+    def __init__(self, kind: str, source: Optional[str], contents: list, size: int,
+                 context_tokens: Optional[int] = None, file_name: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.source = source
+        self.contents = contents
+        self.size = size
+        self.context_tokens = context_tokens
+        self.file_name = file_name
+        self.cache_name = None
+        self.cache_expires_at = None
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.expires_at = None
+        self.history = []
+        self.refs = 0
+        self.usage = {"questions": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+
+    def prompt_for(self, question: str, max_turns: int) -> str:
+        """The question, preceded by the most recent earlier turns"""
+        turns = self.history[-max_turns:] if max_turns else []
+        if not turns:
+            return question
+        earlier = "\n\n".join(f"Question: {q}\nAnswer: {a}" for q, a in turns)
+        return f"Earlier questions in this session:\n\n{earlier}\n\nNew question: {question}"
+
+    def record(self, question: str, answer: str, usage):
+        self.history.append((question, answer))
+        self.usage["questions"] += 1
+        if usage is None:
+            return
+        for key, field in (
+            ("prompt_tokens", "prompt_token_count"),
+            ("cached_tokens", "cached_content_token_count"),
+            ("output_tokens", "candidates_token_count"),
+        ):
+            self.usage[key] += getattr(usage, field, None) or 0
+        if self.context_tokens is None and usage.cached_content_token_count:
+            self.context_tokens = usage.cached_content_token_count
+
+    def view(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "source": self.source,
+            "cached": self.cache_name is not None,
+            "contextTokens": self.context_tokens,
+            "createdAt": self.created_at,
+            "expiresAt": self.expires_at,
+            "usage": {
+                **self.usage,
+                # Input tokens the model had to process afresh
+                "uncached_prompt_tokens": self.usage["prompt_tokens"] - self.usage["cached_tokens"],
+            },
+        }
+
+class ContextSessionStore:
+    """Keep question sessions until they go idle, evicting the least recently used
+
+    A session expires ``ttl_seconds`` after its last question. Sessions are
+    also evicted, least recently used first, once there are more than
+    ``max_sessions`` or their locally held contents exceed ``max_bytes``.
+    Evicted sessions are passed to ``release`` to delete their cache and
+    uploads. A session is never evicted while a question on it is running.
+    """
+
+    def __init__(self, release, max_sessions: int = 100, max_bytes: int = 256 * 1024 * 1024,
+                 ttl_seconds: float = 1800, max_history_turns: int = 6):
+        self._release = release
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_history_turns = max_history_turns
+        self._sessions = OrderedDict()
+        self._counters = {"created": 0, "questions": 0, "expired": 0, "evicted": 0, "deleted": 0}
+
+    @classmethod
+    def from_env(cls, release) -> "ContextSessionStore":
+        return cls(
+            release,
+            max_sessions=int(os.getenv("CONTEXT_SESSION_MAX_SESSIONS", "100")),
+            max_bytes=int(os.getenv("CONTEXT_SESSION_MAX_MB", "256")) * 1024 * 1024,
+            ttl_seconds=float(os.getenv("CONTEXT_SESSION_TTL_SECONDS", "1800")),
+            max_history_turns=int(os.getenv("CONTEXT_SESSION_HISTORY_TURNS", "6")),
+        )
+
+    def _is_fresh(self, session: ContextSession) -> bool:
+        return session.expires_at > time.time()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(session.size for session in self._sessions.values())
+
+    async def add(self, session: ContextSession):
+        session.expires_at = time.time() + self.ttl_seconds
+        self._sessions[session.id] = session
+        self._counters["created"] += 1
+        await self._enforce_budget()
+
+    def get(self, session_id: str) -> Optional[ContextSession]:
+        session = self._sessions.get(session_id)
+        if session is None or not self._is_fresh(session):
+            return None
+        return session
+
+    @asynccontextmanager
+    async def lease(self, session_id: str):
+        """Yield a live session for one question, refreshing its TTL
+
+        Raises SessionNotFound when the session does not exist or has expired.
+        """
+        session = self.get(session_id)
+        if session is None:
+            raise SessionNotFound(session_id)
+
+        self._sessions.move_to_end(session_id)
+        session.refs += 1
+        session.last_used = time.time()
+        session.expires_at = session.last_used + self.ttl_seconds
+        self._counters["questions"] += 1
+        try:
+            yield session
+        finally:
+            session.refs -= 1
+            await self._enforce_budget()
+
+    async def remove(self, session_id: str) -> bool:
+        """Delete a session on request; False if there was none"""
+        if session_id not in self._sessions:
+            return False
+        await self._evict(session_id, "deleted", force=True)
+        return True
+
+    async def _evict(self, session_id: str, reason: str, force: bool = False):
+        session = self._sessions.get(session_id)
+        if session is None or (session.refs > 0 and not force):
+            return
+        del self._sessions[session_id]
+        self._counters[reason] += 1
+        try:
+            await self._release(session)
+            logger.info(f"Released {session.kind} session {session_id} ({reason})")
+        except Exception as e:
+            logger.warning(f"Failed to release session {session_id}: {str(e)}")
+
+    async def _enforce_budget(self):
+        idle = [key for key, session in self._sessions.items() if session.refs == 0]
+
+        for key in idle:
+            if not self._is_fresh(self._sessions[key]):
+                await self._evict(key, "expired")
+
+        # Oldest (least recently used) sessions come first in the OrderedDict
+        for key in [key for key in idle if key in self._sessions]:
+            if len(self._sessions) <= self.max_sessions and self.total_bytes <= self.max_bytes:
+                break
+            await self._evict(key, "evicted")
+
+    async def clear(self):
+        """Release every idle session, e.g. on shutdown"""
+        for key in [key for key, session in self._sessions.items() if session.refs == 0]:
+            await self._evict(key, "deleted")
+
+    def file_names(self) -> set:
+        """Uploads held by sessions, e.g. to protect them from cleanup"""
+        return {session.file_name for session in self._sessions.values() if session.file_name}
+
+    def stats(self) -> dict:
+        sessions = list(self._sessions.values())
+        return {
+            **self._counters,
+            "sessions": len(sessions),
+            "cached_sessions": sum(session.cache_name is not None for session in sessions),
+            "total_bytes": self.total_bytes,
+            "prompt_tokens": sum(session.usage["prompt_tokens"] for session in sessions),
+            "cached_tokens": sum(session.usage["cached_tokens"] for session in sessions),
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
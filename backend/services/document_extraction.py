@@ -0,0 +1,51 @@
+"""CPU-bound document parsing, kept importable on its own so it can run in worker processes
+
+PyPDF2 and python-docx are imported on first use so that importing this
+module (and the web app) stays cheap.
+"""
+import io
+import mmap
+from contextlib import contextmanager
+from typing import List, Union
+
+Source = Union[bytes, str]
+
+def preload():
+    """Import the parser libraries ahead of the first request"""
+    import PyPDF2  # noqa: F401
+    import docx  # noqa: F401
+
+@contextmanager
+def _open(source: Source):
+    """Yield a seekable stream for in-memory bytes or a file path
+
+    Files are memory-mapped so large PDFs are paged in by the OS instead of
+    being copied into the worker's heap.
+    """
+    if isinstance(source, bytes):
+        yield io.BytesIO(source)
+        return
+    with open(source, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def count_pdf_pages(source: Source) -> int:
+    import PyPDF2
+
+    with _open(source) as stream:
+        return len(PyPDF2.PdfReader(stream).pages)
+
+def extract_pdf_pages(source: Source, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) (zero-based) from a PDF"""
+    import PyPDF2
+
+    with _open(source) as stream:
+        reader = PyPDF2.PdfReader(stream)
+        return [reader.pages[index].extract_text() or "" for index in range(start, end)]
+
+def extract_docx_text(source: Source) -> str:
+    from docx import Document
+
+    # DOCX is a zip archive, which zipfile already reads member by member
+    doc = Document(io.BytesIO(source) if isinstance(source, bytes) else source)
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs) + "\n"
@@ -1,49 +1,295 @@
 from fastapi import UploadFile, HTTPException
-import requests
-import PyPDF2
-from docx import Document
-import io
-from typing import Optional
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlsplit, urlunsplit
 import logging
+from services import request_context
+from services.metrics import EXTRACTED_CHARS, INPUT_BYTES, span
+from services.html_text import html_to_text
+from services.single_flight import SingleFlight
+from services.chunking import PAGE_BREAK
+from services.document_extraction import Source, count_pdf_pages, extract_pdf_pages, extract_docx_text, preload
+from services.uploads import MAX_DOCUMENT_UPLOAD_BYTES, SavedUpload, save_upload
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+URL_FETCH_TIMEOUT = float(os.getenv("URL_FETCH_TIMEOUT", "30"))
+URL_FETCH_MAX_BYTES = int(os.getenv("URL_FETCH_MAX_MB", "20")) * 1024 * 1024
+URL_FETCH_MAX_CONNECTIONS = int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "50"))
+URL_FETCH_CACHE_ENTRIES = int(os.getenv("URL_FETCH_CACHE_ENTRIES", "128"))
+
+# PDFs with at least this many pages are split across worker processes
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for de-duplication: lower-case scheme and host, no default port or fragment"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    userinfo = parts.netloc.rpartition("@")[0]
+    if userinfo:
+        host = f"{userinfo}@{host}"
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+class PageLimits:
+    """Optional 1-based inclusive page range and page cap for PDF extraction"""
+    
+    def __init__(self, start: Optional[int] = None, end: Optional[int] = None, max_pages: Optional[int] = None):
+        if start is not None and start < 1:
+            raise HTTPException(status_code=400, detail="pageStart must be 1 or greater")
+        if end is not None and end < (start or 1):
+            raise HTTPException(status_code=400, detail="pageEnd must not be before pageStart")
+        if max_pages is not None and max_pages < 1:
+            raise HTTPException(status_code=400, detail="maxPages must be 1 or greater")
+        self.start = start
+        self.end = end
+        self.max_pages = max_pages
+    
+    @property
+    def limited(self) -> bool:
+        return any(value is not None for value in (self.start, self.end, self.max_pages))
+    
+    def resolve(self, total_pages: int) -> tuple:
+        """Return the zero-based [start, end) page slice to extract"""
+        start = (self.start or 1) - 1
+        if start >= total_pages:
+            raise HTTPException(
+                status_code=400,
+                detail=f"pageStart {self.start} is beyond the last page ({total_pages})"
+            )
+        end = min(self.end or total_pages, total_pages)
+        if self.max_pages is not None:
+            end = min(end, start + self.max_pages)
+        return start, end
+
+class FetchCache:
+    """Remember extracted text per URL along with its ETag/Last-Modified validators"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+    
+    def get(self, url: str) -> Optional[dict]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+    
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], text: str):
+        if not etag and not last_modified:
+            # Without validators the entry could never be revalidated
+            self._entries.pop(url, None)
+            return
+        self._entries[url] = {"etag": etag, "last_modified": last_modified, "text": text}
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
 class FileService:
     
-    async def extract_text_from_url(self, url: str) -> str:
-        """Extract text content from a URL"""
+    def __init__(self):
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self.fetch_cache = FetchCache(URL_FETCH_CACHE_ENTRIES)
+        self.url_flight = SingleFlight("url_fetch")
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def http_client(self) -> "httpx.AsyncClient":
+        """Shared async HTTP client so connections are pooled across requests"""
+        if self._http_client is None:
+            # Created (and httpx imported) on the first URL fetch, not at startup
+            import httpx
+            
+            self._http_client = httpx.AsyncClient(
+                timeout=URL_FETCH_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=URL_FETCH_MAX_CONNECTIONS),
+                headers={"User-Agent": "PlivoAIPlayground/1.0"}
+            )
+        return self._http_client
+    
+    def warm_up(self):
+        """Import the document parsers ahead of the first request (blocking)"""
+        preload()
+    
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+    
+    async def _read_capped(self, response: "httpx.Response") -> bytes:
+        """Read a streamed response body, aborting once it exceeds the byte cap"""
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > URL_FETCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Content at URL is too large to process")
+        
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received > URL_FETCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Content at URL is too large to process")
+            chunks.append(chunk)
+        return b"".join(chunks)
+    
+    async def _download(self, url: str, headers: dict) -> tuple:
+        """GET a URL, returning the response and its capped body (empty for 304)"""
+        async with self.http_client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return response, b""
+            response.raise_for_status()
+            return response, await self._read_capped(response)
+    
+    async def _extract_text_from_response(self, url: str, response: "httpx.Response", body: bytes,
+                                          page_limits: Optional[PageLimits] = None) -> str:
+        """Pick an extractor based on the response content type"""
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        path = urlsplit(url).path.lower()
+        
+        if content_type == PDF_CONTENT_TYPE or path.endswith(".pdf"):
+            return await self._extract_text_from_pdf(body, page_limits)
+        if content_type == DOCX_CONTENT_TYPE or path.endswith(".docx"):
+            return await self._extract_text_from_docx(body)
+        
+        text = body.decode(response.encoding or "utf-8", errors="replace")
+        if content_type in ("text/html", "application/xhtml+xml") or (not content_type and "<html" in text[:1024].lower()):
+            with span("extract_html"):
+                text = html_to_text(text)
+            EXTRACTED_CHARS.labels(format="html").inc(len(text))
+            return text
+        if content_type.startswith("text/") or content_type in ("application/json", "application/xml", ""):
+            EXTRACTED_CHARS.labels(format="text").inc(len(text))
+            return text
+        
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported content type at URL: {content_type}"
+        )
+    
+    async def extract_text_from_url(self, url: str, page_limits: Optional[PageLimits] = None) -> str:
+        """Extract text content from a URL
+        
+        Concurrent requests for the same URL and page range share one fetch
+        and extraction.
+        """
+        limits = page_limits or PageLimits()
+        key = (normalize_url(url), limits.start, limits.end, limits.max_pages)
+        return await self.url_flight.do(key, lambda: self._fetch_and_extract(url, page_limits))
+    
+    async def _fetch_and_extract(self, url: str, page_limits: Optional[PageLimits] = None) -> str:
+        import httpx
+        
         try:
             logger.info(f"Fetching content from URL: {url}")
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
             
-            # For now, return the raw text content
-            # You could add HTML parsing here if needed
-            return response.text
+            headers = {}
+            # Page-limited PDF extractions are partial, so they bypass the fetch cache
+            use_fetch_cache = page_limits is None or not page_limits.limited
+            cached = self.fetch_cache.get(url) if use_fetch_cache else None
+            if cached:
+                if cached["etag"]:
+                    headers["If-None-Match"] = cached["etag"]
+                if cached["last_modified"]:
+                    headers["If-Modified-Since"] = cached["last_modified"]
             
-        except requests.RequestException as e:
+            with span("fetch_url"):
+                response, body = await self._download(url, headers)
+                if response.status_code == 304 and cached:
+                    logger.info(f"URL not modified, using cached text: {url}")
+                    request_context.annotate("fetch", "not-modified")
+                    return cached["text"]
+                if response.status_code == 304:
+                    # Nothing cached to answer an unprompted 304 with: ask for the full body
+                    logger.info(f"URL answered 304 without a cached copy, fetching again: {url}")
+                    response, body = await self._download(url, {"Cache-Control": "no-cache"})
+                    if response.status_code == 304:
+                        raise HTTPException(status_code=502, detail="URL answered 304 Not Modified without content")
+            
+            INPUT_BYTES.labels(source="url").inc(len(body))
+            request_context.annotate("fetch", "downloaded")
+            text = await self._extract_text_from_response(url, response, body, page_limits)
+            if use_fetch_cache:
+                self.fetch_cache.put(
+                    url,
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                    text
+                )
+            return text
+            
+        except HTTPException:
+            raise
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching URL content: {str(e)}")
             raise Exception(f"Failed to fetch content from URL: {str(e)}")
     
-    async def extract_text_from_file(self, file: UploadFile) -> str:
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Worker processes for CPU-bound parsing, created on first use"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+    
+    async def _run_in_pool(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._get_process_pool(), func, *args)
+    
+    def check_file_type(self, content_type: Optional[str]):
+        """Reject uploads the extractors can't read"""
+        if not (
+            content_type in (PDF_CONTENT_TYPE, DOCX_CONTENT_TYPE)
+            or (content_type and content_type.startswith("text/"))
+        ):
+            raise HTTPException(
+                status_code=400, 
+                detail="Unsupported file type. Please upload PDF, DOCX, or text files."
+            )
+    
+    async def extract_text_from_file(self, file: UploadFile, page_limits: Optional[PageLimits] = None) -> str:
         """Extract text from uploaded file based on file type"""
+        logger.info(f"Processing file: {file.filename}, type: {file.content_type}")
+        self.check_file_type(file.content_type)
+        
+        # Stream the upload to disk; parsers read it from there
+        with span("save_upload"):
+            saved = await save_upload(file, MAX_DOCUMENT_UPLOAD_BYTES)
         try:
-            logger.info(f"Processing file: {file.filename}, type: {file.content_type}")
-            
-            # Read file content
-            file_content = await file.read()
-            
-            if file.content_type == "application/pdf":
-                return await self._extract_text_from_pdf(file_content)
-            elif file.content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                return await self._extract_text_from_docx(file_content)
-            elif file.content_type and file.content_type.startswith("text/"):
-                return file_content.decode("utf-8")
+            return await self.extract_text_from_saved(saved, page_limits)
+        finally:
+            saved.discard()
+    
+    async def extract_text_from_saved(self, saved: SavedUpload, page_limits: Optional[PageLimits] = None) -> str:
+        """Extract text from an upload already written to disk"""
+        try:
+            self.check_file_type(saved.content_type)
+            if saved.content_type == PDF_CONTENT_TYPE:
+                return await self._extract_text_from_pdf(saved.path, page_limits)
+            elif saved.content_type == DOCX_CONTENT_TYPE:
+                return await self._extract_text_from_docx(saved.path)
             else:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Unsupported file type. Please upload PDF, DOCX, or text files."
-                )
+                content = await asyncio.to_thread(saved.read_bytes)
+                text = content.decode("utf-8")
+                EXTRACTED_CHARS.labels(format="text").inc(len(text))
+                return text
                 
         except Exception as e:
             if isinstance(e, HTTPException):
@@ -51,38 +297,52 @@ class FileService:
             logger.error(f"Error processing file: {str(e)}")
             raise Exception(f"Failed to process file: {str(e)}")
     
-    async def _extract_text_from_pdf(self, file_content: bytes) -> str:
-        """Extract text from PDF file"""
+    async def _extract_text_from_pdf(self, source: Source, page_limits: Optional[PageLimits] = None) -> str:
+        """Extract text from PDF bytes or a PDF file path, splitting large page ranges across worker processes"""
         try:
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            with span("extract_pdf"):
+                total_pages = await asyncio.to_thread(count_pdf_pages, source)
+                start, end = (page_limits or PageLimits()).resolve(total_pages)
+                page_count = end - start
+                
+                if page_count < PDF_PARALLEL_MIN_PAGES:
+                    pages = await asyncio.to_thread(extract_pdf_pages, source, start, end)
+                else:
+                    batch_size = -(-page_count // EXTRACTION_WORKERS)
+                    batches = await asyncio.gather(*(
+                        self._run_in_pool(extract_pdf_pages, source, batch_start, min(batch_start + batch_size, end))
+                        for batch_start in range(start, end, batch_size)
+                    ))
+                    pages = [page for batch in batches for page in batch]
             
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            logger.info(f"Extracted {page_count} of {total_pages} PDF pages")
+            request_context.annotate("pages", {"extracted": page_count, "total": total_pages})
+            
+            # Pages are separated by a form feed so chunking can split on them
+            text = "".join(f"{page}\n{PAGE_BREAK}" for page in pages)
             
             if not text.strip():
                 raise Exception("No extractable text found in PDF")
             
+            EXTRACTED_CHARS.labels(format="pdf").inc(len(text))
             return text
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
-    async def _extract_text_from_docx(self, file_content: bytes) -> str:
-        """Extract text from DOCX file"""
+    async def _extract_text_from_docx(self, source: Source) -> str:
+        """Extract text from DOCX bytes or a DOCX file path"""
         try:
-            docx_file = io.BytesIO(file_content)
-            doc = Document(docx_file)
-            
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            with span("extract_docx"):
+                text = await self._run_in_pool(extract_docx_text, source)
             
             if not text.strip():
                 raise Exception("No text found in DOCX file")
             
+            EXTRACTED_CHARS.labels(format="docx").inc(len(text))
             return text
             
         except Exception as e:
@@ -1,45 +1,684 @@
-from google import genai
-import requests
-import tempfile
+from fastapi import HTTPException
+import asyncio
+import json
 import os
 from typing import Optional
 import logging
+import mimetypes
+import time
 from pathlib import Path
+from contextlib import asynccontextmanager
+from services.audio_segmentation import (
+    AUDIO_SEGMENT_CONCURRENCY,
+    AUDIO_SEGMENT_ENABLED,
+    split_wav,
+    stitch_transcripts,
+)
+from services.cache_service import ResponseCache
+from services.cleanup import cleanup_queue
+from services.context_sessions import ContextSession, ContextSessionStore
+from services.metrics import INPUT_BYTES, record_usage, span
+from services.rate_limiter import RateLimiter
+from services.single_flight import SingleFlight
+from services.sync_stream import iterate_in_thread
+from services.upload_registry import UploadRegistry
+from services.uploads import (
+    MAX_AUDIO_UPLOAD_BYTES,
+    MAX_IMAGE_UPLOAD_BYTES,
+    SavedUpload,
+    new_temp_path,
+    save_bytes,
+    save_upload,
+    saved_from_path,
+)
+from services.image_processing import (
+    IMAGE_OUTPUT_FORMAT,
+    IMAGE_PREPROCESS_ENABLED,
+    OUTPUT_EXTENSIONS,
+    OUTPUT_MIME_TYPES,
+    preprocess_image,
+)
+from services import request_context
+from services.chunking import CHARS_PER_TOKEN, estimate_tokens, split_into_chunks
 
 logger = logging.getLogger(__name__)
 
-class GeminiService:
-    def __init__(self):
-        self.client = genai.Client()
-    
-    async def summarize_text(self, text: str) -> str:
-        """Summarize text using Gemini"""
-        try:
-            prompt = f"""
+MODEL_NAME = "gemini-2.0-flash"
+
+# Inputs larger than the threshold are summarized with map-reduce over chunks
+SUMMARY_CHUNK_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_CHUNK_THRESHOLD_TOKENS", "60000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "20000"))
+SUMMARY_CHUNK_CONCURRENCY = int(os.getenv("SUMMARY_CHUNK_CONCURRENCY", "4"))
+
+# Images up to this size are sent inline instead of through the File API
+INLINE_IMAGE_MAX_BYTES = int(os.getenv("INLINE_IMAGE_MAX_KB", "4096")) * 1024
+
+# File API polling: start short, back off exponentially up to a cap, give up
+# after an overall deadline.
+FILE_POLL_INITIAL_INTERVAL = float(os.getenv("FILE_POLL_INITIAL_INTERVAL", "0.1"))
+FILE_POLL_MAX_INTERVAL = float(os.getenv("FILE_POLL_MAX_INTERVAL", "2.0"))
+FILE_POLL_BACKOFF = float(os.getenv("FILE_POLL_BACKOFF", "2.0"))
+FILE_POLL_TIMEOUT = float(os.getenv("FILE_POLL_TIMEOUT", "300"))
+
+CONVERSATION_MODES = ("pipeline", "single")
+
+# Question sessions keep their image, document or recording in a model-side
+# context cache when it is large enough to qualify, so follow-up questions
+# only send the new prompt
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "4096"))
+# What Gemini charges for one image, far below the caching minimum
+IMAGE_TOKENS = 258
+
+SESSION_INSTRUCTIONS = {
+    "image": "Answer the user's questions about the attached image.",
+    "document": "Answer the user's questions about the attached document, using only its content.",
+    "conversation": "Answer the user's questions about the attached recording of a conversation.",
+}
+
+SESSION_DEFAULT_PROMPTS = {
+    "image": "Analyze this image and describe what you see in detail.",
+    "document": "Please provide a concise and informative summary of this document. Focus on the main points and key insights.",
+    "conversation": "Summarize this conversation: the key topics discussed, the main points from each speaker and any action items or decisions made.",
+}
+
+TRANSCRIPT_PROMPT = """
+Please transcribe this audio file. Provide a clean, accurate transcription of all speech content.
+"""
+
+SEGMENT_TRANSCRIPT_PROMPT = """
+Please transcribe this audio clip. Provide a clean, accurate transcription of all speech content.
+Start each sentence on a new line prefixed with the time it begins in the clip, as [MM:SS].
+"""
+
+SINGLE_CALL_CONVERSATION_PROMPT = """
+Analyze this audio recording of a conversation and return a JSON object with:
+- "transcript": a clean, accurate transcription of all speech content.
+- "diarization": a speaker-diarized version of the transcript assuming up to 2
+  speakers, one turn per line formatted as "Speaker 1: [text]" or
+  "Speaker 2: [text]". If you can only detect one speaker, label everything
+  as "Speaker 1".
+- "summary": a concise summary of the conversation, the key topics discussed,
+  the main points from each speaker and any action items or decisions made.
+"""
+
+CONVERSATION_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "transcript": {"type": "STRING"},
+        "diarization": {"type": "STRING"},
+        "summary": {"type": "STRING"},
+    },
+    "required": ["transcript", "diarization", "summary"],
+}
+
+def build_summary_prompt(text: str) -> str:
+    return f"""
             Please provide a concise and informative summary of the following text. 
             Focus on the main points and key insights:
             
             {text}
             """
+
+def build_combine_prompt(summaries: list) -> str:
+    joined = "\n\n---\n\n".join(summaries)
+    return f"""
+            The following are summaries of consecutive parts of one document.
+            Combine them into a single concise and informative summary of the
+            whole document. Focus on the main points and key insights:
             
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[prompt]
+            {joined}
+            """
+
+def pack_summary_groups(summaries: list, max_chars: int) -> list:
+    """Group partial summaries for the next reduce level, at least two per group"""
+    groups = []
+    current = []
+    for summary in summaries:
+        if len(current) >= 2 and sum(len(s) for s in current) + len(summary) > max_chars:
+            groups.append(current)
+            current = []
+        current.append(summary)
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
+
+def image_mime_type(saved: SavedUpload) -> str:
+    if saved.content_type and saved.content_type.startswith("image/"):
+        return saved.content_type
+    guessed, _ = mimetypes.guess_type(saved.filename or "")
+    return guessed or "image/jpeg"
+
+def usage_to_dict(usage) -> Optional[dict]:
+    """Flatten the token counts of a response's usage_metadata"""
+    if usage is None:
+        return None
+    return {
+        field: getattr(usage, field, None)
+        for field in (
+            "prompt_token_count",
+            "candidates_token_count",
+            "cached_content_token_count",
+            "total_token_count",
+        )
+    }
+
+def is_missing_cache(error: Exception) -> bool:
+    """Whether a call failed because its context cache expired or was deleted"""
+    from google.genai import errors
+    
+    return isinstance(error, errors.ClientError) and error.code in (403, 404)
+
+class FileProcessingStats:
+    """Per media type record of how long uploads spent in PROCESSING"""
+    
+    def __init__(self):
+        self._stats = {}
+    
+    def record(self, media_type: str, seconds: float, polls: int):
+        stats = self._stats.setdefault(media_type, {
+            "count": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "last_seconds": 0.0,
+            "polls": 0,
+        })
+        stats["count"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["last_seconds"] = seconds
+        stats["polls"] += polls
+    
+    def snapshot(self) -> dict:
+        return {
+            media_type: {
+                **stats,
+                "avg_seconds": stats["total_seconds"] / stats["count"],
+            }
+            for media_type, stats in self._stats.items()
+        }
+
+class ImagePathStats:
+    """Which path image requests took, and the File API overhead inline requests avoided"""
+    
+    def __init__(self):
+        self.inline = 0
+        self.file_api = 0
+        self.estimated_seconds_saved = 0.0
+        self._upload_seconds = 0.0
+        self._uploads = 0
+    
+    @property
+    def avg_upload_overhead(self) -> Optional[float]:
+        """Mean upload + PROCESSING wait time of images sent through the File API"""
+        return self._upload_seconds / self._uploads if self._uploads else None
+    
+    def record_upload(self, seconds: float):
+        self._upload_seconds += seconds
+        self._uploads += 1
+    
+    def record_file_api(self):
+        self.file_api += 1
+    
+    def record_inline(self) -> Optional[float]:
+        """Count an inline request and return the latency it is estimated to have saved"""
+        self.inline += 1
+        saved = self.avg_upload_overhead
+        if saved is not None:
+            self.estimated_seconds_saved += saved
+        return saved
+    
+    def snapshot(self) -> dict:
+        return {
+            "inline": self.inline,
+            "file_api": self.file_api,
+            "avg_file_api_overhead_seconds": self.avg_upload_overhead,
+            "estimated_seconds_saved": self.estimated_seconds_saved,
+        }
+
+class GeminiService:
+    def __init__(self, client=None, response_cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        # The client is injectable so benchmarks can swap in a fake backend.
+        # All calls go through ``client.aio`` so a slow model request never
+        # blocks the event loop for other in-flight requests. The real client
+        # is built on first use, keeping google-genai out of the import path.
+        self._client = client
+        # Every model and File API call is admitted through one shared limiter
+        self.rate_limiter = rate_limiter or RateLimiter.from_env()
+        self.generation_flight = SingleFlight("generation")
+        self.processing_stats = FileProcessingStats()
+        self.image_path_stats = ImagePathStats()
+        self.image_preprocess_stats = {"images": 0, "bytes_before": 0, "bytes_after": 0}
+        if response_cache is None and os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true":
+            response_cache = ResponseCache.from_env()
+        self.response_cache = response_cache
+        if os.getenv("UPLOAD_REGISTRY_ENABLED", "true").lower() == "true":
+            self.upload_registry = UploadRegistry.from_env(self._discard_file)
+        else:
+            self.upload_registry = None
+        self.context_sessions = ContextSessionStore.from_env(self._release_session)
+    
+    @property
+    def client(self):
+        if self._client is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise HTTPException(status_code=503, detail="GEMINI_API_KEY is not configured on the server")
+            from google import genai
+            
+            self._client = genai.Client(api_key=api_key)
+            logger.info("Gemini client initialized")
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
+    def warm_up(self):
+        """Build the client and import the SDK types ahead of the first request (blocking)"""
+        from google.genai import types  # noqa: F401
+        
+        if IMAGE_PREPROCESS_ENABLED:
+            from PIL import Image  # noqa: F401
+        if os.getenv("GEMINI_API_KEY"):
+            self.client
+    
+    async def _generate(self, contents, config=None, stage: str = "generate"):
+        """Run a single generate_content call on the async client, timed as ``stage``"""
+        with span(stage):
+            response = await self.rate_limiter.call(
+                self.client.aio.models.generate_content,
+                model=MODEL_NAME,
+                contents=contents,
+                config=config,
+                label="generate_content"
             )
-            return response.text
+        record_usage(response.usage_metadata)
+        return response
+    
+    async def _generate_stream(self, contents, config=None, stage: str = "generate_stream"):
+        """Stream a generate_content call, timed as ``stage``
+        
+        The SDK's async stream reads the response with blocking I/O on the
+        event loop, so the blocking client's stream runs in a worker thread.
+        """
+        usage = None
+        with span(stage):
+            async for chunk in self.rate_limiter.stream(
+                lambda: iterate_in_thread(lambda: self.client.models.generate_content_stream(
+                    model=MODEL_NAME,
+                    contents=contents,
+                    config=config
+                )),
+                label="generate_content_stream"
+            ):
+                # Usage is cumulative, so only the last reported value counts
+                usage = chunk.usage_metadata or usage
+                yield chunk
+        record_usage(usage)
+    
+    async def _upload_file(self, path: str):
+        """Upload a local file to the Gemini File API
+        
+        The display name is the prefixed temp file name, which is how the
+        orphan sweeper recognises uploads made by this backend.
+        """
+        with span("gemini_upload"):
+            return await self.rate_limiter.call(
+                self.client.aio.files.upload,
+                path=Path(path),
+                config={"display_name": os.path.basename(path)},
+                label="files.upload"
+            )
+    
+    async def _get_file(self, name: str):
+        """Fetch the current state of an uploaded file"""
+        return await self.rate_limiter.call(self.client.aio.files.get, name=name, label="files.get")
+    
+    async def _delete_file(self, name: str):
+        """Delete an uploaded file from the Gemini File API"""
+        return await self.rate_limiter.call(self.client.aio.files.delete, name=name, label="files.delete")
+    
+    async def _discard_file(self, name: str):
+        """Queue an uploaded file for deletion without waiting on it"""
+        cleanup_queue.delete_remote(name, self._delete_file)
+    
+    async def _list_files(self):
+        """Iterate over every file in the Gemini File API"""
+        pager = await self.rate_limiter.call(self.client.aio.files.list, label="files.list")
+        async for uploaded_file in pager:
+            yield uploaded_file
+    
+    async def _create_cache(self, contents: list, system_instruction: str, ttl_seconds: float):
+        """Store ``contents`` in a model-side context cache"""
+        with span("create_context_cache"):
+            return await self.rate_limiter.call(
+                self.client.aio.caches.create,
+                model=MODEL_NAME,
+                config={
+                    "contents": contents,
+                    "system_instruction": system_instruction,
+                    "ttl": f"{int(ttl_seconds)}s",
+                },
+                label="caches.create"
+            )
+    
+    async def _extend_cache(self, name: str, ttl_seconds: float):
+        """Push back the expiry of a context cache"""
+        return await self.rate_limiter.call(
+            self.client.aio.caches.update, name=name, config={"ttl": f"{int(ttl_seconds)}s"}, label="caches.update"
+        )
+    
+    async def _delete_cache(self, name: str):
+        """Delete a context cache"""
+        return await self.rate_limiter.call(self.client.aio.caches.delete, name=name, label="caches.delete")
+    
+    async def _wait_until_active(self, uploaded_file, media_type: str):
+        """Poll an uploaded file until it leaves PROCESSING, with adaptive backoff"""
+        with span("file_processing"):
+            return await self._poll_until_active(uploaded_file, media_type)
+    
+    async def _poll_until_active(self, uploaded_file, media_type: str):
+        start = time.monotonic()
+        deadline = start + FILE_POLL_TIMEOUT
+        interval = FILE_POLL_INITIAL_INTERVAL
+        polls = 0
+        
+        while uploaded_file.state.name == "PROCESSING":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(
+                    f"Timed out after {FILE_POLL_TIMEOUT:.0f}s waiting for {media_type} file to process"
+                )
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * FILE_POLL_BACKOFF, FILE_POLL_MAX_INTERVAL)
+            polls += 1
+            uploaded_file = await self._get_file(uploaded_file.name)
+        
+        elapsed = time.monotonic() - start
+        self.processing_stats.record(media_type, elapsed, polls)
+        logger.info(f"{media_type} file {uploaded_file.name} ready after {elapsed:.2f}s ({polls} polls)")
+        
+        if uploaded_file.state.name != "ACTIVE":
+            raise Exception(f"File processing failed: {uploaded_file.state.name}")
+        
+        return uploaded_file
+    
+    @asynccontextmanager
+    async def _uploaded(self, saved: SavedUpload, media_type: str):
+        """Yield an ACTIVE File API handle for a file saved on local disk
+        
+        With the upload registry enabled, identical content is uploaded once
+        and the handle reused until it expires or is evicted. Without it the
+        file is uploaded for this call only and deleted afterwards.
+        """
+        async def upload():
+            logger.info(f"Uploading {media_type} to Gemini File API")
+            start = time.monotonic()
+            uploaded_file = await self._upload_file(saved.path)
+            logger.info(f"File uploaded successfully: {uploaded_file.name}")
+            try:
+                active_file = await self._wait_until_active(uploaded_file, media_type)
+            except BaseException:
+                await self._discard_file(uploaded_file.name)
+                raise
+            if media_type == "image":
+                self.image_path_stats.record_upload(time.monotonic() - start)
+            return active_file
+        
+        if self.upload_registry is None:
+            uploaded_file = await upload()
+            request_context.annotate("upload", "new")
+            try:
+                yield uploaded_file
+            finally:
+                await self._discard_file(uploaded_file.name)
+                logger.info(f"{media_type} file queued for deletion from Gemini")
+            return
+        
+        async with self.upload_registry.lease(saved.sha256, saved.size, upload) as (uploaded_file, reused):
+            request_context.annotate("upload", "reused" if reused else "new")
+            yield uploaded_file
+    
+    async def _prepare_image(self, saved: SavedUpload) -> tuple:
+        """Downscale, strip metadata and re-encode an image before analysis
+        
+        Returns the upload to send (the original is removed when replaced)
+        and the identity to use in cache keys: the SHA-256 of the bytes that
+        are sent.
+        """
+        if not IMAGE_PREPROCESS_ENABLED:
+            return saved, saved.sha256
+        
+        start = time.monotonic()
+        extension = OUTPUT_EXTENSIONS[IMAGE_OUTPUT_FORMAT]
+        output_path = new_temp_path(f"preprocessed{extension}")
+        try:
+            with span("image_preprocess"):
+                result = await asyncio.to_thread(preprocess_image, saved.path, output_path)
+        except BaseException:
+            cleanup_queue.delete_local(output_path)
+            raise
+        if result is None:
+            cleanup_queue.delete_local(output_path)
+            return saved, saved.sha256
+        
+        original_size, new_size = result
+        processed = await asyncio.to_thread(
+            saved_from_path,
+            output_path,
+            f"{Path(saved.filename or 'image').stem}{extension}",
+            OUTPUT_MIME_TYPES[IMAGE_OUTPUT_FORMAT]
+        )
+        # Sent even when it is no smaller: the original may carry EXIF or GPS
+        # metadata and an orientation the model would not apply
+        saved.discard()
+        
+        self.image_preprocess_stats["images"] += 1
+        self.image_preprocess_stats["bytes_before"] += saved.size
+        self.image_preprocess_stats["bytes_after"] += processed.size
+        request_context.annotate("image_preprocessing", {
+            "bytes_before": saved.size,
+            "bytes_after": processed.size,
+            "dimensions_before": list(original_size),
+            "dimensions_after": list(new_size),
+            "ms": round((time.monotonic() - start) * 1000, 1)
+        })
+        return processed, processed.sha256
+    
+    @asynccontextmanager
+    async def _image_part(self, saved: SavedUpload):
+        """Yield the content part for an image
+        
+        Images up to INLINE_IMAGE_MAX_BYTES are sent inline from memory,
+        skipping the File API upload, PROCESSING wait and delete round trips.
+        Larger images go through the File API.
+        """
+        if saved.size <= INLINE_IMAGE_MAX_BYTES:
+            from google.genai import types
+            
+            data = await asyncio.to_thread(saved.read_bytes)
+            estimated_saving = self.image_path_stats.record_inline()
+            request_context.annotate("image_path", "inline")
+            if estimated_saving is not None:
+                request_context.annotate("estimated_latency_saved_ms", round(estimated_saving * 1000, 1))
+            yield types.Part.from_bytes(data=data, mime_type=image_mime_type(saved))
+            return
+        
+        self.image_path_stats.record_file_api()
+        request_context.annotate("image_path", "file_api")
+        async with self._uploaded(saved, "image") as uploaded_file:
+            yield uploaded_file
+    
+    async def _cached(self, key: str, produce) -> str:
+        """Return a cached response for ``key`` or produce and store one
+        
+        Concurrent misses for the same key wait on a single ``produce`` call.
+        """
+        if self.response_cache is None:
+            # Identical concurrent requests still share one generation
+            return await self.generation_flight.do(key, produce)
+        
+        cached = await self.response_cache.get(key)
+        if cached is not None:
+            request_context.annotate("cache", "hit")
+            return cached
+        
+        request_context.annotate("cache", "miss")
+        
+        async def produce_and_store():
+            result = await produce()
+            await self.response_cache.set(key, result)
+            return result
+        
+        return await self.generation_flight.do(key, produce_and_store)
+    
+    async def _stream_cached(self, key: str, stream):
+        """Yield streaming events for ``stream``, serving cache hits as one chunk
+        
+        Events are dicts with an "event" of "chunk" (carrying "text") or a
+        final "done" carrying cache status, timing and token usage.
+        """
+        start = time.monotonic()
+        
+        if self.response_cache is not None:
+            cached = await self.response_cache.get(key)
+            if cached is not None:
+                yield {"event": "chunk", "text": cached}
+                yield {
+                    "event": "done",
+                    "cache": "hit",
+                    "timing": {"time_to_first_token_ms": 0.0, "total_ms": (time.monotonic() - start) * 1000},
+                    "usage": None
+                }
+                return
+        
+        parts = []
+        usage = None
+        first_token_at = None
+        async for chunk in stream():
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage = chunk.usage_metadata
+            if chunk.text:
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                parts.append(chunk.text)
+                yield {"event": "chunk", "text": chunk.text}
+        
+        if self.response_cache is not None:
+            await self.response_cache.set(key, "".join(parts))
+        
+        finished_at = time.monotonic()
+        yield {
+            "event": "done",
+            "cache": "miss" if self.response_cache is not None else None,
+            "timing": {
+                "time_to_first_token_ms": ((first_token_at or finished_at) - start) * 1000,
+                "total_ms": (finished_at - start) * 1000
+            },
+            "usage": usage_to_dict(usage)
+        }
+    
+    async def _summarize_chunk(self, chunk: str, index: int, total: int, semaphore: asyncio.Semaphore) -> str:
+        """Map step: summarize one chunk of a large document"""
+        prompt = f"""
+            The following text is part {index + 1} of {total} of a larger document.
+            Summarize this part concisely, keeping every key point, figure and
+            conclusion so the partial summaries can later be combined:
             
+            {chunk}
+            """
+        async with semaphore:
+            response = await self._generate([prompt], stage="summarize_chunk")
+        return response.text
+    
+    async def _combine_summaries(self, summaries: list, semaphore: asyncio.Semaphore) -> str:
+        """Reduce step: merge several partial summaries into one"""
+        async with semaphore:
+            response = await self._generate([build_combine_prompt(summaries)], stage="summarize_combine")
+        return response.text
+    
+    async def _final_summary_prompt(self, text: str) -> str:
+        """Build the prompt for the final summary call
+        
+        Small inputs are summarized directly. Inputs above the chunking
+        threshold are split on page or paragraph boundaries, the chunks are
+        summarized concurrently, and the partial summaries are reduced level
+        by level until they fit into a single combining prompt.
+        """
+        if estimate_tokens(text) <= SUMMARY_CHUNK_THRESHOLD_TOKENS:
+            return build_summary_prompt(text)
+        
+        chunks = split_into_chunks(text, SUMMARY_CHUNK_TOKENS)
+        logger.info(f"Summarizing {len(text)} characters as {len(chunks)} chunks")
+        request_context.annotate("chunks", len(chunks))
+        semaphore = asyncio.Semaphore(SUMMARY_CHUNK_CONCURRENCY)
+        
+        summaries = await asyncio.gather(*(
+            self._summarize_chunk(chunk, index, len(chunks), semaphore)
+            for index, chunk in enumerate(chunks)
+        ))
+        
+        levels = 1
+        budget = SUMMARY_CHUNK_TOKENS * CHARS_PER_TOKEN
+        while sum(len(summary) for summary in summaries) > budget and len(summaries) > 1:
+            groups = pack_summary_groups(summaries, budget)
+            summaries = await asyncio.gather(*(
+                self._combine_summaries(group, semaphore) for group in groups
+            ))
+            levels += 1
+        
+        request_context.annotate("reduce_levels", levels)
+        return build_combine_prompt(summaries)
+    
+    async def summarize_text(self, text: str) -> str:
+        """Summarize text using Gemini, chunking very large inputs"""
+        try:
+            prompt = build_summary_prompt(text)
+            
+            async def produce():
+                final_prompt = await self._final_summary_prompt(text)
+                response = await self._generate([final_prompt], stage="summarize")
+                return response.text
+            
+            return await self._cached(ResponseCache.make_key(MODEL_NAME, prompt), produce)
+            
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error in text summarization: {str(e)}")
             raise Exception(f"Failed to summarize text: {str(e)}")
     
+    async def stream_summary(self, text: str):
+        """Stream a summary of ``text`` as it is generated"""
+        prompt = build_summary_prompt(text)
+        
+        async def stream():
+            # For large inputs the map and intermediate reduce steps run
+            # first; only the final combining call is streamed
+            final_prompt = await self._final_summary_prompt(text)
+            async for chunk in self._generate_stream([final_prompt], stage="summarize"):
+                yield chunk
+        
+        async for event in self._stream_cached(ResponseCache.make_key(MODEL_NAME, prompt), stream):
+            yield event
+    
     async def analyze_image_from_url(self, image_url: str, prompt: str) -> str:
         """Analyze image from URL using Gemini File API"""
         try:
             logger.info(f"Downloading image from URL: {image_url}")
             
             # Download the image
-            response = requests.get(image_url, timeout=30)
+            import requests
+            
+            with span("fetch_image"):
+                response = await asyncio.to_thread(requests.get, image_url, timeout=30)
             response.raise_for_status()
+            INPUT_BYTES.labels(source="url").inc(len(response.content))
             
             # Determine the file extension
             content_type = response.headers.get('content-type', '')
@@ -54,48 +693,20 @@ class GeminiService:
             else:
                 extension = '.jpg'  # Default fallback
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as tmp_file:
-                tmp_file.write(response.content)
-                tmp_file_path = tmp_file.name
-            
+            saved = await save_bytes(response.content, f"image{extension}", content_type.split(";")[0] or None)
             try:
-                logger.info(f"Uploading image to Gemini File API")
-                
-                # Upload to Gemini File API
-                uploaded_file = self.client.files.upload(path=Path(tmp_file_path))
-                logger.info(f"File uploaded successfully: {uploaded_file.name}")
-                
-                # Wait for processing
-                import time
-                while uploaded_file.state.name == "PROCESSING":
-                    logger.info("File is still processing...")
-                    time.sleep(2)
-                    uploaded_file = self.client.files.get(uploaded_file.name)
-                
-                if uploaded_file.state.name != "ACTIVE":
-                    raise Exception(f"File processing failed: {uploaded_file.state.name}")
-                
-                logger.info("File processed successfully, analyzing image...")
-                
-                # Analyze the image
-                response = self.client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=[uploaded_file, prompt]
-                )
-                
-                # Clean up the uploaded file
-                self.client.files.delete(name=uploaded_file.name)
-                logger.info("Image file deleted from Gemini")
-                
-                return response.text
-                
+                saved, _ = await self._prepare_image(saved)
+                async with self._image_part(saved) as image_part:
+                    logger.info("Image ready, analyzing image...")
+                    
+                    # Analyze the image
+                    response = await self._generate([image_part, prompt], stage="analyze_image")
+                    return response.text
             finally:
-                # Always clean up local file
-                if os.path.exists(tmp_file_path):
-                    os.unlink(tmp_file_path)
-                    logger.info("Local temporary file deleted")
+                saved.discard()
                     
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error downloading image: {str(e)}")
             raise Exception(f"Failed to download image from URL: {str(e)}")
@@ -117,10 +728,7 @@ class GeminiService:
             {conversation_text}
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[prompt]
-            )
+            response = await self._generate([prompt])
             return response.text
             
         except Exception as e:
@@ -133,18 +741,15 @@ class GeminiService:
             logger.info(f"Uploading PDF to Gemini File API: {pdf_path}")
             
             # Upload PDF file to Gemini
-            uploaded_file = self.client.files.upload(path=Path(pdf_path))
+            uploaded_file = await self._upload_file(pdf_path)
             logger.info(f"PDF uploaded successfully: {uploaded_file.name}")
             
-            # Generate summary
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=["Give me a comprehensive summary of this PDF file.", uploaded_file]
-            )
-            
-            # Clean up the uploaded file
-            self.client.files.delete(name=uploaded_file.name)
-            logger.info("PDF file deleted from Gemini")
+            try:
+                # Generate summary
+                response = await self._generate(["Give me a comprehensive summary of this PDF file.", uploaded_file])
+            finally:
+                # Clean up the uploaded file, also when generation failed
+                await self._discard_file(uploaded_file.name)
             
             return response.text
             
@@ -158,18 +763,15 @@ class GeminiService:
             logger.info(f"Uploading audio to Gemini File API: {audio_path}")
             
             # Upload audio file to Gemini
-            uploaded_file = self.client.files.upload(path=Path(audio_path))
+            uploaded_file = await self._upload_file(audio_path)
             logger.info(f"Audio uploaded successfully: {uploaded_file.name}")
             
-            # Analyze the audio
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[uploaded_file, prompt]
-            )
-            
-            # Clean up the uploaded file
-            self.client.files.delete(name=uploaded_file.name)
-            logger.info("Audio file deleted from Gemini")
+            try:
+                # Analyze the audio
+                response = await self._generate([uploaded_file, prompt])
+            finally:
+                # Clean up the uploaded file, also when analysis failed
+                await self._discard_file(uploaded_file.name)
             
             return response.text
             
@@ -182,148 +784,417 @@ class GeminiService:
         try:
             logger.info(f"Processing uploaded image: {image_file.filename}")
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{image_file.filename}") as tmp_file:
-                content = await image_file.read()
-                tmp_file.write(content)
-                tmp_file_path = tmp_file.name
-            
-            logger.info("Uploading image to Gemini File API")
-            
-            # Upload image to Gemini File API
-            uploaded_file = self.client.files.upload(path=Path(tmp_file_path))
-            logger.info(f"File uploaded successfully: {uploaded_file.name}")
-            
-            # Wait for processing
-            import time
-            while uploaded_file.state.name == "PROCESSING":
-                logger.info("File is still processing...")
-                time.sleep(2)
-                uploaded_file = self.client.files.get(uploaded_file.name)
-            
-            if uploaded_file.state.name != "ACTIVE":
-                raise Exception(f"File processing failed: {uploaded_file.state.name}")
-            
-            logger.info("File processed successfully, analyzing image...")
-            
-            # Analyze the image
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[uploaded_file, prompt]
-            )
-            
-            # Clean up files
-            self.client.files.delete(name=uploaded_file.name)
-            os.unlink(tmp_file_path)
-            logger.info("Local temporary file deleted")
-            
-            return response.text
+            # Stream the upload to disk; the cache key uses its content hash
+            with span("save_upload"):
+                saved = await save_upload(image_file, MAX_IMAGE_UPLOAD_BYTES)
+            try:
+                # Near-duplicates of an image share one cache entry
+                saved, image_id = await self._prepare_image(saved)
+                cache_key = ResponseCache.make_key(MODEL_NAME, prompt, image_id)
+                
+                async def produce():
+                    async with self._image_part(saved) as image_part:
+                        logger.info("Image ready, analyzing image...")
+                        
+                        # Analyze the image
+                        response = await self._generate([image_part, prompt], stage="analyze_image")
+                        return response.text
+                
+                return await self._cached(cache_key, produce)
+            finally:
+                saved.discard()
             
+        except HTTPException:
+            raise
         except Exception as e:
-            # Clean up on error
-            if 'tmp_file_path' in locals():
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
             logger.error(f"Error in image analysis: {str(e)}")
             raise Exception(f"Failed to analyze image: {str(e)}")
     
-    async def analyze_conversation_from_audio(self, audio_file) -> dict:
-        """Process audio file for conversation analysis: STT + Diarization + Summary"""
+    async def stream_image_analysis(self, saved: SavedUpload, prompt: str):
+        """Stream an analysis of a saved image upload as it is generated
+        
+        The saved file is removed once the stream finishes.
+        """
+        logger.info(f"Processing uploaded image for streaming: {saved.filename}")
+        
         try:
-            logger.info(f"Processing audio file for conversation analysis: {audio_file.filename}")
+            saved, image_id = await self._prepare_image(saved)
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{audio_file.filename}") as tmp_file:
-                content = await audio_file.read()
-                tmp_file.write(content)
-                tmp_file_path = tmp_file.name
+            async def stream():
+                async with self._image_part(saved) as image_part:
+                    async for chunk in self._generate_stream([image_part, prompt], stage="analyze_image"):
+                        yield chunk
             
-            logger.info("Uploading audio to Gemini File API for transcription")
-            
-            # Upload audio to Gemini File API
-            uploaded_file = self.client.files.upload(path=Path(tmp_file_path))
-            logger.info(f"Audio uploaded successfully: {uploaded_file.name}")
-            
-            # Wait for processing
-            import time
-            while uploaded_file.state.name == "PROCESSING":
-                logger.info("Audio is still processing...")
-                time.sleep(2)
-                uploaded_file = self.client.files.get(uploaded_file.name)
-            
-            if uploaded_file.state.name != "ACTIVE":
-                raise Exception(f"Audio processing failed: {uploaded_file.state.name}")
-            
-            logger.info("Audio processed successfully, generating transcript...")
-            
-            # Step 1: Generate transcript
-            transcript_prompt = """
-            Please transcribe this audio file. Provide a clean, accurate transcription of all speech content.
-            """
-            transcript_response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[uploaded_file, transcript_prompt]
-            )
-            transcript = transcript_response.text
-            
-            # Step 2: Generate diarized transcript (manual diarization)
-            diarization_prompt = f"""
-            Based on this transcript: "{transcript}"
-            
-            Please provide a speaker-diarized version assuming up to 2 speakers (Speaker 1 and Speaker 2).
-            Analyze voice changes, conversation patterns, and context to identify when different speakers are talking.
-            Format the output as:
-            
-            Speaker 1: [text]
-            Speaker 2: [text]
-            Speaker 1: [text]
-            etc.
-            
-            If you can only detect one speaker, label everything as "Speaker 1".
-            """
-            
-            diarized_response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[diarization_prompt]
-            )
-            diarized_transcript = diarized_response.text
-            
-            # Step 3: Generate summary and analysis
-            summary_prompt = f"""
-            Based on this conversation transcript: "{transcript}"
-            
-            Please provide:
-            1. A concise summary of the conversation
-            2. Key topics discussed
-            3. Main points from each speaker
-            4. Any action items or decisions made
-            """
+            cache_key = ResponseCache.make_key(MODEL_NAME, prompt, image_id)
+            async for event in self._stream_cached(cache_key, stream):
+                yield event
+        finally:
+            saved.discard()
+    
+    async def diarize_transcript(self, transcript: str) -> str:
+        """Step 2: Generate diarized transcript (manual diarization)"""
+        diarization_prompt = f"""
+        Based on this transcript: "{transcript}"
+        
+        Please provide a speaker-diarized version assuming up to 2 speakers (Speaker 1 and Speaker 2).
+        Analyze voice changes, conversation patterns, and context to identify when different speakers are talking.
+        Format the output as:
+        
+        Speaker 1: [text]
+        Speaker 2: [text]
+        Speaker 1: [text]
+        etc.
+        
+        If you can only detect one speaker, label everything as "Speaker 1".
+        """
+        
+        diarized_response = await self._generate([diarization_prompt], stage="diarize")
+        return diarized_response.text
+    
+    async def _summarize_conversation(self, transcript: str) -> str:
+        """Step 3: Generate summary and analysis"""
+        summary_prompt = f"""
+        Based on this conversation transcript: "{transcript}"
+        
+        Please provide:
+        1. A concise summary of the conversation
+        2. Key topics discussed
+        3. Main points from each speaker
+        4. Any action items or decisions made
+        """
+        
+        summary_response = await self._generate([summary_prompt], stage="summarize_conversation")
+        return summary_response.text
+    
+    async def _analyze_conversation_single_call(self, uploaded_file) -> dict:
+        """Transcribe, diarize and summarize an uploaded recording in one call"""
+        response = await self._generate(
+            [uploaded_file, SINGLE_CALL_CONVERSATION_PROMPT],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": CONVERSATION_RESPONSE_SCHEMA,
+            },
+            stage="analyze_conversation"
+        )
+        try:
+            result = json.loads(response.text)
+        except json.JSONDecodeError as e:
+            raise Exception(f"Model returned invalid JSON: {str(e)}")
+        
+        return {
+            "transcript": result.get("transcript", ""),
+            "diarization": result.get("diarization", ""),
+            "summary": result.get("summary", "")
+        }
+    
+    async def analyze_conversation_from_audio(self, audio_file, mode: str = "pipeline") -> dict:
+        """Process audio file for conversation analysis: STT + Diarization + Summary
+        
+        ``mode`` is either "pipeline" (transcribe first, then diarize and
+        summarize in parallel) or "single" (one structured model call).
+        """
+        if mode not in CONVERSATION_MODES:
+            raise ValueError(f"Unknown conversation analysis mode: {mode}")
+        
+        try:
+            logger.info(f"Processing audio file for conversation analysis: {audio_file.filename}")
             
-            summary_response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[summary_prompt]
-            )
-            summary = summary_response.text
+            # Stream the upload to disk instead of holding it in memory
+            with span("save_upload"):
+                saved = await save_upload(audio_file, MAX_AUDIO_UPLOAD_BYTES)
+            try:
+                result = await self.analyze_saved_conversation(saved, mode)
+            finally:
+                saved.discard()
             
-            # Clean up files
-            self.client.files.delete(name=uploaded_file.name)
-            os.unlink(tmp_file_path)
             logger.info("Audio file cleanup completed")
+            return result
             
-            return {
-                "transcript": transcript,
-                "diarization": diarized_transcript,
-                "summary": summary
-            }
-            
+        except HTTPException:
+            raise
         except Exception as e:
-            # Clean up on error
-            if 'tmp_file_path' in locals():
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
             logger.error(f"Error in conversation analysis: {str(e)}")
             raise Exception(f"Failed to analyze conversation: {str(e)}")
+    
+    async def analyze_saved_conversation(self, saved: SavedUpload, mode: str = "pipeline",
+                                         on_progress=None) -> dict:
+        """Analyze audio already saved to disk, leaving the local file in place
+        
+        ``on_progress`` is an optional async callable invoked with each stage
+        name as it completes: "uploaded", "transcribed", "diarized" and
+        "summarized". In pipeline mode, WAV recordings longer than one segment
+        are split at pauses and the segments transcribed concurrently.
+        """
+        async def progress(stage: str):
+            if on_progress:
+                await on_progress(stage)
+        
+        if mode == "pipeline" and AUDIO_SEGMENT_ENABLED:
+            with span("segment_audio"):
+                segments = await asyncio.to_thread(split_wav, saved.path)
+            if segments:
+                try:
+                    transcript = await self._transcribe_segments(segments, progress)
+                finally:
+                    for segment in segments:
+                        segment.saved.discard()
+                await progress("transcribed")
+                return await self.diarize_and_summarize(transcript, progress)
+        
+        async with self._uploaded(saved, "audio") as uploaded_file:
+            await progress("uploaded")
+            return await self._analyze_uploaded_conversation(uploaded_file, mode, progress)
+    
+    async def _transcribe_segments(self, segments: list, progress) -> str:
+        """Transcribe segments of a long recording concurrently and stitch the results
+        
+        "uploaded" is reported once every segment has reached the File API.
+        """
+        logger.info(f"Transcribing recording as {len(segments)} segments")
+        request_context.annotate("audio_segments", len(segments))
+        semaphore = asyncio.Semaphore(AUDIO_SEGMENT_CONCURRENCY)
+        pending_uploads = len(segments)
+        
+        async def transcribe(segment) -> str:
+            nonlocal pending_uploads
+            async with semaphore:
+                async with self._uploaded(segment.saved, "audio") as uploaded_file:
+                    pending_uploads -= 1
+                    if pending_uploads == 0:
+                        await progress("uploaded")
+                    response = await self._generate(
+                        [uploaded_file, SEGMENT_TRANSCRIPT_PROMPT], stage="transcribe_segment"
+                    )
+            return response.text
+        
+        transcripts = await asyncio.gather(*(transcribe(segment) for segment in segments))
+        return stitch_transcripts(segments, transcripts)
+    
+    async def transcribe_clip(self, audio: bytes, mime_type: str = "audio/wav") -> str:
+        """Transcribe a short clip sent inline, with [MM:SS] timestamps from its start
+        
+        Used for live audio windows, which are small enough to skip the File
+        API upload and PROCESSING wait.
+        """
+        from google.genai import types
+        
+        response = await self._generate(
+            [types.Part.from_bytes(data=audio, mime_type=mime_type), SEGMENT_TRANSCRIPT_PROMPT],
+            stage="transcribe_live"
+        )
+        return response.text
+    
+    async def _analyze_uploaded_conversation(self, uploaded_file, mode: str, progress=None) -> dict:
+        """Run the transcription, diarization and summary stages on an ACTIVE upload"""
+        logger.info("Audio processed successfully, generating transcript...")
+        
+        async def report(stage: str):
+            if progress:
+                await progress(stage)
+        
+        if mode == "single":
+            # One structured call returns transcript, diarization and summary
+            result = await self._analyze_conversation_single_call(uploaded_file)
+            for stage in ("transcribed", "diarized", "summarized"):
+                await report(stage)
+            return result
+        
+        # Step 1: Generate transcript
+        transcript_response = await self._generate([uploaded_file, TRANSCRIPT_PROMPT], stage="transcribe")
+        transcript = transcript_response.text
+        await report("transcribed")
+        
+        return await self.diarize_and_summarize(transcript, report)
+    
+    async def diarize_and_summarize(self, transcript: str, report) -> dict:
+        """Steps 2 and 3 only depend on the transcript, so run them concurrently
+        
+        ``report`` is awaited with "diarized" and "summarized" as each finishes.
+        """
+        async def then_report(stage: str, coro):
+            result = await coro
+            await report(stage)
+            return result
+        
+        diarized_transcript, summary = await asyncio.gather(
+            then_report("diarized", self.diarize_transcript(transcript)),
+            then_report("summarized", self._summarize_conversation(transcript))
+        )
+        
+        return {
+            "transcript": transcript,
+            "diarization": diarized_transcript,
+            "summary": summary
+        }
+    
+    async def _release_session(self, session: ContextSession):
+        """Queue an evicted session's cache and upload for deletion"""
+        if session.cache_name:
+            cleanup_queue.delete_remote(session.cache_name, self._delete_cache)
+        if session.file_name:
+            await self._discard_file(session.file_name)
+    
+    async def _cache_session_context(self, session: ContextSession):
+        """Put a session's contents in a context cache, if they qualify
+        
+        Contexts estimated below CONTEXT_CACHE_MIN_TOKENS are resent with each
+        question, as are contexts the API refuses to cache. The session keeps
+        its contents either way, so a cache that expires can be rebuilt.
+        """
+        if not CONTEXT_CACHE_ENABLED:
+            return
+        if session.context_tokens is not None and session.context_tokens < CONTEXT_CACHE_MIN_TOKENS:
+            return
+        
+        ttl = self.context_sessions.ttl_seconds
+        try:
+            cache = await self._create_cache(session.contents, SESSION_INSTRUCTIONS[session.kind], ttl)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.info(f"Not caching {session.kind} session context, resending it instead: {str(e)}")
+            return
+        
+        session.cache_name = cache.name
+        session.cache_expires_at = time.time() + ttl
+        usage = getattr(cache, "usage_metadata", None)
+        if usage is not None and usage.total_token_count:
+            session.context_tokens = usage.total_token_count
+        logger.info(f"Cached {session.kind} session context as {cache.name} ({session.context_tokens} tokens)")
+    
+    async def _start_session(self, session: ContextSession, prompt: Optional[str]) -> dict:
+        """Cache the session's context, register it and answer the first question"""
+        try:
+            await self._cache_session_context(session)
+        except BaseException:
+            await self._release_session(session)
+            raise
+        await self.context_sessions.add(session)
+        request_context.annotate("context_cached", session.cache_name is not None)
+        
+        try:
+            answer = await self.ask_session(session.id, prompt or SESSION_DEFAULT_PROMPTS[session.kind])
+        except BaseException:
+            await self.context_sessions.remove(session.id)
+            raise
+        return {"sessionId": session.id, **answer}
+    
+    async def create_image_session(self, saved: SavedUpload, prompt: Optional[str] = None) -> dict:
+        """Start a question session about a saved image
+        
+        Images are far below the caching minimum, so the session keeps the
+        preprocessed image (inline bytes, or a File API upload when large) and
+        resends it; follow-ups still skip preprocessing and the upload.
+        """
+        try:
+            saved, _ = await self._prepare_image(saved)
+            if saved.size <= INLINE_IMAGE_MAX_BYTES:
+                from google.genai import types
+                
+                data = await asyncio.to_thread(saved.read_bytes)
+                session = ContextSession(
+                    "image", saved.filename, [types.Part.from_bytes(data=data, mime_type=image_mime_type(saved))],
+                    size=len(data), context_tokens=IMAGE_TOKENS
+                )
+            else:
+                uploaded_file = await self._upload_file(saved.path)
+                try:
+                    uploaded_file = await self._wait_until_active(uploaded_file, "image")
+                except BaseException:
+                    await self._discard_file(uploaded_file.name)
+                    raise
+                session = ContextSession(
+                    "image", saved.filename, [uploaded_file], size=0,
+                    context_tokens=IMAGE_TOKENS, file_name=uploaded_file.name
+                )
+        finally:
+            saved.discard()
+        
+        return await self._start_session(session, prompt)
+    
+    async def create_document_session(self, text: str, source: Optional[str] = None,
+                                      prompt: Optional[str] = None) -> dict:
+        """Start a question session about extracted document text"""
+        session = ContextSession(
+            "document", source, [f"Document:\n\n{text}"], size=len(text), context_tokens=estimate_tokens(text)
+        )
+        return await self._start_session(session, prompt)
+    
+    async def create_conversation_session(self, saved: SavedUpload, prompt: Optional[str] = None) -> dict:
+        """Start a question session about a saved call recording"""
+        try:
+            uploaded_file = await self._upload_file(saved.path)
+            try:
+                uploaded_file = await self._wait_until_active(uploaded_file, "audio")
+            except BaseException:
+                await self._discard_file(uploaded_file.name)
+                raise
+        finally:
+            saved.discard()
+        
+        # The token count of audio is only known once the API has seen it
+        session = ContextSession("conversation", saved.filename, [uploaded_file], size=0,
+                                 file_name=uploaded_file.name)
+        return await self._start_session(session, prompt)
+    
+    async def _extend_session_cache(self, session: ContextSession, name: str):
+        """Push back the expiry of the session's cache ``name``; failures are only logged"""
+        ttl = self.context_sessions.ttl_seconds
+        try:
+            await self._extend_cache(name, ttl)
+        except Exception as e:
+            logger.warning(f"Failed to extend context cache {name}: {str(e)}")
+            return
+        # Unless the question meanwhile replaced it
+        if session.cache_name == name:
+            session.cache_expires_at = time.time() + ttl
+    
+    async def _ask_cached(self, session: ContextSession, prompt: str):
+        """Ask against the session's context cache, rebuilding it if it is gone
+        
+        Returns None when the cache could not be rebuilt, in which case the
+        caller resends the contents instead.
+        """
+        try:
+            return await self._generate([prompt], {"cached_content": session.cache_name}, stage="session_question")
+        except Exception as e:
+            if not is_missing_cache(e):
+                raise
+            logger.warning(f"Context cache {session.cache_name} of session {session.id} is gone, rebuilding it")
+        
+        session.cache_name = None
+        session.cache_expires_at = None
+        request_context.annotate("context_cache_rebuilt", True)
+        await self._cache_session_context(session)
+        if session.cache_name is None:
+            return None
+        return await self._generate([prompt], {"cached_content": session.cache_name}, stage="session_question")
+    
+    async def ask_session(self, session_id: str, question: str) -> dict:
+        """Answer a question about a session's context
+        
+        Raises SessionNotFound when the session does not exist or has expired.
+        """
+        async with self.context_sessions.lease(session_id) as session:
+            prompt = session.prompt_for(question, self.context_sessions.max_history_turns)
+            
+            # The lease pushed back the session's expiry; keep the cache alive as
+            # long, alongside the question so it adds no latency
+            extending = None
+            if session.cache_name and session.cache_expires_at < session.expires_at:
+                extending = asyncio.create_task(self._extend_session_cache(session, session.cache_name))
+            try:
+                response = await self._ask_cached(session, prompt) if session.cache_name else None
+                if response is None:
+                    config = {"system_instruction": SESSION_INSTRUCTIONS[session.kind]}
+                    response = await self._generate([*session.contents, prompt], config, stage="session_question")
+            finally:
+                if extending is not None:
+                    await extending
+            session.record(question, response.text, response.usage_metadata)
+            
+            return {
+                "answer": response.text,
+                "usage": usage_to_dict(response.usage_metadata),
+                "session": session.view(),
+            }
@@ -0,0 +1,72 @@
+import re
+from html.parser import HTMLParser
+
+# Elements whose content is never readable text
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe"}
+
+# Elements that start a new line of text
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "figcaption", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th",
+    "title", "tr", "ul",
+}
+
+class _ReadableTextParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.title = ""
+        self._skip_depth = 0
+        self._in_title = False
+        self._in_head = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "head":
+            self._in_head = True
+        elif tag == "body" or (tag in BLOCK_TAGS and tag != "title"):
+            # </head> is optional: the body (or any body content) ends the head
+            self._in_head = False
+        if tag == "title":
+            self._in_title = True
+        elif tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self._in_head = False
+        if tag == "title":
+            self._in_title = False
+        elif tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth and not self._in_head:
+            self.parts.append(data)
+
+def html_to_text(html: str) -> str:
+    """Extract readable text from an HTML document, dropping markup and scripts"""
+    parser = _ReadableTextParser()
+    parser.feed(html)
+    parser.close()
+
+    lines = []
+    for line in "".join(parser.parts).split("\n"):
+        line = re.sub(r"\s+", " ", line).strip()
+        if line:
+            lines.append(line)
+
+    title = re.sub(r"\s+", " ", parser.title).strip()
+    if title:
+        lines.insert(0, title)
+    return "\n".join(lines)
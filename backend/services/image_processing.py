@@ -0,0 +1,44 @@
+import logging
+import os
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1536"))
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "WEBP").upper()
+IMAGE_OUTPUT_QUALITY = int(os.getenv("IMAGE_OUTPUT_QUALITY", "85"))
+
+OUTPUT_MIME_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+OUTPUT_EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg", "PNG": ".png"}
+
+def preprocess_image(source_path: str, output_path: str) -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """Downscale, strip metadata and re-encode an image
+
+    Writes the result to ``output_path`` and returns (original size, new
+    size), or None when the file should be sent as-is (unreadable or
+    animated images).
+    """
+    # Pillow is only needed once an image actually arrives
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(source_path) as image:
+            if getattr(image, "is_animated", False):
+                return None
+            original_size = image.size
+            # Apply EXIF orientation before the metadata is dropped
+            image = ImageOps.exif_transpose(image)
+
+            image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.Resampling.LANCZOS)
+            if IMAGE_OUTPUT_FORMAT == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+            # Saving without exif/icc arguments leaves all metadata behind
+            image.save(output_path, format=IMAGE_OUTPUT_FORMAT, quality=IMAGE_OUTPUT_QUALITY)
+            return original_size, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning(f"Skipping image preprocessing: {str(e)}")
+        return None
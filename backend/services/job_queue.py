@@ -0,0 +1,287 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException
+
+from services.job_store import JobStore
+
+logger = logging.getLogger(__name__)
+
+# Hosts webhooks may be sent to even when they resolve to an internal
+# address, e.g. "hooks.internal,10.0.0.5". Any other host must resolve to
+# public addresses only.
+JOB_WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+async def check_webhook_url(url: str):
+    """Raise ValueError unless ``url`` is an http(s) URL the server may POST job results to
+
+    Loopback, private, link-local and other non-public addresses are refused,
+    so clients can't make the server call its own network, unless the host
+    is listed in JOB_WEBHOOK_ALLOWED_HOSTS.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("webhookUrl must be an http(s) URL")
+    host = parts.hostname.lower()
+    if host in JOB_WEBHOOK_ALLOWED_HOSTS:
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        raise ValueError(f"webhookUrl host {host} could not be resolved")
+    if not all(_is_public(info[4][0]) for info in addresses):
+        raise ValueError(f"webhookUrl host {host} is not a public address")
+
+class JobQueue:
+    """Bounded in-process queue running long jobs on a fixed pool of workers
+
+    Job state lives in a ``JobStore`` so clients can poll it. The queue holds
+    a lease on each of its unfinished jobs and renews it every third of
+    ``lease_seconds``; jobs whose lease lapsed, e.g. because the process
+    holding them died, are taken over on start and while there is room.
+    Handlers are registered per job kind and are called as
+    ``handler(payload, progress)``, where ``progress`` is an async callable
+    taking a stage name.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, max_queued: int = 100,
+                 result_ttl_seconds: float = 24 * 3600, webhook_timeout: float = 10,
+                 lease_seconds: float = 60):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl_seconds = result_ttl_seconds
+        self.webhook_timeout = webhook_timeout
+        self.lease_seconds = lease_seconds
+        # Identifies this queue's leases in a store shared between processes
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers = {}
+        self._queue = asyncio.Queue(maxsize=max_queued)
+        self._tasks = []
+        self._http_client = None
+        self._counters = {
+            "submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0,
+            "recovered": 0, "webhooks_sent": 0, "webhooks_failed": 0,
+        }
+
+    @classmethod
+    def from_env(cls, store: JobStore) -> "JobQueue":
+        return cls(
+            store,
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_queued=int(os.getenv("JOB_QUEUE_MAX", "100")),
+            result_ttl_seconds=float(os.getenv("JOB_RESULT_TTL_SECONDS", str(24 * 3600))),
+            webhook_timeout=float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10")),
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+        )
+
+    def register(self, kind: str, handler):
+        self._handlers[kind] = handler
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def has_capacity(self) -> bool:
+        return not self._queue.full()
+
+    def _reject(self) -> HTTPException:
+        self._counters["rejected"] += 1
+        return HTTPException(
+            status_code=429,
+            detail="Too many queued jobs. Please retry later.",
+            headers={"Retry-After": "30"}
+        )
+
+    def ensure_capacity(self):
+        """Raise 429 before the caller does expensive work for a job that can't be queued"""
+        if not self.has_capacity():
+            raise self._reject()
+
+    def _lease_deadline(self) -> float:
+        return time.time() + self.lease_seconds
+
+    async def start(self):
+        await self.store.open()
+        await self.store.delete_expired()
+        await self._recover()
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info(f"Job queue started with {self.workers} workers ({self.store.backend} store)")
+
+    async def _recover(self):
+        """Queue jobs whose lease lapsed, as many as there is room for"""
+        room = self.max_queued - self._queue.qsize()
+        if room <= 0:
+            return
+        jobs = await self.store.recover_expired(self.owner, self._lease_deadline(), room)
+        for job in jobs:
+            if self._queue.full():
+                # Filled up by submissions meanwhile; let the lease lapse again
+                await self.store.update(job["id"], lease_expires_at=0)
+                continue
+            self._queue.put_nowait(job["id"])
+            self._counters["recovered"] += 1
+        if jobs:
+            logger.info(f"Took over {len(jobs)} jobs with expired leases")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.store.renew_leases(self.owner, self._lease_deadline())
+                await self._recover()
+            except Exception as e:
+                logger.warning(f"Failed to renew job leases: {str(e)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def submit(self, kind: str, payload: dict, webhook_url: Optional[str] = None) -> dict:
+        """Persist a job and queue it, or raise 429 when the queue is full"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        if self._queue.full():
+            raise self._reject()
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "stage": None,
+            "progress": {},
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "webhook_url": webhook_url,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": None,
+            "owner": self.owner,
+            "lease_expires_at": self._lease_deadline(),
+        }
+        await self.store.create(job)
+        self._queue.put_nowait(job["id"])
+        self._counters["submitted"] += 1
+        logger.info(f"Queued {kind} job {job['id']} ({self._queue.qsize()} waiting)")
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job worker failed on {job_id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.store.claim(job_id, self.owner, self._lease_deadline())
+        if job is None:
+            # Finished, expired or taken over by another queue
+            return
+
+        progress = dict(job["progress"] or {})
+
+        # Stages can finish concurrently; keep writes in the order they happened
+        lock = asyncio.Lock()
+
+        async def report(stage: str):
+            async with lock:
+                progress[stage] = time.time()
+                await self.store.update(job_id, stage=stage, progress=progress, updated_at=time.time())
+
+        try:
+            result = await self._handlers[job["kind"]](job["payload"], report)
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Job {job_id} failed: {error}")
+            await self._finish(job_id, error=error)
+        else:
+            await self._finish(job_id, result=result)
+
+    async def _finish(self, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+        now = time.time()
+        status = "failed" if error else "succeeded"
+        self._counters[status] += 1
+        await self.store.update(
+            job_id,
+            status=status,
+            result=result,
+            error=error,
+            updated_at=now,
+            expires_at=now + self.result_ttl_seconds
+        )
+        await self.store.delete_expired()
+
+        job = await self.store.get(job_id)
+        if job and job["webhook_url"]:
+            await self._notify(job)
+
+    async def _notify(self, job: dict):
+        """POST the finished job to its webhook; failures are logged, not retried"""
+        import httpx
+
+        # Checked again: the host may resolve differently than at submission
+        try:
+            await check_webhook_url(job["webhook_url"])
+        except ValueError as e:
+            self._counters["webhooks_failed"] += 1
+            logger.warning(f"Webhook for job {job['id']} refused: {str(e)}")
+            return
+
+        if self._http_client is None:
+            # Redirects are not followed, so a public host can't bounce the POST inward
+            self._http_client = httpx.AsyncClient(timeout=self.webhook_timeout, follow_redirects=False)
+        try:
+            response = await self._http_client.post(job["webhook_url"], json=public_view(job))
+            response.raise_for_status()
+            self._counters["webhooks_sent"] += 1
+        except httpx.HTTPError as e:
+            self._counters["webhooks_failed"] += 1
+            logger.warning(f"Webhook for job {job['id']} failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "workers": self.workers,
+            "lease_seconds": self.lease_seconds,
+            "store": self.store.backend,
+        }
+
+# Job fields only the queue needs
+INTERNAL_FIELDS = ("payload", "owner", "lease_expires_at")
+
+def public_view(job: dict) -> dict:
+    """A job as returned to clients, without the payload and lease"""
+    return {key: value for key, value in job.items() if key not in INTERNAL_FIELDS}
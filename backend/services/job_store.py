@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+# Fields persisted for each job; "payload" is what the worker needs to run it.
+# "owner" is the queue holding the job until "lease_expires_at".
+JOB_FIELDS = (
+    "id", "kind", "status", "stage", "progress", "payload", "result", "error",
+    "webhook_url", "created_at", "updated_at", "expires_at", "owner", "lease_expires_at",
+)
+
+# Default location of the SQLite store, next to the services package
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "jobs.sqlite3")
+
+class JobStore(ABC):
+    """Storage interface for background jobs
+
+    Jobs are plain dicts with the keys in JOB_FIELDS. Subclasses implement
+    persistence; the queue only ever goes through these methods.
+
+    Unfinished jobs are leased to the queue that owns them. The owner keeps
+    renewing the lease; once it lapses, e.g. because that process died,
+    another queue can take the job over. Claims are atomic, so each run of a
+    job happens in exactly one queue.
+    """
+
+    async def open(self):
+        """Prepare the store; called once when the queue starts"""
+
+    @abstractmethod
+    async def create(self, job: dict):
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    async def claim(self, job_id: str, owner: str, lease_expires_at: float) -> Optional[dict]:
+        """Mark a job running for ``owner``, or None if another queue holds it or it is done"""
+
+    @abstractmethod
+    async def renew_leases(self, owner: str, lease_expires_at: float) -> int:
+        """Extend the lease on every unfinished job held by ``owner``"""
+
+    @abstractmethod
+    async def recover_expired(self, owner: str, lease_expires_at: float, limit: int) -> List[dict]:
+        """Take over up to ``limit`` unfinished jobs whose lease has lapsed, re-queued for ``owner``"""
+
+    @abstractmethod
+    async def list_unfinished(self) -> List[dict]:
+        """Jobs queued or running in any queue"""
+
+    @abstractmethod
+    async def delete_expired(self) -> int:
+        ...
+
+    @property
+    @abstractmethod
+    def backend(self) -> str:
+        ...
+
+def is_claimable(job: dict, owner: str, now: float) -> bool:
+    """Queued for ``owner``, or unfinished with a lapsed lease"""
+    if job["status"] == "queued" and job["owner"] == owner:
+        return True
+    return job["status"] in ("queued", "running") and (job["lease_expires_at"] or 0) <= now
+
+class MemoryJobStore(JobStore):
+    """Jobs held in a dict; lost on restart"""
+
+    def __init__(self):
+        self._jobs = {}
+
+    async def create(self, job: dict):
+        self._jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None or (job["expires_at"] and job["expires_at"] <= time.time()):
+            return None
+        return dict(job)
+
+    async def update(self, job_id: str, **fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def claim(self, job_id: str, owner: str, lease_expires_at: float) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        now = time.time()
+        if job is None or not is_claimable(job, owner, now):
+            return None
+        job.update(status="running", owner=owner, lease_expires_at=lease_expires_at, updated_at=now)
+        return dict(job)
+
+    async def renew_leases(self, owner: str, lease_expires_at: float) -> int:
+        held = [job for job in self._jobs.values() if job["owner"] == owner and job["status"] in ("queued", "running")]
+        for job in held:
+            job["lease_expires_at"] = lease_expires_at
+        return len(held)
+
+    async def recover_expired(self, owner: str, lease_expires_at: float, limit: int) -> List[dict]:
+        now = time.time()
+        expired = sorted(
+            (job for job in self._jobs.values()
+             if job["status"] in ("queued", "running") and (job["lease_expires_at"] or 0) <= now),
+            key=lambda job: job["created_at"]
+        )[:limit]
+        for job in expired:
+            job.update(status="queued", owner=owner, lease_expires_at=lease_expires_at, updated_at=now)
+        return [dict(job) for job in expired]
+
+    async def list_unfinished(self) -> List[dict]:
+        return [dict(job) for job in self._jobs.values() if job["status"] in ("queued", "running")]
+
+    async def delete_expired(self) -> int:
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job["expires_at"] and job["expires_at"] <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    @property
+    def backend(self) -> str:
+        return "memory"
+
+class SQLiteJobStore(JobStore):
+    """Jobs persisted in SQLite so results and pending work survive a restart"""
+
+    # Stored as JSON text
+    JSON_FIELDS = ("progress", "payload", "result")
+
+    # Added after the first release; older databases get them on open
+    LEASE_COLUMNS = {"owner": "TEXT", "lease_expires_at": "REAL"}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, "
+                "progress TEXT, payload TEXT, result TEXT, error TEXT, webhook_url TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL, "
+                "owner TEXT, lease_expires_at REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in self.LEASE_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        logger.info(f"Job store opened at {self.path}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _encode(self, fields: dict) -> dict:
+        return {
+            key: json.dumps(value) if key in self.JSON_FIELDS and value is not None else value
+            for key, value in fields.items()
+        }
+
+    def _decode(self, row) -> dict:
+        job = dict(zip(JOB_FIELDS, row))
+        for key in self.JSON_FIELDS:
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def _create(self, job: dict):
+        encoded = self._encode(job)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({', '.join('?' for _ in JOB_FIELDS)})",
+                [encoded.get(key) for key in JOB_FIELDS]
+            )
+
+    def _get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, time.time())
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def _update(self, job_id: str, fields: dict):
+        encoded = self._encode(fields)
+        columns = [key for key in encoded if key in JOB_FIELDS and key != "id"]
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{key} = ?' for key in columns)} WHERE id = ?",
+                [encoded[key] for key in columns] + [job_id]
+            )
+
+    def _claim(self, job_id: str, owner: str, lease_expires_at: float) -> Optional[dict]:
+        now = time.time()
+        with self._connect() as conn:
+            # A single UPDATE, so two queues can never both claim the job
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND ((status = 'queued' AND owner = ?) "
+                "OR (status IN ('queued', 'running') AND COALESCE(lease_expires_at, 0) <= ?))",
+                (owner, lease_expires_at, now, job_id, owner, now)
+            ).rowcount
+        return self._get(job_id) if claimed else None
+
+    def _renew_leases(self, owner: str, lease_expires_at: float) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (lease_expires_at, owner)
+            ).rowcount
+
+    def _recover_expired(self, owner: str, lease_expires_at: float, limit: int) -> List[dict]:
+        now = time.time()
+        with self._connect() as conn:
+            # Hold the write lock between choosing the jobs and taking them over
+            conn.execute("BEGIN IMMEDIATE")
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') "
+                "AND COALESCE(lease_expires_at, 0) <= ? ORDER BY created_at LIMIT ?",
+                (now, limit)
+            )]
+            conn.executemany(
+                "UPDATE jobs SET status = 'queued', owner = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                [(owner, lease_expires_at, now, job_id) for job_id in ids]
+            )
+            rows = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id IN ({', '.join('?' for _ in ids)}) "
+                "ORDER BY created_at",
+                ids
+            ).fetchall() if ids else []
+        return [self._decode(row) for row in rows]
+
+    def _list_unfinished(self) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE status IN ('queued', 'running') "
+                "ORDER BY created_at"
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _delete_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    async def open(self):
+        await asyncio.to_thread(self._open)
+
+    async def create(self, job: dict):
+        await asyncio.to_thread(self._create, job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def update(self, job_id: str, **fields):
+        await asyncio.to_thread(self._update, job_id, fields)
+
+    async def claim(self, job_id: str, owner: str, lease_expires_at: float) -> Optional[dict]:
+        return await asyncio.to_thread(self._claim, job_id, owner, lease_expires_at)
+
+    async def renew_leases(self, owner: str, lease_expires_at: float) -> int:
+        return await asyncio.to_thread(self._renew_leases, owner, lease_expires_at)
+
+    async def recover_expired(self, owner: str, lease_expires_at: float, limit: int) -> List[dict]:
+        return await asyncio.to_thread(self._recover_expired, owner, lease_expires_at, limit)
+
+    async def list_unfinished(self) -> List[dict]:
+        return await asyncio.to_thread(self._list_unfinished)
+
+    async def delete_expired(self) -> int:
+        return await asyncio.to_thread(self._delete_expired)
+
+    @property
+    def backend(self) -> str:
+        return "sqlite"
+
+def job_store_from_env() -> JobStore:
+    """Build the store selected by JOB_STORE ("sqlite" or "memory")
+
+    The store is not touched until ``open()``, which the queue calls on start.
+    """
+    backend = os.getenv("JOB_STORE", "sqlite").lower()
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend != "sqlite":
+        raise ValueError(f"Unknown JOB_STORE backend: {backend}")
+    return SQLiteJobStore(os.getenv("JOB_STORE_SQLITE_PATH") or DEFAULT_SQLITE_PATH)
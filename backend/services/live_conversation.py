@@ -0,0 +1,263 @@
+import asyncio
+import io
+import logging
+import os
+import struct
+import wave
+from typing import List, Tuple
+
+from services.audio_segmentation import AudioSegment, quietest_point, stitch_transcripts
+from services import request_context
+
+logger = logging.getLogger(__name__)
+
+# Live audio is transcribed in rolling windows of about this many seconds,
+# cut at a pause within the search distance of the target and overlapping
+# their neighbours so words across a cut are heard whole
+LIVE_WINDOW_SECONDS = float(os.getenv("LIVE_WINDOW_SECONDS", "15"))
+LIVE_WINDOW_OVERLAP_SECONDS = float(os.getenv("LIVE_WINDOW_OVERLAP_SECONDS", "2"))
+LIVE_SILENCE_SEARCH_SECONDS = float(os.getenv("LIVE_SILENCE_SEARCH_SECONDS", "3"))
+LIVE_WINDOW_CONCURRENCY = int(os.getenv("LIVE_WINDOW_CONCURRENCY", "2"))
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", str(4 * 3600)))
+
+# A trailing window shorter than this is dropped when the stream stops
+MIN_FINAL_WINDOW_SECONDS = 0.5
+
+PCM_ENCODINGS = ("pcm_s16le", "linear16")
+MULAW_ENCODINGS = ("mulaw", "ulaw", "audio/x-mulaw")
+
+def _mulaw_sample(byte: int) -> bytes:
+    """Decode one G.711 mu-law byte to a little-endian 16-bit sample"""
+    byte = ~byte & 0xFF
+    exponent = (byte >> 4) & 0x07
+    magnitude = ((((byte & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return struct.pack("<h", -magnitude if byte & 0x80 else magnitude)
+
+MULAW_TABLE = [_mulaw_sample(byte) for byte in range(256)]
+
+class AudioFormat:
+    """Encoding and sample rate of a mono live stream, as announced by its start message"""
+
+    def __init__(self, encoding: str = "pcm_s16le", sample_rate: int = 16000):
+        encoding = encoding.lower()
+        if encoding not in PCM_ENCODINGS + MULAW_ENCODINGS:
+            raise ValueError(f"Unsupported audio encoding: {encoding}")
+        if not 4000 <= sample_rate <= 48000:
+            raise ValueError(f"Unsupported sample rate: {sample_rate}")
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_start_message(cls, message: dict) -> "AudioFormat":
+        """Read the format from our own start message or a Plivo stream's
+
+        Plivo nests it as ``start.mediaFormat`` with ``encoding`` and
+        ``sampleRate``; other clients send the same keys at the top level.
+        """
+        media_format = (message.get("start") or {}).get("mediaFormat") or message
+        return cls(
+            encoding=str(media_format.get("encoding", "pcm_s16le")),
+            sample_rate=int(media_format.get("sampleRate", 16000)),
+        )
+
+    def to_pcm(self, chunk: bytes) -> bytes:
+        if self.encoding in MULAW_ENCODINGS:
+            return b"".join(MULAW_TABLE[byte] for byte in chunk)
+        return chunk
+
+class LiveWindowBuffer:
+    """Collect mono 16-bit PCM and cut it into overlapping windows at pauses
+
+    Only audio not yet covered by an emitted window is kept, so memory stays
+    bounded however long the stream runs.
+    """
+
+    def __init__(self, sample_rate: int, window_seconds: float = LIVE_WINDOW_SECONDS,
+                 overlap_seconds: float = LIVE_WINDOW_OVERLAP_SECONDS,
+                 search_seconds: float = LIVE_SILENCE_SEARCH_SECONDS):
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.search_seconds = min(search_seconds, window_seconds / 3)
+        self._pcm = bytearray()
+        # Stream position (in frames) of the first buffered frame
+        self._buffer_start = 0
+        # Start cut (in seconds) of the next window
+        self._cut = 0.0
+        self._index = 0
+
+    @property
+    def received_seconds(self) -> float:
+        return (self._buffer_start + len(self._pcm) // 2) / self.sample_rate
+
+    def add(self, pcm: bytes) -> List[Tuple[AudioSegment, bytes]]:
+        """Append audio and return any windows that are now complete"""
+        self._pcm += pcm
+        windows = []
+        lookahead = self.search_seconds + self.overlap_seconds / 2
+        while self.received_seconds >= self._cut + self.window_seconds + lookahead:
+            target = self._cut + self.window_seconds
+            search_start = target - self.search_seconds
+            pause = quietest_point(
+                self._slice(search_start, target + self.search_seconds),
+                self.sample_rate, 1, self.search_seconds
+            )
+            end = target if pause is None else search_start + pause
+            windows.append(self._emit(end))
+        return windows
+
+    def flush(self) -> List[Tuple[AudioSegment, bytes]]:
+        """Return the final, shorter window once the stream has stopped"""
+        if self.received_seconds - self._cut < MIN_FINAL_WINDOW_SECONDS:
+            return []
+        return [self._emit(self.received_seconds)]
+
+    def _frame(self, seconds: float) -> int:
+        return min(max(int(seconds * self.sample_rate), self._buffer_start),
+                   self._buffer_start + len(self._pcm) // 2)
+
+    def _slice(self, start: float, end: float) -> bytes:
+        first = (self._frame(start) - self._buffer_start) * 2
+        last = (self._frame(end) - self._buffer_start) * 2
+        return bytes(self._pcm[first:last])
+
+    def _emit(self, end: float) -> Tuple[AudioSegment, bytes]:
+        start = self._cut
+        offset = self._frame(start - self.overlap_seconds / 2) / self.sample_rate
+        pcm = self._slice(offset, end + self.overlap_seconds / 2)
+        segment = AudioSegment(self._index, None, start, end, offset)
+        self._index += 1
+        self._cut = end
+
+        # Drop audio that no later window can need
+        keep_from = self._frame(end - self.overlap_seconds / 2)
+        del self._pcm[:(keep_from - self._buffer_start) * 2]
+        self._buffer_start = keep_from
+        return segment, self._wav(pcm)
+
+    def _wav(self, pcm: bytes) -> bytes:
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm)
+        return output.getvalue()
+
+class LiveConversationSession:
+    """Incremental transcription and diarization of one live audio stream
+
+    Each window is transcribed as soon as it is complete (up to
+    LIVE_WINDOW_CONCURRENCY at once). Whenever the transcript grows by a
+    contiguous run of windows, a "transcript" event with the stitched text
+    so far is sent, and the diarization is refreshed in the background;
+    while one diarization runs, newer transcripts replace each other so only
+    the latest is diarized next. ``finish`` transcribes the tail and
+    produces the final diarization and summary.
+    """
+
+    def __init__(self, gemini_service, audio_format: AudioFormat, send):
+        self.gemini_service = gemini_service
+        self.format = audio_format
+        self.buffer = LiveWindowBuffer(audio_format.sample_rate)
+        self._send_event = send
+        self._send_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(LIVE_WINDOW_CONCURRENCY)
+        self._segments = []
+        self._transcripts = {}
+        self._tasks = []
+        self._published = 0
+        self._latest_transcript = None
+        self._diarization_task = None
+
+    async def send(self, event: dict):
+        # Window tasks and the diarization loop share one socket
+        async with self._send_lock:
+            await self._send_event(event)
+
+    async def feed(self, chunk: bytes):
+        """Add a chunk of audio in the stream's encoding"""
+        for segment, wav in self.buffer.add(self.format.to_pcm(chunk)):
+            self._start_window(segment, wav)
+        if self.buffer.received_seconds > LIVE_MAX_SECONDS:
+            raise ValueError(f"Live streams are limited to {LIVE_MAX_SECONDS / 60:.0f} minutes")
+
+    def _start_window(self, segment: AudioSegment, wav: bytes):
+        self._segments.append(segment)
+        self._tasks.append(asyncio.create_task(self._transcribe(segment, wav)))
+
+    async def _transcribe(self, segment: AudioSegment, wav: bytes):
+        try:
+            async with self._semaphore:
+                text = await self.gemini_service.transcribe_clip(wav)
+        except Exception as e:
+            logger.error(f"Error transcribing live window {segment.index}: {str(e)}")
+            await self.send({"event": "error", "window": segment.index, "detail": f"Failed to transcribe audio: {str(e)}"})
+            text = ""
+        self._transcripts[segment.index] = text
+        await self._publish()
+
+    def _stitched(self, count: int, complete: bool) -> str:
+        return stitch_transcripts(
+            self._segments[:count], [self._transcripts[index] for index in range(count)], complete
+        )
+
+    async def _publish(self):
+        ready = self._published
+        while ready in self._transcripts:
+            ready += 1
+        if ready == self._published:
+            return
+        self._published = ready
+        transcript = self._stitched(ready, complete=False)
+        await self.send({
+            "event": "transcript",
+            "windows": ready,
+            "seconds": round(self._segments[ready - 1].end, 2),
+            "transcript": transcript,
+        })
+        self._latest_transcript = transcript
+        if self._diarization_task is None or self._diarization_task.done():
+            self._diarization_task = asyncio.create_task(self._diarize_latest())
+
+    async def _diarize_latest(self):
+        diarized = None
+        while self._latest_transcript != diarized:
+            diarized = self._latest_transcript
+            try:
+                diarization = await self.gemini_service.diarize_transcript(diarized)
+            except Exception as e:
+                logger.warning(f"Live diarization failed: {str(e)}")
+                return
+            await self.send({"event": "diarization", "diarization": diarization})
+
+    async def finish(self) -> dict:
+        """Transcribe the remaining audio and produce the final analysis"""
+        for segment, wav in self.buffer.flush():
+            self._start_window(segment, wav)
+        await asyncio.gather(*self._tasks)
+        # The final diarization below supersedes any partial one
+        await self._cancel_diarization()
+
+        transcript = self._stitched(len(self._segments), complete=True)
+        request_context.annotate("live_windows", len(self._segments))
+        request_context.annotate("audio_seconds", round(self.buffer.received_seconds, 2))
+        if not transcript.strip():
+            return {"transcript": "", "diarization": "", "summary": ""}
+
+        async def report(stage: str):
+            await self.send({"event": "progress", "stage": stage})
+
+        return await self.gemini_service.diarize_and_summarize(transcript, report)
+
+    async def _cancel_diarization(self):
+        if self._diarization_task is not None:
+            self._diarization_task.cancel()
+            await asyncio.gather(self._diarization_task, return_exceptions=True)
+
+    async def close(self):
+        """Stop outstanding work, e.g. when the client disconnects"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._cancel_diarization()
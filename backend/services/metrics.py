@@ -0,0 +1,110 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from services import request_context
+
+# Buckets wide enough for both sub-millisecond parsing steps and multi-minute
+# audio pipelines
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HTTP_REQUESTS = Counter(
+    "plivo_http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "plivo_http_request_duration_seconds", "Time to produce an HTTP response", ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "plivo_http_requests_in_flight", "HTTP requests currently being handled"
+)
+STAGE_DURATION = Histogram(
+    "plivo_stage_duration_seconds", "Duration of individual processing stages", ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "plivo_stage_errors_total", "Processing stages that raised", ["stage"]
+)
+INPUT_BYTES = Counter(
+    "plivo_input_bytes_total", "Bytes received from uploads and fetched URLs", ["source"]
+)
+EXTRACTED_CHARS = Counter(
+    "plivo_extracted_chars_total", "Characters of text extracted from documents", ["format"]
+)
+MODEL_TOKENS = Counter(
+    "plivo_model_tokens_total", "Tokens reported by the model", ["kind"]
+)
+GEMINI_CALLS_IN_FLIGHT = Gauge(
+    "plivo_gemini_calls_in_flight", "Gemini calls admitted by the rate limiter and not yet finished"
+)
+GEMINI_QUEUE_DEPTH = Gauge(
+    "plivo_gemini_queue_depth", "Gemini calls waiting for the rate limiter"
+)
+COALESCED_REQUESTS = Counter(
+    "plivo_coalesced_requests_total", "Calls that joined an identical in-flight call instead of running their own",
+    ["operation"]
+)
+JOBS_QUEUED = Gauge(
+    "plivo_jobs_queued", "Background jobs waiting for a worker"
+)
+CLEANUP_QUEUE_DEPTH = Gauge(
+    "plivo_cleanup_queue_depth", "Temp files and Gemini uploads waiting for background deletion"
+)
+CLEANUP_DELETIONS = Counter(
+    "plivo_cleanup_deletions_total", "Background deletions of temp files and Gemini uploads",
+    ["kind", "outcome"]
+)
+SWEPT_FILES = Counter(
+    "plivo_swept_files_total", "Orphaned temp files and Gemini uploads removed by the sweeper", ["kind"]
+)
+SWEPT_BYTES = Counter(
+    "plivo_swept_bytes_total", "Bytes reclaimed by the orphan sweeper", ["kind"]
+)
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration in the histogram and the request's Server-Timing"""
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+    request_context.record_timing(stage, seconds)
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as ``stage``"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def record_usage(usage):
+    """Count the token usage of one model response"""
+    if usage is None:
+        return
+    for kind, field in (
+        ("prompt", "prompt_token_count"),
+        ("candidates", "candidates_token_count"),
+        ("cached", "cached_content_token_count"),
+    ):
+        count = getattr(usage, field, None)
+        if count:
+            MODEL_TOKENS.labels(kind=kind).inc(count)
+
+def server_timing_header(timings: list, total: float) -> str:
+    """Format stage timings as a Server-Timing header, summing repeated stages"""
+    totals = {}
+    counts = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+        counts[name] = counts.get(name, 0) + 1
+
+    entries = []
+    for name, seconds in totals.items():
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if counts[name] > 1:
+            entry += f';desc="x{counts[name]}"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,262 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+
+from services.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Lanes in priority order: interactive requests are admitted before batch
+# work, and batch before background jobs
+PRIORITIES = ("interactive", "batch", "background")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_priority = ContextVar("gemini_priority", default="interactive")
+
+def set_priority(lane: str):
+    """Set the lane for Gemini calls made from the current task"""
+    if lane not in PRIORITIES:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    _priority.set(lane)
+
+@contextmanager
+def priority(lane: str):
+    if lane not in PRIORITIES:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    token = _priority.set(lane)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def is_retryable(error: Exception) -> bool:
+    # Imported here rather than at module load to keep startup light
+    import httpx
+    import requests
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (
+        requests.ConnectionError, requests.Timeout, httpx.TransportError, asyncio.TimeoutError
+    ))
+
+def _is_quota_error(error: Exception) -> bool:
+    from google.genai import errors
+
+    return isinstance(error, errors.APIError) and error.code == 429
+
+class LaneStats:
+    """Queue wait times for one priority lane"""
+
+    def __init__(self):
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self, queued: int) -> dict:
+        return {
+            "queued": queued,
+            "admitted": self.admitted,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+class RateLimiter:
+    """Shared admission control for Gemini model and File API calls
+
+    A token bucket caps requests per minute, a limit on in-flight calls
+    caps concurrency, and waiting callers are admitted strictly by
+    priority lane (FIFO within a lane). Retryable failures are retried
+    with full-jitter exponential backoff; quota errors that outlast the
+    retries surface as 503 so clients know to come back later.
+    """
+
+    def __init__(self, requests_per_minute: float = 1000, burst: int = 32, max_in_flight: int = 32,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0):
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._lanes = {lane: LaneStats() for lane in PRIORITIES}
+        self._counters = {"calls": 0, "retries": 0, "throttled": 0, "exhausted": 0}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            requests_per_minute=float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000")),
+            burst=int(os.getenv("GEMINI_RATE_BURST", "32")),
+            max_in_flight=int(os.getenv("GEMINI_MAX_IN_FLIGHT", "32")),
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4")),
+            base_delay=float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("GEMINI_RETRY_MAX_DELAY", "20")),
+        )
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.requests_per_minute > 0:
+            rate = self.requests_per_minute / 60
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * rate)
+        else:
+            self._tokens = float(self.burst)
+        self._refilled_at = now
+
+    def _try_take(self) -> bool:
+        self._refill()
+        if self._in_flight < self.max_in_flight and self._tokens >= 1:
+            self._tokens -= 1
+            self._in_flight += 1
+            return True
+        return False
+
+    def _dispatch(self):
+        """Admit waiters in priority order while capacity allows"""
+        self._wakeup = None
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._try_take():
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+        # Blocked on the bucket rather than concurrency: wake when a token is due
+        if (self._waiters and self._wakeup is None and self.requests_per_minute > 0
+                and self._in_flight < self.max_in_flight):
+            delay = (1 - self._tokens) * 60 / self.requests_per_minute
+            self._wakeup = asyncio.get_running_loop().call_later(max(delay, 0.001), self._dispatch)
+
+    async def acquire(self):
+        lane = _priority.get()
+        start = time.monotonic()
+        if not self._waiters and self._try_take():
+            self._lanes[lane].record(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.index(lane), next(self._sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled; hand the slot back
+                self.release()
+            raise
+        waited = time.monotonic() - start
+        self._lanes[lane].record(waited)
+        observe_stage("rate_limit_wait", waited)
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _give_up(self, error: Exception):
+        self._counters["exhausted"] += 1
+        if _is_quota_error(error):
+            raise HTTPException(
+                status_code=503,
+                detail="The AI service is over capacity. Please retry shortly.",
+                headers={"Retry-After": str(int(self.max_delay))}
+            ) from error
+        raise error
+
+    async def _handle_failure(self, error: Exception, attempt: int, label: str):
+        """Sleep before the next attempt, or raise when the error is final"""
+        if _is_quota_error(error):
+            self._counters["throttled"] += 1
+        if not is_retryable(error):
+            raise error
+        if attempt >= self.max_retries:
+            self._give_up(error)
+        delay = self._backoff(attempt)
+        self._counters["retries"] += 1
+        logger.warning(f"{label} failed ({str(error)}); retry {attempt + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def call(self, func, *args, label: str = "Gemini call", **kwargs):
+        """Run an async Gemini call under the limiter, retrying transient failures"""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire()
+            self._counters["calls"] += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                self.release()
+            await self._handle_failure(error, attempt, label)
+
+    async def stream(self, open_stream, label: str = "Gemini stream"):
+        """Relay a streaming call, holding one in-flight slot for its duration
+
+        Failures are retried only before the first chunk has been yielded,
+        so callers never see duplicated output.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire()
+            self._counters["calls"] += 1
+            started = False
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self.release()
+            await self._handle_failure(error, attempt, label)
+
+    def stats(self) -> dict:
+        queued = {lane: 0 for lane in PRIORITIES}
+        for lane_index, _, future in self._waiters:
+            if not future.done():
+                queued[PRIORITIES[lane_index]] += 1
+        self._refill()
+        return {
+            **self._counters,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": sum(queued.values()),
+            "tokens_available": round(self._tokens, 2),
+            "requests_per_minute": self.requests_per_minute,
+            "lanes": {lane: self._lanes[lane].snapshot(queued[lane]) for lane in PRIORITIES},
+        }
@@ -0,0 +1,36 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# Per-request metadata that services attach while handling a request (cache
+# hits, which code path was taken, ...). Endpoints start a fresh dict and
+# return it alongside the result; outside a request annotations are dropped.
+_annotations: ContextVar[Optional[dict]] = ContextVar("request_annotations", default=None)
+
+def start_request() -> dict:
+    """Begin collecting annotations for the current request"""
+    annotations = {}
+    _annotations.set(annotations)
+    return annotations
+
+def annotate(key: str, value):
+    """Attach a value to the current request, if one is active"""
+    annotations = _annotations.get()
+    if annotations is not None:
+        annotations[key] = value
+
+# Stage timings for the current request, reported in the Server-Timing header.
+# The metrics middleware starts the list; spans append to it from any task
+# spawned while handling the request.
+_timings: ContextVar[Optional[list]] = ContextVar("request_timings", default=None)
+
+def start_timings() -> list:
+    """Begin collecting stage timings for the current request"""
+    timings = []
+    _timings.set(timings)
+    return timings
+
+def record_timing(name: str, seconds: float):
+    """Attach a stage duration to the current request, if one is active"""
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+
+from services import request_context
+from services.metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs wait on that task and receive the same result or
+    exception. The task is shielded, so one caller disconnecting doesn't
+    cancel the work for everyone else.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight = {}
+        self._counters = {"executions": 0, "coalesced": 0}
+
+    async def do(self, key, produce):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+            COALESCED_REQUESTS.labels(operation=self.name).inc()
+            request_context.annotate(f"coalesced_{self.name}", True)
+            logger.info(f"Joined in-flight {self.name} call")
+            return await asyncio.shield(task)
+
+        self._counters["executions"] += 1
+        task = asyncio.ensure_future(produce())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda finished: self._finished(key, finished))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task: asyncio.Future):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {**self._counters, "in_flight": len(self._in_flight)}
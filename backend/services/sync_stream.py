@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+_DONE = object()
+
+async def iterate_in_thread(open_iterator):
+    """Consume a blocking iterator on the default executor, yielding its items here
+
+    ``open_iterator`` is called in the worker thread, so opening the stream
+    blocks there too. Items are handed back through an ``asyncio.Queue``;
+    errors are re-raised in the consumer. When the consumer stops early, the
+    thread stops after the item it is waiting for and closes the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def put(item, error=None):
+        if stopped.is_set():
+            return
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The loop closed while the thread was still reading
+            stopped.set()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = open_iterator()
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(_DONE, e)
+        else:
+            put(_DONE)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
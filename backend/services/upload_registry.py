@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Gemini keeps uploaded files for 48 hours
+GEMINI_FILE_LIFETIME_SECONDS = 48 * 3600
+
+class UploadEntry:
+    def __init__(self, file, size: int, expires_at: float):
+        self.file = file
+        self.size = size
+        self.uploaded_at = time.time()
+        self.expires_at = expires_at
+        self.last_used = self.uploaded_at
+        self.refs = 0
+        self.uses = 0
+
+class UploadRegistry:
+    """Reuse Gemini File API uploads across requests, keyed by content SHA-256
+
+    Entries are kept until the remote file is about to expire, until they
+    exceed ``max_age_seconds``, or until the registry goes over its entry or
+    byte budget, in which case the least recently used idle entries are
+    deleted remotely via ``delete_file``.
+    """
+
+    def __init__(self, delete_file, max_entries: int = 64, max_bytes: int = 2 * 1024 ** 3,
+                 max_age_seconds: float = 24 * 3600, expiry_margin_seconds: float = 600):
+        self._delete_file = delete_file
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.expiry_margin_seconds = expiry_margin_seconds
+        self._entries = OrderedDict()
+        self._pending = {}
+        # Uploads whose first caller went away before they finished
+        self._abandoned = weakref.WeakSet()
+        self._counters = {"uploads": 0, "reuses": 0, "evictions": 0, "bytes_saved": 0}
+
+    @classmethod
+    def from_env(cls, delete_file) -> "UploadRegistry":
+        return cls(
+            delete_file,
+            max_entries=int(os.getenv("UPLOAD_REGISTRY_MAX_ENTRIES", "64")),
+            max_bytes=int(os.getenv("UPLOAD_REGISTRY_MAX_MB", "2048")) * 1024 * 1024,
+            max_age_seconds=float(os.getenv("UPLOAD_REGISTRY_MAX_AGE_SECONDS", str(24 * 3600))),
+        )
+
+    def _expires_at(self, uploaded_file) -> float:
+        expiration = getattr(uploaded_file, "expiration_time", None)
+        if isinstance(expiration, datetime):
+            if expiration.tzinfo is None:
+                expiration = expiration.replace(tzinfo=timezone.utc)
+            remote_expiry = expiration.timestamp()
+        else:
+            remote_expiry = time.time() + GEMINI_FILE_LIFETIME_SECONDS
+        local_expiry = time.time() + self.max_age_seconds
+        return min(remote_expiry - self.expiry_margin_seconds, local_expiry)
+
+    def _is_fresh(self, entry: UploadEntry) -> bool:
+        return entry.expires_at > time.time()
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    @asynccontextmanager
+    async def lease(self, content_hash: str, size: int, upload):
+        """Yield an uploaded file for ``content_hash``, uploading it on a miss
+
+        ``upload`` is an async callable returning an ACTIVE uploaded file.
+        Concurrent leases for the same hash share a single upload, which runs
+        as its own task so a caller being cancelled doesn't fail the others.
+        An entry is never evicted while a lease on it is held.
+        """
+        entry, reused = await self._resolve(content_hash, size, upload)
+
+        self._entries.move_to_end(content_hash)
+        entry.refs += 1
+        entry.uses += 1
+        entry.last_used = time.time()
+        if reused:
+            logger.info(f"Reusing uploaded file {entry.file.name} for content {content_hash[:12]}")
+        try:
+            yield entry.file, reused
+        finally:
+            entry.refs -= 1
+            await self._enforce_budget()
+
+    async def _resolve(self, content_hash: str, size: int, upload):
+        while True:
+            entry = self._entries.get(content_hash)
+            if entry is not None and not self._is_fresh(entry) and entry.refs == 0:
+                await self._evict(content_hash)
+                entry = None
+
+            if entry is not None:
+                self._counters["reuses"] += 1
+                self._counters["bytes_saved"] += entry.size
+                return entry, True
+
+            task = self._pending.get(content_hash)
+            if task is not None:
+                try:
+                    await asyncio.shield(task)
+                except Exception:
+                    # The upload read the first caller's file, which may have
+                    # been removed when that caller went away; upload our own
+                    if task not in self._abandoned:
+                        raise
+                # Re-check: the shared upload may already have been evicted
+                continue
+
+            task = asyncio.ensure_future(self._upload(content_hash, size, upload))
+            self._pending[content_hash] = task
+            task.add_done_callback(lambda finished: self._finished(content_hash, finished))
+            try:
+                entry = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():
+                    self._abandoned.add(task)
+                raise
+            # Evicted again before this caller resumed: upload once more
+            if self._entries.get(content_hash) is entry:
+                return entry, False
+
+    async def _upload(self, content_hash: str, size: int, upload) -> UploadEntry:
+        uploaded_file = await upload()
+        entry = UploadEntry(uploaded_file, size, self._expires_at(uploaded_file))
+        self._entries[content_hash] = entry
+        self._counters["uploads"] += 1
+        return entry
+
+    def _finished(self, content_hash: str, task: asyncio.Future):
+        if self._pending.get(content_hash) is task:
+            del self._pending[content_hash]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    async def _evict(self, content_hash: str):
+        entry = self._entries.get(content_hash)
+        # A lease may have been taken while an earlier eviction was awaiting
+        if entry is None or entry.refs > 0:
+            return
+        del self._entries[content_hash]
+        self._counters["evictions"] += 1
+        try:
+            await self._delete_file(entry.file.name)
+            logger.info(f"Evicted uploaded file {entry.file.name}")
+        except Exception as e:
+            logger.warning(f"Failed to delete evicted file {entry.file.name}: {str(e)}")
+
+    async def _enforce_budget(self):
+        idle = [key for key, entry in self._entries.items() if entry.refs == 0]
+
+        for key in idle:
+            if not self._is_fresh(self._entries[key]):
+                await self._evict(key)
+
+        # Oldest (least recently used) entries come first in the OrderedDict
+        for key in [key for key in idle if key in self._entries]:
+            if len(self._entries) <= self.max_entries and self.total_bytes <= self.max_bytes:
+                break
+            await self._evict(key)
+
+    async def clear(self):
+        """Delete every idle upload, e.g. on shutdown"""
+        for key in [key for key, entry in self._entries.items() if entry.refs == 0]:
+            await self._evict(key)
+
+    def file_names(self) -> set:
+        """Names of the uploads currently held, e.g. to protect them from cleanup"""
+        return {entry.file.name for entry in self._entries.values()}
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "entries": len(self._entries),
+            "total_bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+from services.cleanup import TEMP_FILE_PREFIX, cleanup_queue
+from services.metrics import INPUT_BYTES
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+MAX_DOCUMENT_UPLOAD_BYTES = int(os.getenv("MAX_DOCUMENT_UPLOAD_MB", "50")) * 1024 * 1024
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_MB", "20")) * 1024 * 1024
+MAX_AUDIO_UPLOAD_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_MB", "500")) * 1024 * 1024
+# Total request size for batch summarization; each file is still capped above
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_MB", "200")) * 1024 * 1024
+
+class SavedUpload:
+    """An upload written to a local temp file, with its size and SHA-256"""
+
+    def __init__(self, path: str, size: int, sha256: str, filename: Optional[str] = None,
+                 content_type: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def cleanup(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def discard(self):
+        """Remove the temp file in the background instead of waiting on it"""
+        cleanup_queue.delete_local(self.path)
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File is too large. The limit is {max_bytes // (1024 * 1024)} MB."
+    )
+
+def new_temp_path(filename: Optional[str] = None) -> str:
+    """Create an empty, prefixed temp file and return its path"""
+    suffix = f"_{os.path.basename(filename)}" if filename else ""
+    fd, path = tempfile.mkstemp(prefix=TEMP_FILE_PREFIX, suffix=suffix)
+    os.close(fd)
+    return path
+
+async def save_upload(file: UploadFile, max_bytes: int) -> SavedUpload:
+    """Stream an upload to a temp file one chunk at a time, enforcing a size limit
+
+    The SHA-256 is computed on the way through so callers never need the
+    whole file in memory.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    path = new_temp_path(file.filename)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    INPUT_BYTES.labels(source="upload").inc(size)
+    logger.info(f"Saved upload {file.filename} ({size} bytes) to {path}")
+    return SavedUpload(path, size, digest.hexdigest(), file.filename, file.content_type)
+
+async def save_bytes(content: bytes, filename: Optional[str] = None,
+                     content_type: Optional[str] = None) -> SavedUpload:
+    """Write in-memory content (e.g. a downloaded image) to a temp file"""
+    path = new_temp_path(filename)
+    async with aiofiles.open(path, "wb") as out:
+        await out.write(content)
+    return SavedUpload(path, len(content), hashlib.sha256(content).hexdigest(), filename, content_type)
+
+def saved_from_path(path: str, filename: Optional[str] = None,
+                    content_type: Optional[str] = None) -> SavedUpload:
+    """Describe a file already on disk (blocking; hashes the whole file)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return SavedUpload(path, size, digest.hexdigest(), filename, content_type)
@@ -1,12 +1,20 @@
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import axios from "axios";
-import { Upload, Mic } from "lucide-react";
+import { Upload, Mic, Radio } from "lucide-react";
+import { liveSocketUrl, startLiveAnalysis } from "../utils/liveAudio";
 
 const API_URL = `${import.meta.env.VITE_API_BASE_URL}/analyze-conversation`;
+const LIVE_URL = liveSocketUrl(import.meta.env.VITE_API_BASE_URL, "/analyze-conversation/live");
 
 export default function ConversationAnalysisUI({ setIsLoading, setOutput, setError }) {
 	const [audioFile, setAudioFile] = useState(null);
+	const [singleCallMode, setSingleCallMode] = useState(false);
 	const [isComponentLoading, setIsComponentLoading] = useState(false);
+	// "idle", "recording" or "finishing"
+	const [liveStatus, setLiveStatus] = useState("idle");
+	const liveSession = useRef(null);
+
+	useEffect(() => () => liveSession.current?.cancel(), []);
 
 	const handleFileChange = (e) => {
 		const file = e.target.files[0];
@@ -30,6 +38,7 @@ export default function ConversationAnalysisUI({ setIsLoading, setOutput, setErr
 
 		const formData = new FormData();
 		formData.append("audio", audioFile);
+		formData.append("mode", singleCallMode ? "single" : "pipeline");
 
 		try {
 			const response = await axios.post(API_URL, formData, {
@@ -50,6 +59,50 @@ export default function ConversationAnalysisUI({ setIsLoading, setOutput, setErr
 		}
 	};
 
+	const handleLiveEvent = (event) => {
+		switch (event.event) {
+			case "transcript":
+				setOutput((output) => ({ ...output, transcript: event.transcript }));
+				break;
+			case "diarization":
+				setOutput((output) => ({ ...output, diarization: event.diarization }));
+				break;
+			case "final":
+				setOutput({ transcript: event.transcript, diarization: event.diarization, summary: event.summary });
+				break;
+			case "error":
+				setError(event.detail || "An error occurred during live analysis.");
+				break;
+			case "closed":
+				liveSession.current = null;
+				setLiveStatus("idle");
+				break;
+		}
+	};
+
+	const handleLiveToggle = async () => {
+		if (liveSession.current) {
+			setLiveStatus("finishing");
+			liveSession.current.stop();
+			return;
+		}
+
+		setOutput(null);
+		setError("");
+		try {
+			liveSession.current = await startLiveAnalysis(LIVE_URL, handleLiveEvent);
+			setLiveStatus("recording");
+		} catch (err) {
+			setError(err.name === "NotAllowedError" ? "Microphone access was denied." : "Could not start live analysis.");
+		}
+	};
+
+	const liveButtonLabel = {
+		idle: "Analyze Live from Microphone",
+		recording: "Stop and Summarize",
+		finishing: "Summarizing...",
+	}[liveStatus];
+
 	return (
 		<form onSubmit={handleSubmit} className="space-y-4">
 			<div>
@@ -89,13 +142,33 @@ export default function ConversationAnalysisUI({ setIsLoading, setOutput, setErr
 				</div>
 			)}
 
+			<label className="flex items-center space-x-2 cursor-pointer">
+				<input
+					type="checkbox"
+					checked={singleCallMode}
+					onChange={(e) => setSingleCallMode(e.target.checked)}
+					className="form-checkbox bg-gray-800 border-gray-600 text-blue-500"
+				/>
+				<span className="text-sm text-gray-300">Fast mode (single model call)</span>
+			</label>
+
 			<button
 				type="submit"
 				className="w-full bg-blue-600 hover:bg-blue-700 text-white font-bold py-2 px-4 rounded-md transition-colors disabled:bg-gray-600 disabled:cursor-not-allowed"
-				disabled={isComponentLoading}
+				disabled={isComponentLoading || liveStatus !== "idle"}
 			>
 				{isComponentLoading ? "Processing Audio..." : "Analyze Conversation"}
 			</button>
+
+			<button
+				type="button"
+				onClick={handleLiveToggle}
+				className="w-full flex justify-center items-center space-x-2 bg-[#1c1c1c] border border-gray-600 hover:border-gray-500 text-gray-200 font-bold py-2 px-4 rounded-md transition-colors disabled:text-gray-500 disabled:cursor-not-allowed"
+				disabled={isComponentLoading || liveStatus === "finishing"}
+			>
+				<Radio size={16} className={liveStatus === "recording" ? "text-red-500 animate-pulse" : "text-gray-400"} />
+				<span>{liveButtonLabel}</span>
+			</button>
 		</form>
 	);
 }
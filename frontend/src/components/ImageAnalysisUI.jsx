@@ -1,8 +1,8 @@
 import { useState } from "react";
-import axios from "axios";
 import { Upload, MessageSquare } from "lucide-react";
+import { postEventStream } from "../utils/streamEvents";
 
-const API_URL = `${import.meta.env.VITE_API_BASE_URL}/analyze-image`;
+const API_URL = `${import.meta.env.VITE_API_BASE_URL}/analyze-image/stream`;
 
 export default function ImageAnalysisUI({ setIsLoading, setOutput, setError }) {
 	const [imageFile, setImageFile] = useState(null);
@@ -36,17 +36,24 @@ export default function ImageAnalysisUI({ setIsLoading, setOutput, setError }) {
 		formData.append("prompt", prompt || "Analyze this image and describe what you see in detail.");
 
 		try {
-			const response = await axios.post(API_URL, formData, {
-				headers: {
-					"Content-Type": "multipart/form-data",
-				},
+			// Render the analysis progressively as tokens stream in
+			let analysis = "";
+			await postEventStream(API_URL, formData, (event, data) => {
+				if (event === "chunk") {
+					analysis += data.text;
+					setIsLoading(false);
+					setOutput({ analysis });
+				} else if (event === "done") {
+					setOutput({ analysis, meta: data });
+				} else if (event === "error") {
+					setError(data.detail);
+				}
 			});
-			setOutput(response.data);
 		} catch (err) {
-			if (err.response?.status === 503) {
+			if (err.status === 503) {
 				setError("The AI service is temporarily overloaded. Please try again in a few minutes.");
 			} else {
-				setError(err.response?.data?.detail || "An error occurred during image analysis.");
+				setError(err.detail || "An error occurred during image analysis.");
 			}
 		} finally {
 			setIsLoading(false);
@@ -1,10 +1,10 @@
 // frontend/src/components/SummarizationUI.jsx
 import { useState } from "react";
-import axios from "axios";
 // import { useAuth } from "@clerk/clerk-react"; // Temporarily disabled for testing
 import { Upload, Link } from "lucide-react";
+import { postEventStream } from "../utils/streamEvents";
 
-const API_URL = `${import.meta.env.VITE_API_BASE_URL}/summarize`;
+const API_URL = `${import.meta.env.VITE_API_BASE_URL}/summarize/stream`;
 
 // The props setIsLoading, setOutput, setError are passed down from Playground.jsx
 export default function SummarizationUI({ setIsLoading, setOutput, setError }) {
@@ -39,17 +39,24 @@ export default function SummarizationUI({ setIsLoading, setOutput, setError }) {
 
 		try {
 			// Temporarily remove auth for testing
-			const response = await axios.post(API_URL, formData, {
-				headers: {
-					"Content-Type": "multipart/form-data",
-				},
+			// Render the summary progressively as tokens stream in
+			let summary = "";
+			await postEventStream(API_URL, formData, (event, data) => {
+				if (event === "chunk") {
+					summary += data.text;
+					setIsLoading(false);
+					setOutput({ summary });
+				} else if (event === "done") {
+					setOutput({ summary, meta: data });
+				} else if (event === "error") {
+					setError(data.detail);
+				}
 			});
-			setOutput(response.data);
 		} catch (err) {
-			if (err.response?.status === 503) {
+			if (err.status === 503) {
 				setError("The AI service is temporarily overloaded. Please try again in a few minutes.");
 			} else {
-				setError(err.response?.data?.detail || "An error occurred during summarization.");
+				setError(err.detail || "An error occurred during summarization.");
 			}
 		} finally {
 			// Set both the parent and local loading states to false
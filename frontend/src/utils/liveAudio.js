@@ -0,0 +1,85 @@
+// Stream microphone audio to a live analysis WebSocket and invoke
+// onEvent(event) for every JSON event the server pushes. Audio is sent as
+// 16 kHz mono 16-bit PCM frames of about 100 ms.
+const SAMPLE_RATE = 16000;
+const FRAME_SAMPLES = 1600;
+
+// Runs on the audio thread: converts float samples to 16-bit PCM and posts
+// them back in fixed-size frames
+const WORKLET_SOURCE = `
+class PcmCapture extends AudioWorkletProcessor {
+	constructor() {
+		super();
+		this.frame = new Int16Array(${FRAME_SAMPLES});
+		this.length = 0;
+	}
+
+	process(inputs) {
+		const channel = inputs[0][0];
+		if (channel) {
+			for (let i = 0; i < channel.length; i++) {
+				const sample = Math.max(-1, Math.min(1, channel[i]));
+				this.frame[this.length++] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+				if (this.length === this.frame.length) {
+					this.port.postMessage(this.frame.buffer.slice(0));
+					this.length = 0;
+				}
+			}
+		}
+		return true;
+	}
+}
+registerProcessor("pcm-capture", PcmCapture);
+`;
+
+export function liveSocketUrl(apiBaseUrl, path) {
+	const url = new URL(`${apiBaseUrl}${path}`, window.location.href);
+	url.protocol = url.protocol === "https:" ? "wss:" : "ws:";
+	return url.toString();
+}
+
+export async function startLiveAnalysis(url, onEvent) {
+	const stream = await navigator.mediaDevices.getUserMedia({ audio: { channelCount: 1 } });
+	const context = new AudioContext({ sampleRate: SAMPLE_RATE });
+	const moduleUrl = URL.createObjectURL(new Blob([WORKLET_SOURCE], { type: "application/javascript" }));
+	await context.audioWorklet.addModule(moduleUrl);
+	URL.revokeObjectURL(moduleUrl);
+
+	const source = context.createMediaStreamSource(stream);
+	const capture = new AudioWorkletNode(context, "pcm-capture");
+	const socket = new WebSocket(url);
+	socket.binaryType = "arraybuffer";
+
+	const releaseMicrophone = () => {
+		source.disconnect();
+		capture.disconnect();
+		stream.getTracks().forEach((track) => track.stop());
+		if (context.state !== "closed") context.close();
+	};
+
+	socket.onopen = () => {
+		socket.send(JSON.stringify({ event: "start", encoding: "pcm_s16le", sampleRate: SAMPLE_RATE }));
+		capture.port.onmessage = (e) => {
+			if (socket.readyState === WebSocket.OPEN) socket.send(e.data);
+		};
+		source.connect(capture);
+	};
+	socket.onmessage = (e) => onEvent(JSON.parse(e.data));
+	socket.onerror = () => onEvent({ event: "error", detail: "Lost connection to the live analysis service." });
+	socket.onclose = (e) => {
+		releaseMicrophone();
+		onEvent({ event: "closed", code: e.code });
+	};
+
+	return {
+		// Stop recording and wait for the final analysis
+		stop() {
+			releaseMicrophone();
+			if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ event: "stop" }));
+		},
+		// Abandon the session without a final analysis
+		cancel() {
+			socket.close();
+		},
+	};
+}
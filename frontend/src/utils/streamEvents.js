@@ -0,0 +1,43 @@
+// POST a form to a server-sent events endpoint and invoke onEvent(name, data)
+// for every event as it arrives. EventSource only supports GET, so the
+// stream is read and parsed by hand.
+export async function postEventStream(url, formData, onEvent) {
+	const response = await fetch(url, { method: "POST", body: formData });
+
+	if (!response.ok) {
+		let detail;
+		try {
+			detail = (await response.json()).detail;
+		} catch {
+			detail = undefined;
+		}
+		const error = new Error(detail || `Request failed with status ${response.status}`);
+		error.status = response.status;
+		error.detail = detail;
+		throw error;
+	}
+
+	const reader = response.body.getReader();
+	const decoder = new TextDecoder();
+	let buffer = "";
+
+	for (;;) {
+		const { value, done } = await reader.read();
+		if (done) break;
+		buffer += decoder.decode(value, { stream: true });
+
+		let boundary;
+		while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+			const rawEvent = buffer.slice(0, boundary);
+			buffer = buffer.slice(boundary + 2);
+
+			let name = "message";
+			let data = "";
+			for (const line of rawEvent.split("\n")) {
+				if (line.startsWith("event:")) name = line.slice(6).trim();
+				else if (line.startsWith("data:")) data += line.slice(5).trim();
+			}
+			if (data) onEvent(name, JSON.parse(data));
+		}
+	}
+}